@@ -1,7 +1,9 @@
 # app/api.py
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-import os, time, psutil, asyncio
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager
+import os, time, json, psutil, asyncio, logging
 from typing import Dict, Any, Optional
 from pathlib import Path
 
@@ -9,14 +11,31 @@ from pathlib import Path
 from backend import get_factory_manager
 from backend.data.models import QueryRequest, QueryResponse, Hit
 from backend.search.indexing import build_indexes
+from backend.search.incremental import update_indexes
+from backend.search.generations import current_generation, prune_generations
+from backend.search.hot_swap import reload_retrievers
+from backend.cache import get_cache
+from backend.concurrency import shutdown_cpu_executor
 from backend.config import get_settings
+from backend.warmup import get_readiness, warm_up
+from backend.tracing import get_metrics, observe_request, trace
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Precalienta modelos e índices en background; /ready avisa cuando terminó"""
+    if settings.warmup_on_startup:
+        # En un thread: la API acepta conexiones (/health, /ready) mientras carga
+        app.state.warmup_task = asyncio.create_task(asyncio.to_thread(warm_up, factory_manager.get_rag_pipeline()))
+    yield
+    shutdown_cpu_executor()
 
 app = FastAPI(
     title="Legal RAG API",
     description="Sistema RAG para consultas legales",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Middleware CORS para producción
@@ -31,6 +50,10 @@ app.add_middleware(
 # Factory Manager global
 factory_manager = get_factory_manager()
 
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
 @app.get("/")
 async def root():
     """Información de la API"""
@@ -40,8 +63,11 @@ async def root():
         "status": "running",
         "endpoints": {
             "query": "POST /query - Consulta individual",
+            "query_stream": "POST /query/stream - Consulta con respuesta en streaming (SSE)",
             "query_batch": "POST /query-batch - Consultas en lote",
             "health": "GET /health - Estado del servicio",
+            "ready": "GET /ready - Modelos e índices cargados (503 mientras precalienta)",
+            "metrics": "GET /metrics - Latencias por etapa y contadores (formato Prometheus)",
             "stats": "GET /stats - Estadísticas del sistema",
             "rebuild": "POST /rebuild-indexes - Reconstruir índices"
         },
@@ -57,6 +83,37 @@ async def root():
         }
     }
 
+def _to_hit_objects(hits: list) -> list[Hit]:
+    """Convierte hits agrupados al formato plano esperado, manteniendo info común y agrupando por expediente"""
+    hit_objects = []
+    for hit in hits:
+        expte = hit.get('expte', '')
+        idea_central = hit.get('idea_central', '')
+        materia_preliminar = hit.get('materia_preliminar', '')
+        articulos_citados = hit.get('articulos_citados', [])
+        sections = hit.get('sections', [])
+        extractos = hit.get('extractos', [])
+        path = hit.get('paths', [])
+        scores = hit.get('scores', [])
+        search_types = hit.get('search_types', [])
+        # Emparejar por índice, solo lo distinto (extractos/sections)
+        for i in range(len(extractos)):
+            hit_obj = Hit(
+                expte=expte,
+                section=sections[i] if i < len(sections) else '',
+                paragraph=extractos[i],
+                score=scores[i] if i < len(scores) else 0.0,
+                path=path[i] if i < len(path) else '',
+                search_type=search_types[i] if i < len(search_types) else 'hybrid',
+                idea_central=idea_central,
+                articulos_citados=articulos_citados,
+                materia_preliminar=materia_preliminar,
+                sections=sections,
+                extractos=extractos
+            )
+            hit_objects.append(hit_obj)
+    return hit_objects
+
 @app.post("/query", response_model=QueryResponse)
 async def query_endpoint(request: QueryRequest) -> QueryResponse:
     """
@@ -79,65 +136,115 @@ async def query_endpoint(request: QueryRequest) -> QueryResponse:
         # Usar Factory Manager para obtener RAG pipeline
         pipeline = factory_manager.get_rag_pipeline()
         
-        # Procesar consulta con verificación de tiempo
-        response, hits = pipeline.query(request.question, request.top_n)
-        
-        # Verificar si se excedió el timeout
-        elapsed_time = time.time() - start_time
-        if elapsed_time > query_timeout:
+        # Procesar consulta async (retrieval y LLM no bloquean el event loop), con timeout real
+        try:
+            with trace() as t:
+                response, hits = await asyncio.wait_for(
+                    pipeline.aquery(request.question, request.top_n),
+                    timeout=query_timeout
+                )
+        except asyncio.TimeoutError:
+            elapsed_time = time.time() - start_time
+            observe_request("/query", elapsed_time, status="timeout")
             raise HTTPException(
                 status_code=408,
                 detail=f"Query took {elapsed_time:.1f}s (timeout: {query_timeout}s). Try a simpler question."
             )
         
-        # Convertir hits agrupados al formato plano esperado, manteniendo info común y agrupando por expediente
-        hit_objects = []
-        for hit in hits:
-            expte = hit.get('expte', '')
-            idea_central = hit.get('idea_central', '')
-            materia_preliminar = hit.get('materia_preliminar', '')
-            articulos_citados = hit.get('articulos_citados', [])
-            sections = hit.get('sections', [])
-            extractos = hit.get('extractos', [])
-            path = hit.get('paths', [])
-            scores = hit.get('scores', [])
-            search_types = hit.get('search_types', [])
-            # Emparejar por índice, solo lo distinto (extractos/sections)
-            for i in range(len(extractos)):
-                hit_obj = Hit(
-                    expte=expte,
-                    section=sections[i] if i < len(sections) else '',
-                    paragraph=extractos[i],
-                    score=scores[i] if i < len(scores) else 0.0,
-                    path=path[i] if i < len(path) else '',
-                    search_type=search_types[i] if i < len(search_types) else 'hybrid',
-                    idea_central=idea_central,
-                    articulos_citados=articulos_citados,
-                    materia_preliminar=materia_preliminar,
-                    sections=sections,
-                    extractos=extractos
-                )
-                hit_objects.append(hit_obj)
+        hit_objects = _to_hit_objects(hits)
         
         query_time = time.time() - start_time
+        observe_request("/query", query_time)
         
+        # Tiempos medidos por las etapas del pipeline (0 si la respuesta salió del cache semántico)
         return QueryResponse(
             question=request.question,
             markdown=response,
             results=hit_objects,
             total_time=query_time,
-            search_time=query_time * 0.7,  # Estimación
-            llm_time=query_time * 0.3      # Estimación
+            search_time=t.get("retrieval"),
+            llm_time=t.get("llm"),
+            stages=t.as_dict()
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
+        observe_request("/query", time.time() - start_time, status="error")
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
+def _sse(event: str, data: Any) -> str:
+    """Evento Server-Sent Events con payload JSON"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@app.post("/query/stream")
+async def query_stream_endpoint(request: QueryRequest) -> StreamingResponse:
+    """
+    Consulta RAG con respuesta en streaming (Server-Sent Events)
+    
+    Eventos, en orden:
+    - `hits`: resultados de búsqueda (mismo formato que `results` de /query), apenas termina el retrieval
+    - `token`: fragmento de la respuesta del LLM (`{"text": ...}`), uno por fragmento
+    - `done`: tiempos de la consulta; `error`: falla o timeout (cierra el stream)
+    
+    QUERY_TIMEOUT aplica a la espera de cada evento, no a toda la respuesta.
+    """
+    if not settings.rag_enable_streaming:
+        raise HTTPException(status_code=404, detail="Streaming deshabilitado (RAG_ENABLE_STREAMING=false)")
+    
+    query_timeout = int(os.getenv("QUERY_TIMEOUT", "45"))
+    pipeline = factory_manager.get_rag_pipeline()
+    
+    async def event_stream():
+        start_time = time.time()
+        status = "ok"
+        with trace() as t:
+            events = pipeline.astream_query(request.question, request.top_n).__aiter__()
+            try:
+                while True:
+                    try:
+                        kind, payload = await asyncio.wait_for(events.__anext__(), timeout=query_timeout)
+                    except StopAsyncIteration:
+                        break
+                    if kind == "hits":
+                        yield _sse("hits", {"results": [h.model_dump() for h in _to_hit_objects(payload)]})
+                    else:
+                        yield _sse("token", {"text": payload})
+                
+                yield _sse("done", {
+                    "question": request.question,
+                    "total_time": time.time() - start_time,
+                    "search_time": t.get("retrieval"),
+                    "llm_time": t.get("llm"),
+                    "stages": t.as_dict()
+                })
+            except asyncio.TimeoutError:
+                status = "timeout"
+                yield _sse("error", {"detail": f"Sin respuesta en {query_timeout}s (timeout: {query_timeout}s)"})
+            except Exception as e:
+                status = "error"
+                yield _sse("error", {"detail": f"Error processing query: {str(e)}"})
+            finally:
+                await events.aclose()
+                observe_request("/query/stream", time.time() - start_time, status=status)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/query-batch")
 async def query_batch_endpoint(requests: list[QueryRequest]) -> list[QueryResponse]:
     """
     Endpoint para procesar múltiples consultas en lote
     
+    El retrieval de todas las consultas se hace junto (un encode, un search_batch en Qdrant,
+    BM25 en una sola acumulación y un batch del cross-encoder) y las llamadas al LLM van en
+    paralelo, con a lo sumo LLM_BATCH_CONCURRENCY a la vez. Cada llamada al LLM tiene su
+    propio QUERY_TIMEOUT y sus errores: una consulta que falla o vence responde con error
+    (con sus resultados de búsqueda) sin descartar las demás.
+    
     Args:
         requests: Lista de consultas
         
@@ -149,25 +256,58 @@ async def query_batch_endpoint(requests: list[QueryRequest]) -> list[QueryRespon
             status_code=400,
             detail="Máximo 10 consultas por lote"
         )
+    if not requests:
+        return []
     
-    responses = []
-    for req in requests:
-        try:
-            # Reutilizar lógica del endpoint principal
-            response = await query_endpoint(req)
-            responses.append(response)
-        except HTTPException:
-            # En caso de error, agregar respuesta de error
-            responses.append(QueryResponse(
+    start_time = time.time()
+    query_timeout = int(os.getenv("QUERY_TIMEOUT", "45"))
+    # Tope del lote completo (solo corta si se cuelga el retrieval compartido): un QUERY_TIMEOUT
+    # para el retrieval más uno por cada tanda de LLM_BATCH_CONCURRENCY llamadas
+    llm_rounds = -(-len(requests) // max(settings.llm_batch_concurrency, 1))
+    batch_timeout = query_timeout * (1 + llm_rounds)
+    
+    try:
+        pipeline = factory_manager.get_rag_pipeline()
+        with trace() as t:
+            results = await asyncio.wait_for(
+                pipeline.aquery_batch([req.question for req in requests], [req.top_n for req in requests], timeout=query_timeout),
+                timeout=batch_timeout
+            )
+    except Exception as e:
+        # Falla compartida (retrieval o tope del lote): respuesta de error para cada consulta
+        logger.error(f"❌ Error procesando lote de {len(requests)} consultas: {e!r}")
+        observe_request("/query-batch", time.time() - start_time, status="error")
+        return [
+            QueryResponse(
                 question=req.question,
                 markdown="Error procesando la consulta",
                 results=[],
                 total_time=0.0,
                 search_time=0.0,
                 llm_time=0.0
-            ))
+            )
+            for req in requests
+        ]
     
-    return responses
+    query_time = time.time() - start_time
+    failed = sum(response.startswith("Error:") for response, _ in results)
+    if failed:
+        logger.error(f"❌ {failed}/{len(requests)} consultas del lote sin respuesta del LLM")
+    observe_request("/query-batch", query_time, status="error" if failed == len(requests) else "ok")
+    # Retrieval y LLM son compartidos por el lote: cada respuesta lleva los tiempos del lote
+    stages = t.as_dict()
+    return [
+        QueryResponse(
+            question=req.question,
+            markdown="Error procesando la consulta" if response.startswith("Error:") else response,
+            results=_to_hit_objects(hits),
+            total_time=query_time,
+            search_time=t.get("retrieval"),
+            llm_time=t.get("llm"),
+            stages=stages
+        )
+        for req, (response, hits) in zip(requests, results)
+    ]
 
 @app.get("/health")
 async def health_check():
@@ -185,13 +325,15 @@ async def health_check():
         "checks": {}
     }
     
-    # Verificar índices
-    bm25_path = os.getenv("BM25_PATH", "/indexes/bm25.pkl")
-    bm25_corpus_path = os.getenv("BM25_CORPUS_PATH", "/indexes/bm25_corpus.npy")
+    # Verificar índices (generación activa)
+    generation = current_generation()
     
     health_status["checks"]["indexes"] = {
-        "bm25_available": os.path.exists(bm25_path),
-        "corpus_available": os.path.exists(bm25_corpus_path)
+        "generation": generation.number,
+        "collection": generation.collection,
+        "bm25_available": os.path.exists(os.path.join(generation.bm25_index_dir, "meta.json")),
+        "corpus_available": os.path.exists(os.path.join(generation.corpus_dir, "meta.json")),
+        "payloads_available": os.path.exists(os.path.join(generation.payload_store_dir, "meta.json"))
     }
     
     # Verificar memoria
@@ -214,6 +356,7 @@ async def health_check():
     if not all([
         health_status["checks"]["indexes"]["bm25_available"],
         health_status["checks"]["indexes"]["corpus_available"],
+        health_status["checks"]["indexes"]["payloads_available"],
         health_status["checks"]["memory"]["healthy"],
         health_status["checks"]["pipeline"]["available"]
     ]):
@@ -221,6 +364,35 @@ async def health_check():
     
     return health_status
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness del servicio (separado de /health)
+    
+    200 cuando el warm-up de arranque cargó todos los componentes, 503 mientras carga o si
+    alguno falló. Incluye estado y tiempo de carga de cada componente.
+    """
+    if not settings.warmup_on_startup:
+        return {"ready": True, "warmup": "disabled", "components": {}}
+    
+    snapshot = get_readiness().snapshot()
+    return JSONResponse(status_code=200 if snapshot["ready"] else 503, content=snapshot)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """
+    Métricas en formato de texto de Prometheus
+    
+    - legal_rag_stage_seconds{stage}: p50/p95/p99 (últimas METRICS_WINDOW muestras), suma y cantidad por etapa
+    - legal_rag_request_seconds{endpoint}, legal_rag_requests_total{endpoint,status}
+    - legal_rag_llm_calls_total{status}, legal_rag_llm_tokens_total{kind}
+    
+    Son del proceso que atiende el request (un worker de uvicorn).
+    """
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Métricas deshabilitadas (METRICS_ENABLED=false)")
+    return PlainTextResponse(get_metrics().render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/stats")
 async def get_system_stats():
     """Estadísticas detalladas del sistema"""
@@ -231,8 +403,15 @@ async def get_system_stats():
         # Stats del sistema
         memory = psutil.virtual_memory()
         
+        # Cache semántico de respuestas (si el pipeline lo tiene)
+        pipeline = factory_manager.get_rag_pipeline()
+        answer_cache = getattr(pipeline, "cache", None)
+        
         return {
             "factory_manager": factory_stats,
+            "answer_cache": answer_cache.get_stats() if answer_cache is not None else None,
+            "shared_cache": get_cache().get_stats(),
+            "latency": get_metrics().get_stats() if settings.metrics_enabled else None,
             "system": {
                 "memory_usage_gb": round(memory.used / (1024**3), 2),
                 "memory_percent": memory.percent,
@@ -245,50 +424,53 @@ async def get_system_stats():
         raise HTTPException(status_code=500, detail=f"Error getting stats: {str(e)}")
 
 @app.post("/rebuild-indexes")
-async def rebuild_indexes_endpoint(background_tasks: BackgroundTasks, force: bool = False):
+async def rebuild_indexes_endpoint(background_tasks: BackgroundTasks, force: bool = False, incremental: bool = False):
     """
     Reconstruir índices en background
     
     Args:
-        force: Forzar reconstrucción sin verificar cambios
+        force: Reconstrucción completa (nueva generación) aunque se pida incremental
+        incremental: Indexar solo los JSON nuevos, modificados o eliminados (ignorado con force)
     """
     try:
         # Programar reconstrucción en background
-        background_tasks.add_task(_rebuild_indexes_task, force=force)
+        background_tasks.add_task(_rebuild_indexes_task, force=force, incremental=incremental)
         
         return {
             "status": "accepted",
             "message": "Reconstrucción de índices iniciada en background",
             "force": force,
+            "incremental": incremental and not force,
             "timestamp": time.time()
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-async def _rebuild_indexes_task(force: bool = False):
-    """Tarea de reconstrucción de índices"""
+async def _rebuild_indexes_task(force: bool = False, incremental: bool = False):
+    """
+    Tarea de reconstrucción de índices
+    
+    El build escribe una generación nueva y la activa (alias de Qdrant + CURRENT) sin tocar
+    la que está en uso; después los retrievers se reemplazan en caliente. Corre en un thread
+    para no bloquear el event loop mientras tanto.
+    """
     try:
         datasets_path = Path("/datasets/fallos_json")
         qdrant_url = os.getenv("QDRANT_URL", "http://qdrant:6333")
         
-        if force:
-            # Eliminar índices existentes
-            bm25_path = os.getenv("BM25_PATH", "/indexes/bm25.pkl")
-            corpus_path = os.getenv("BM25_CORPUS_PATH", "/indexes/bm25_corpus.npy")
-            
-            for path in [bm25_path, corpus_path]:
-                if os.path.exists(path):
-                    os.remove(path)
-        
-        # Reconstruir
-        build_indexes(datasets_path, qdrant_url)
+        # Reconstruir completo (force) o actualizar solo lo que cambió
+        if incremental and not force:
+            report = await asyncio.to_thread(update_indexes, datasets_path, qdrant_url)
+        else:
+            report = await asyncio.to_thread(build_indexes, datasets_path, qdrant_url)
         
-        # Reinicializar pipeline
-        global _rag_pipeline
-        _rag_pipeline = None
+        # Cargar retrievers sobre la generación nueva y reemplazar los viejos al drenar
+        swapped = await asyncio.to_thread(reload_retrievers)
+        # Los retrievers viejos ya no tienen abierta su generación: se puede eliminar
+        await asyncio.to_thread(prune_generations)
         
-        print("✅ Índices reconstruidos exitosamente")
+        print(f"✅ Índices reconstruidos exitosamente (generación {report.get('generation')}, retrievers: {swapped})")
         
     except Exception as e:
         print(f"❌ Error reconstruyendo índices: {e}")
@@ -0,0 +1,303 @@
+# backend/cache.py
+"""
+Cache compartido entre workers para embeddings de preguntas y scores del cross-encoder
+
+Cada worker de uvicorn es un proceso con sus propios modelos; con un cache por proceso
+(lru_cache) cada uno recalculaba los mismos encodings. Este servicio guarda los resultados
+en un backend enchufable:
+
+- sqlite: archivo en el volumen de índices (CACHE_PATH), en modo WAL. Lo comparten todos
+  los workers y sobrevive a reinicios y a los reemplazos en caliente de retrievers.
+- local:  dict LRU en memoria del proceso (tests, desarrollo, o sin volumen escribible).
+
+Las claves son hashes del contenido (modelo + pregunta, modelo + pregunta + texto del
+párrafo), así que no dependen de la generación de índices. Un fallo del backend nunca
+rompe una query: se registra y se trata como miss.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+def content_key(*parts: str) -> str:
+    """Hash estable de las partes (clave de cache)"""
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+# =================================
+# BACKENDS
+# =================================
+
+class CacheBackend(ABC):
+    """Almacén clave -> bytes agrupado por namespace"""
+
+    name = "base"
+
+    @abstractmethod
+    def get_many(self, namespace: str, keys: List[str]) -> Dict[str, bytes]:
+        """Valores presentes de las claves pedidas"""
+
+    @abstractmethod
+    def set_many(self, namespace: str, items: Dict[str, bytes]):
+        """Guarda (o reemplaza) los valores"""
+
+    @abstractmethod
+    def clear(self, namespace: Optional[str] = None):
+        """Vacía un namespace o todo el cache"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+
+class LocalCacheBackend(CacheBackend):
+    """Dict LRU en memoria del proceso"""
+
+    name = "local"
+
+    def __init__(self, max_entries: int = settings.cache_max_entries):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, namespace: str, keys: List[str]) -> Dict[str, bytes]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                value = self._data.get((namespace, key))
+                if value is not None:
+                    self._data.move_to_end((namespace, key))
+                    found[key] = value
+        return found
+
+    def set_many(self, namespace: str, items: Dict[str, bytes]):
+        with self._lock:
+            for key, value in items.items():
+                self._data[(namespace, key)] = value
+                self._data.move_to_end((namespace, key))
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self, namespace: Optional[str] = None):
+        with self._lock:
+            if namespace is None:
+                self._data.clear()
+            else:
+                for key in [k for k in self._data if k[0] == namespace]:
+                    del self._data[key]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Archivo SQLite compartido por todos los workers (WAL: lectores no bloquean al escritor)
+
+    Una conexión por thread. Al superar max_entries se borran las entradas más viejas
+    (por fecha de escritura; las lecturas no escriben para no serializar los workers).
+    """
+
+    name = "sqlite"
+    PRUNE_EVERY = 256  # escrituras entre chequeos de tamaño
+
+    def __init__(self, path: str = settings.cache_path, max_entries: int = settings.cache_max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " ns TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, created REAL NOT NULL,"
+            " PRIMARY KEY (ns, key)) WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_created ON cache (created)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, namespace: str, keys: List[str]) -> Dict[str, bytes]:
+        if not keys:
+            return {}
+        found = {}
+        conn = self._conn()
+        # Límite de parámetros por sentencia de SQLite
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = conn.execute(
+                f"SELECT key, value FROM cache WHERE ns = ? AND key IN ({','.join('?' * len(chunk))})",
+                [namespace, *chunk],
+            ).fetchall()
+            found.update(rows)
+        return found
+
+    def set_many(self, namespace: str, items: Dict[str, bytes]):
+        if not items:
+            return
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache (ns, key, value, created) VALUES (?, ?, ?, ?)",
+                [(namespace, key, value, now) for key, value in items.items()],
+            )
+
+        with self._writes_lock:
+            self._writes += len(items)
+            prune = self._writes >= self.PRUNE_EVERY
+            if prune:
+                self._writes = 0
+        if prune:
+            self._prune(conn)
+
+    def _prune(self, conn: sqlite3.Connection):
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            with conn:
+                conn.execute(
+                    "DELETE FROM cache WHERE (ns, key) IN (SELECT ns, key FROM cache ORDER BY created LIMIT ?)",
+                    (excess,),
+                )
+
+    def clear(self, namespace: Optional[str] = None):
+        conn = self._conn()
+        with conn:
+            if namespace is None:
+                conn.execute("DELETE FROM cache")
+            else:
+                conn.execute("DELETE FROM cache WHERE ns = ?", (namespace,))
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+# =================================
+# SERVICIO
+# =================================
+
+class CacheService:
+    """Embeddings y scores cacheados sobre un CacheBackend, con contadores de hit/miss"""
+
+    def __init__(self, backend: CacheBackend, enabled: bool = settings.enable_query_caching):
+        self.backend = backend
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.stats = {
+            "embeddings": {"hits": 0, "misses": 0, "errors": 0},
+            "rerank": {"hits": 0, "misses": 0, "errors": 0},
+        }
+
+    def _count(self, kind: str, hits: int, misses: int):
+        with self._lock:
+            self.stats[kind]["hits"] += hits
+            self.stats[kind]["misses"] += misses
+
+    def _get(self, kind: str, namespace: str, keys: List[str]) -> Dict[str, bytes]:
+        try:
+            return self.backend.get_many(namespace, keys)
+        except Exception as e:
+            logger.warning(f"⚠️ Cache ({self.backend.name}) no disponible en lectura: {e}")
+            self.stats[kind]["errors"] += 1
+            return {}
+
+    def _set(self, kind: str, namespace: str, items: Dict[str, bytes]):
+        try:
+            self.backend.set_many(namespace, items)
+        except Exception as e:
+            logger.warning(f"⚠️ Cache ({self.backend.name}) no disponible en escritura: {e}")
+            self.stats[kind]["errors"] += 1
+
+    def get_embedding(self, model: str, text: str) -> Optional[np.ndarray]:
+        """Embedding cacheado del texto para el modelo, o None"""
+        if not self.enabled:
+            return None
+        key = content_key(text)
+        value = self._get("embeddings", f"emb:{model}", [key]).get(key)
+        self._count("embeddings", value is not None, value is None)
+        return np.frombuffer(value, dtype=np.float32) if value is not None else None
+
+    def set_embedding(self, model: str, text: str, vector):
+        if self.enabled:
+            data = np.asarray(vector, dtype=np.float32).tobytes()
+            self._set("embeddings", f"emb:{model}", {content_key(text): data})
+
+    def get_scores(self, model: str, question: str, texts: Iterable[str]) -> Dict[int, float]:
+        """Scores cacheados {índice: score} de los pares (question, text)"""
+        if not self.enabled:
+            return {}
+        keys = [content_key(question, t) for t in texts]
+        found = self._get("rerank", f"rerank:{model}", keys)
+        scores = {i: float(np.frombuffer(found[k], dtype=np.float32)[0]) for i, k in enumerate(keys) if k in found}
+        self._count("rerank", len(scores), len(keys) - len(scores))
+        return scores
+
+    def set_scores(self, model: str, question: str, texts: Iterable[str], scores: Iterable[float]):
+        if self.enabled:
+            items = {content_key(question, t): np.float32(s).tobytes() for t, s in zip(texts, scores)}
+            self._set("rerank", f"rerank:{model}", items)
+
+    def clear(self, namespace: Optional[str] = None):
+        self.backend.clear(namespace)
+
+    def get_stats(self) -> Dict[str, Any]:
+        try:
+            entries = len(self.backend)
+        except Exception:
+            entries = None
+        stats = {"backend": self.backend.name, "enabled": self.enabled, "entries": entries}
+        for kind, counters in self.stats.items():
+            lookups = counters["hits"] + counters["misses"]
+            stats[kind] = {**counters, "hit_rate": round(counters["hits"] / lookups, 3) if lookups else 0.0}
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> CacheService:
+    """Singleton del cache compartido según CACHE_BACKEND (si el archivo SQLite no se puede abrir, local)"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                backend = None
+                if settings.cache_backend == "sqlite":
+                    try:
+                        backend = SQLiteCacheBackend()
+                    except (OSError, sqlite3.Error) as e:
+                        logger.warning(f"⚠️ No se pudo abrir el cache SQLite en {settings.cache_path} ({e}); usando cache local")
+                if backend is None:
+                    backend = LocalCacheBackend()
+                logger.info(f"💾 Cache compartido: {backend.name}")
+                _cache = CacheService(backend)
+    return _cache
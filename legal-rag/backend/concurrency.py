@@ -0,0 +1,52 @@
+"""
+Pool acotado para trabajo CPU-bound desde código async
+
+Encoding, BM25, merge y cross-encoder corren acá para no bloquear el event loop. Es un pool
+de threads (no de procesos): torch, onnxruntime y numpy liberan el GIL en las operaciones
+pesadas, y así los modelos se cargan una sola vez por worker. El tamaño del pool acota
+cuántas consultas compiten por CPU a la vez; el resto espera en la cola sin ocupar el loop.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_cpu_executor() -> ThreadPoolExecutor:
+    """Singleton del pool CPU (CPU_POOL_WORKERS threads)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                logger.info(f"🧵 Inicializando pool CPU con {settings.cpu_pool_workers} workers")
+                _executor = ThreadPoolExecutor(max_workers=settings.cpu_pool_workers, thread_name_prefix="cpu")
+    return _executor
+
+
+async def run_cpu(func: Callable[..., T], *args, **kwargs) -> T:
+    """Ejecuta func(*args, **kwargs) en el pool CPU y espera el resultado sin bloquear el loop"""
+    loop = asyncio.get_running_loop()
+    # Con el contexto del llamador (como asyncio.to_thread): la traza de la consulta sigue activa
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(get_cpu_executor(), functools.partial(ctx.run, func, *args, **kwargs))
+
+
+def shutdown_cpu_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
@@ -16,40 +16,95 @@ class Settings(BaseSettings):
     # =================================
     # INFRASTRUCTURE PATHS
     # =================================
-    bm25_path: str = Field("/indexes/bm25.pkl", alias="BM25_PATH")
-    bm25_corpus_path: str = Field("/indexes/bm25_corpus.npy", alias="BM25_CORPUS_PATH")
+    bm25_index_dir: str = Field("/indexes/bm25", alias="BM25_INDEX_DIR")
+    bm25_corpus_path: str = Field("/indexes/bm25_corpus", alias="BM25_CORPUS_PATH")
+    payload_store_dir: str = Field("/indexes/payloads", alias="PAYLOAD_STORE_DIR")
+    index_manifest_path: str = Field("/indexes/manifest.json", alias="INDEX_MANIFEST_PATH")
+    index_root: str = Field("/indexes", alias="INDEX_ROOT")
+    index_generations_keep: int = Field(2, alias="INDEX_GENERATIONS_KEEP")
+    qdrant_collection: str = Field("fallos", alias="QDRANT_COLLECTION")
+    retriever_drain_timeout: float = Field(60.0, alias="RETRIEVER_DRAIN_TIMEOUT")
+    onnx_model_dir: str = Field("/indexes/onnx", alias="ONNX_MODEL_DIR")
+    corpus_compression: Literal["none", "zstd"] = Field("none", alias="CORPUS_COMPRESSION")
+    
+    # Colección Qdrant (ver search/qdrant_config.py): almacenamiento de vectores, HNSW y segmentos
+    qdrant_quantization: Literal["none", "int8"] = Field("none", alias="QDRANT_QUANTIZATION")
+    qdrant_on_disk: bool = Field(False, alias="QDRANT_ON_DISK")
+    qdrant_hnsw_m: int = Field(16, alias="QDRANT_HNSW_M")
+    qdrant_hnsw_ef_construct: int = Field(100, alias="QDRANT_HNSW_EF_CONSTRUCT")
+    qdrant_hnsw_on_disk: bool = Field(False, alias="QDRANT_HNSW_ON_DISK")
+    qdrant_segment_number: int = Field(0, alias="QDRANT_SEGMENT_NUMBER")
+    qdrant_max_segment_size: int = Field(0, alias="QDRANT_MAX_SEGMENT_SIZE")
+    # Búsqueda: ef de HNSW (0 = el de la colección), búsqueda exacta y rescoring de int8
+    qdrant_search_ef: int = Field(0, alias="QDRANT_SEARCH_EF")
+    qdrant_search_exact: bool = Field(False, alias="QDRANT_SEARCH_EXACT")
+    qdrant_quantization_rescore: bool = Field(True, alias="QDRANT_QUANTIZATION_RESCORE")
+    qdrant_quantization_oversampling: float = Field(2.0, alias="QDRANT_QUANTIZATION_OVERSAMPLING")
+    # Reporte recall vs latencia al terminar un build completo (0 = no generarlo)
+    qdrant_recall_report_queries: int = Field(100, alias="QDRANT_RECALL_REPORT_QUERIES")
     
     # =================================
     # FACTORY CONFIGURATIONS
     # =================================
     
     # Strategy Selection
-    processing_mode: Literal["standard", "enriched"] = Field("standard", alias="PROCESSING_MODE")
+    processing_mode: Literal["standard", "enriched", "parallel", "streaming"] = Field("standard", alias="PROCESSING_MODE")
     search_strategy: Literal["hybrid", "hybrid_enriched"] = Field("hybrid", alias="SEARCH_STRATEGY") 
     llm_provider: Literal["azure"] = Field("azure", alias="LLM_PROVIDER")
     rag_strategy: Literal["standard", "enriched"] = Field("standard", alias="RAG_STRATEGY")
     
+    # Inference Backend (torch | onnx, con fallback a torch si faltan los modelos exportados)
+    inference_backend: Literal["torch", "onnx"] = Field("torch", alias="INFERENCE_BACKEND")
+    onnx_quantize: bool = Field(True, alias="ONNX_QUANTIZE")
+    
     # Data Processing Parameters
     max_paragraph_length: int = Field(300, alias="MAX_PARAGRAPH_LENGTH")
     processing_batch_size: int = Field(1000, alias="PROCESSING_BATCH_SIZE")
+    # Modo parallel: esquema de los párrafos, procesos (0 = todos los cores) y archivos por tarea
+    parallel_base_mode: Literal["standard", "enriched"] = Field("enriched", alias="PARALLEL_BASE_MODE")
+    processing_workers: int = Field(0, alias="PROCESSING_WORKERS")
+    processing_files_per_task: int = Field(16, alias="PROCESSING_FILES_PER_TASK")
+    # Modo streaming: corpus NDJSON pre-aplanado (python -m backend.data.ndjson)
+    streaming_corpus_path: str = Field("/datasets/fallos.ndjson", alias="STREAMING_CORPUS_PATH")
     embedding_batch_size: int = Field(64, alias="EMBEDDING_BATCH_SIZE")
     upload_batch_size: int = Field(500, alias="UPLOAD_BATCH_SIZE")
+    # Cache persistente de embeddings por contenido (solo se codifican los párrafos nuevos)
+    embedding_cache_enabled: bool = Field(True, alias="EMBEDDING_CACHE_ENABLED")
+    embedding_cache_dir: str = Field("/indexes/embedding_cache", alias="EMBEDDING_CACHE_DIR")
     
     # Search Parameters
     dense_search_limit: int = Field(30, alias="DENSE_SEARCH_LIMIT")
     lexical_search_limit: int = Field(30, alias="LEXICAL_SEARCH_LIMIT")
+    lexical_engine: Literal["exhaustive", "maxscore"] = Field("maxscore", alias="LEXICAL_ENGINE")
+    parallel_search_legs: bool = Field(True, alias="PARALLEL_SEARCH_LEGS")
+    fusion_strategy: Literal["rrf", "minmax", "zscore", "combsum"] = Field("rrf", alias="FUSION_STRATEGY")
+    fusion_rrf_k: int = Field(60, alias="FUSION_RRF_K")
+    fusion_dense_weight: float = Field(1.0, alias="FUSION_DENSE_WEIGHT")
+    fusion_lexical_weight: float = Field(1.0, alias="FUSION_LEXICAL_WEIGHT")
+    citation_filter_enabled: bool = Field(True, alias="CITATION_FILTER_ENABLED")
+    citation_filter_min_hits: int = Field(3, alias="CITATION_FILTER_MIN_HITS")
+    cpu_pool_workers: int = Field(4, alias="CPU_POOL_WORKERS")
     enable_reranking: bool = Field(True, alias="ENABLE_RERANKING")
+    rerank_batch_size: int = Field(32, alias="RERANK_BATCH_SIZE")
+    rerank_top_m: int = Field(0, alias="RERANK_TOP_M")  # 0 = re-rankear todos los candidatos
     enable_query_caching: bool = Field(True, alias="ENABLE_QUERY_CACHING")
+    cache_backend: Literal["sqlite", "local"] = Field("sqlite", alias="CACHE_BACKEND")
+    cache_path: str = Field("/indexes/cache/shared_cache.sqlite3", alias="CACHE_PATH")
+    cache_max_entries: int = Field(200_000, alias="CACHE_MAX_ENTRIES")
     
     # LLM Parameters
     llm_max_tokens: int = Field(300, alias="LLM_MAX_TOKENS")
     llm_temperature: float = Field(0.1, alias="LLM_TEMPERATURE")
     llm_timeout: int = Field(30, alias="LLM_TIMEOUT")
     llm_max_retries: int = Field(3, alias="LLM_MAX_RETRIES")
+    llm_batch_concurrency: int = Field(4, alias="LLM_BATCH_CONCURRENCY")
     
     # RAG Parameters
     max_results_per_query: int = Field(8, alias="MAX_RESULTS_PER_QUERY")
     rag_enable_streaming: bool = Field(False, alias="RAG_ENABLE_STREAMING")
+    answer_cache_enabled: bool = Field(True, alias="ANSWER_CACHE_ENABLED")
+    answer_cache_threshold: float = Field(0.95, alias="ANSWER_CACHE_THRESHOLD")
+    answer_cache_ttl: int = Field(3600, alias="ANSWER_CACHE_TTL")
     
     # Performance & System
     max_memory_usage_percent: int = Field(80, alias="MAX_MEMORY_USAGE_PERCENT")
@@ -59,6 +114,9 @@ class Settings(BaseSettings):
     # PERFORMANCE OPTIMIZATION
     # =================================
     query_timeout: int = Field(45, alias="QUERY_TIMEOUT")
+    warmup_on_startup: bool = Field(True, alias="WARMUP_ON_STARTUP")
+    metrics_enabled: bool = Field(True, alias="METRICS_ENABLED")
+    metrics_window: int = Field(2048, alias="METRICS_WINDOW")
     enable_fast_mode: bool = Field(True, alias="ENABLE_FAST_MODE")
     skip_slow_reranking: bool = Field(False, alias="SKIP_SLOW_RERANKING")
     cache_size_limit: int = Field(200, alias="CACHE_SIZE_LIMIT")
@@ -71,6 +129,7 @@ class Settings(BaseSettings):
     class Config:
         env_file = ".env"
         case_sensitive = False
+        extra = "ignore"  # .env viejos con BM25_PATH no rompen el arranque
 
 # Singleton pattern
 _settings = None
@@ -112,6 +171,8 @@ def get_search_config() -> dict:
     return {
         "k_dense": settings.dense_search_limit,
         "k_lex": settings.lexical_search_limit,
+        "lexical_engine": settings.lexical_engine,
+        "fusion": settings.fusion_strategy,
         "enable_reranking": settings.enable_reranking,
         "enable_caching": settings.enable_query_caching
     }
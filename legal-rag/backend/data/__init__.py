@@ -1,7 +1,8 @@
 from .models import LegalParagraph, QueryRequest, QueryResponse, Hit, ProcessingStats
 
 # Factory principal
-from .factory import get_processor, get_available_modes, get_default_mode, iter_paragraphs
+from .factory import get_processor, get_available_modes, get_default_mode, iter_paragraphs, iter_paragraph_batches
+from .batch import DocumentTable, ParagraphBatch
 
 # Acceso directo a procesadores
 from .processing import StandardProcessor
@@ -20,6 +21,11 @@ __all__ = [
     "get_available_modes",
     "get_default_mode",
     "iter_paragraphs",          # Función de conveniencia
+    "iter_paragraph_batches",   # Párrafos en batches columnares (indexación)
+    
+    # Batches columnares
+    "ParagraphBatch",
+    "DocumentTable",
     
     # Procesadores directos
     "StandardProcessor",
@@ -0,0 +1,183 @@
+"""
+Representación columnar de párrafos para la indexación
+
+Construir un modelo pydantic por párrafo y después model_dump() para cada payload dominaba
+el build, y en modo enriched cada párrafo llevaba su propia copia de metadatos, artículos
+citados, materia e idea central del fallo. Acá:
+
+- DocumentTable: una fila por expediente con los campos del fallo, validados una sola vez
+  con document_model del procesador (None en standard: el fallo no tiene campos propios).
+- ParagraphBatch: struct-of-arrays (listas, con __slots__) con expediente, section,
+  paragraph_id, text, path y doc_row, la fila de su fallo en la tabla de documentos.
+
+Los payloads de párrafo solo llevan sus campos propios y el expediente es la referencia al
+documento (ver search/documents.py). full_payload(i) reconstruye el model_dump() del modelo
+por párrafo, con una diferencia: si el mismo expediente aparece en más de un archivo, todos sus
+párrafos llevan los campos de la primera aparición (antes cada uno llevaba los de su archivo). Con strip_fields del procesador se aplica la misma
+normalización que los validators de LegalParagraph (strip de expediente y texto, sin
+párrafos si el expediente queda vacío); LegalParagraphEnriched no la tiene.
+"""
+import json
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+logger = logging.getLogger(__name__)
+
+PARAGRAPH_FIELDS = ("expediente", "section", "paragraph_id", "text", "path")
+
+
+class DocumentTable:
+    """Campos de cada fallo, una fila por expediente"""
+
+    __slots__ = ("expedientes", "records", "_rows")
+
+    def __init__(self):
+        self.expedientes: List[str] = []
+        self.records: List[Dict[str, Any]] = []
+        self._rows: Dict[str, int] = {}
+
+    def add(self, expediente: str, fields: Dict[str, Any]) -> int:
+        """Fila del expediente (si ya estaba se conservan los campos de la primera vez)"""
+        row = self._rows.get(expediente)
+        if row is None:
+            row = self._rows[expediente] = len(self.expedientes)
+            self.expedientes.append(expediente)
+            self.records.append(fields)
+        return row
+
+    def __len__(self) -> int:
+        return len(self.expedientes)
+
+    def __iter__(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        return iter(zip(self.expedientes, self.records))
+
+
+class ParagraphBatch:
+    """Párrafos en columnas más la tabla de documentos a la que referencian"""
+
+    __slots__ = PARAGRAPH_FIELDS + ("doc_row", "documents")
+
+    def __init__(self, documents: DocumentTable = None):
+        self.expediente: List[str] = []
+        self.section: List[str] = []
+        self.paragraph_id: List[int] = []
+        self.text: List[str] = []
+        self.path: List[str] = []
+        self.doc_row: List[int] = []
+        self.documents = documents if documents is not None else DocumentTable()
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def append(self, expediente: str, section: str, paragraph_id: int, text: str, path: str, doc_row: int):
+        self.expediente.append(expediente)
+        self.section.append(section)
+        self.paragraph_id.append(paragraph_id)
+        self.text.append(text)
+        self.path.append(path)
+        self.doc_row.append(doc_row)
+
+    def extend(self, other: "ParagraphBatch"):
+        """Agrega los párrafos de otra batch (sus documentos se suman a esta tabla)"""
+        rows = [self.documents.add(e, fields) for e, fields in other.documents]
+        for name in PARAGRAPH_FIELDS:
+            getattr(self, name).extend(getattr(other, name))
+        self.doc_row.extend(rows[r] for r in other.doc_row)
+
+    def take(self, indices: Iterable[int]) -> "ParagraphBatch":
+        """Subconjunto de párrafos (comparte la tabla de documentos)"""
+        batch = ParagraphBatch(self.documents)
+        for i in indices:
+            batch.append(self.expediente[i], self.section[i], self.paragraph_id[i], self.text[i], self.path[i], self.doc_row[i])
+        return batch
+
+    def payload(self, i: int) -> Dict[str, Any]:
+        """Payload del párrafo i, sin los campos del fallo"""
+        return {name: getattr(self, name)[i] for name in PARAGRAPH_FIELDS}
+
+    def payloads(self) -> List[Dict[str, Any]]:
+        return [
+            {"expediente": e, "section": s, "paragraph_id": i, "text": t, "path": p}
+            for e, s, i, t, p in zip(self.expediente, self.section, self.paragraph_id, self.text, self.path)
+        ]
+
+    def document(self, i: int) -> Dict[str, Any]:
+        """Campos del fallo del párrafo i"""
+        return self.documents.records[self.doc_row[i]]
+
+    def full_payload(self, i: int) -> Dict[str, Any]:
+        """Payload con los campos del fallo, igual al model_dump() del modelo del procesador"""
+        return {**self.payload(i), **self.document(i)}
+
+
+def add_document(processor, batch: ParagraphBatch, doc: dict, path: str) -> Tuple[str, int]:
+    """Agrega los párrafos de un fallo; devuelve su expediente y cuántos párrafos aportó"""
+    expte = processor._extract_expediente(doc=doc)
+    fields = processor._document_fields(doc)
+    if processor.document_model is not None:
+        try:
+            fields = processor.document_model.model_validate(fields).model_dump()
+        except ValidationError:
+            return expte, 0
+    strip = processor.strip_fields
+    expediente = expte.strip() if strip else expte
+    if not expediente:
+        return expte, 0
+
+    row, added = None, 0
+    for section, idx, text in processor._iter_texts(doc):
+        if row is None:
+            row = batch.documents.add(expediente, fields)
+        batch.append(expediente, section, idx, text.strip() if strip else text, path, row)
+        added += 1
+    return expte, added
+
+
+def parse_file(processor, batch: ParagraphBatch, file_path: Path, base_dir: Path,
+               loads: Callable[[bytes], Any] = json.loads) -> Tuple[List[str], int, Optional[str]]:
+    """
+    Agrega a la batch los párrafos de un JSON
+
+    Returns:
+        (expedientes, párrafos agregados, error). Ante un error quedan los párrafos de los
+        fallos anteriores del archivo, como en process_files.
+    """
+    exptes, added = [], 0
+    try:
+        docs = loads(file_path.read_bytes())
+        if not isinstance(docs, list):
+            docs = [docs]
+        path = file_path.relative_to(base_dir).as_posix()
+        for doc in docs:
+            expte, n = add_document(processor, batch, doc, path)
+            exptes.append(expte)
+            added += n
+    except Exception as e:
+        return exptes, added, f"Error en {file_path.name}: {str(e)}"
+    return exptes, added, None
+
+
+def record_file(stats: dict, exptes: List[str], added: int, error: Optional[str]):
+    """Estadísticas del procesador para un archivo parseado con parse_file"""
+    stats["expedientes_found"].update(exptes)
+    stats["paragraphs_extracted"] += added
+    if error is None:
+        stats["files_processed"] += 1
+    else:
+        logger.error(error)
+        stats["errors"].append(error)
+
+
+def iter_batches(processor, json_files: Iterable[Path], base_dir: Path, batch_size: int) -> Iterator[ParagraphBatch]:
+    """Batches de al menos batch_size párrafos (salvo la última), sin cortar un archivo entre dos"""
+    batch = ParagraphBatch()
+    for file_path in json_files:
+        record_file(processor.stats, *parse_file(processor, batch, Path(file_path), base_dir))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = ParagraphBatch()
+    if len(batch):
+        yield batch
@@ -14,8 +14,8 @@ def get_processor(mode: str = None, **kwargs):
     processors = {
         "standard": lambda: _import_standard(),
         "enriched": lambda: _import_enriched(),
-        # "parallel": lambda: _import_parallel(),    # ← Futuro
-        # "streaming": lambda: _import_streaming(),  # ← Futuro
+        "parallel": lambda: _import_parallel(),
+        "streaming": lambda: _import_streaming(),
     }
     
     if mode not in processors:
@@ -36,17 +36,31 @@ def _import_enriched():
     from .processing.enriched import EnrichedProcessor
     return EnrichedProcessor
 
+def _import_parallel():
+    """Lazy import de ParallelProcessor"""
+    from .processing.parallel import ParallelProcessor
+    return ParallelProcessor
+
+def _import_streaming():
+    """Lazy import de StreamingProcessor"""
+    from .processing.streaming import StreamingProcessor
+    return StreamingProcessor
+
 def get_available_modes():
     """Retorna modos disponibles"""
-    return ["standard", "enriched"]
+    return ["standard", "enriched", "parallel", "streaming"]
 
 def get_default_mode():
     """Retorna modo por defecto"""
     return settings.processing_mode
 
 # Función de conveniencia sin wrapper complejo
-def iter_paragraphs(json_dir, mode: str = "standard"):
-    """Función de conveniencia para procesamiento rápido"""
+def iter_paragraphs(json_dir, mode: str = "standard", files=None):
+    """
+    Función de conveniencia para procesamiento rápido
+
+    Con `files` solo se procesan esos archivos (rutas dentro de json_dir).
+    """
     if isinstance(json_dir, str):
         json_dir = Path(json_dir)
     
@@ -54,6 +68,40 @@ def iter_paragraphs(json_dir, mode: str = "standard"):
         raise ValueError(f"Modo '{mode}' no disponible. Opciones: {get_available_modes()}")
     
     processor = get_processor(mode)
+    if files is not None:
+        logger.info(f"📊 Processing {len(files)} files from {json_dir} with mode '{mode}'")
+        yield from processor.process_files([Path(f) for f in files], json_dir)
+        return
+    
     logger.info(f"📊 Processing directory {json_dir} with mode '{mode}'")
     
-    yield from processor.process_directory(json_dir)
\ No newline at end of file
+    yield from processor.process_directory(json_dir)
+
+def iter_paragraph_batches(json_dir, mode: str = "standard", files=None, batch_size: int = settings.processing_batch_size):
+    """
+    Párrafos en ParagraphBatch columnares de al menos batch_size párrafos (salvo la última)
+
+    Los campos de cada fallo van una sola vez en la tabla de documentos de la batch en lugar
+    de repetirse en cada párrafo (ver data/batch.py). Con `files` solo se procesan esos archivos.
+    """
+    if isinstance(json_dir, str):
+        json_dir = Path(json_dir)
+    
+    if mode not in get_available_modes():
+        raise ValueError(f"Modo '{mode}' no disponible. Opciones: {get_available_modes()}")
+    
+    processor = get_processor(mode)
+    if files is not None:
+        logger.info(f"📊 Processing {len(files)} files from {json_dir} with mode '{mode}' (batches)")
+        yield from processor.process_batches([Path(f) for f in files], json_dir, batch_size)
+        return
+    
+    logger.info(f"📊 Processing directory {json_dir} with mode '{mode}' (batches)")
+    if mode == "streaming":
+        # Los párrafos salen del corpus NDJSON, no del árbol de JSON
+        yield from processor.process_directory_batches(json_dir, batch_size)
+        return
+    json_files = sorted(json_dir.rglob("*.json"))
+    logger.info(f"📄 Encontrados {len(json_files)} archivos")
+    yield from processor.process_batches(json_files, json_dir, batch_size)
+    logger.info(f"✅ Procesamiento completado: {processor.get_stats()}")
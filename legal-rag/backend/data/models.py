@@ -74,6 +74,7 @@ class QueryResponse(BaseModel):
     total_time: float = Field(..., ge=0, description="Tiempo total de procesamiento en segundos")
     search_time: float = Field(..., ge=0, description="Tiempo de búsqueda en segundos")
     llm_time: float = Field(..., ge=0, description="Tiempo de generación LLM en segundos")
+    stages: Dict[str, float] = Field(default_factory=dict, description="Tiempo por etapa del pipeline en segundos (encode, dense_search, bm25, rerank, llm, ...)")
     timestamp: datetime = Field(default_factory=datetime.now, description="Timestamp de la consulta")
     
     class Config:
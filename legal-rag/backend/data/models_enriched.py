@@ -26,3 +26,11 @@ class LegalParagraphEnriched(BaseModel):
             "materia_preliminar": self.materia_preliminar,
             "metadatos": self.metadatos
         }
+
+
+class EnrichedDocument(BaseModel):
+    """Campos de un fallo compartidos por todos sus párrafos (tabla de documentos, ver data/batch.py)"""
+    idea_central: Optional[str] = Field(None, description="Idea central del fallo")
+    articulos_citados: Optional[List[Dict[str, Any]]] = Field(None, description="Artículos citados en el fallo")
+    materia_preliminar: Optional[str] = Field(None, description="Materia preliminar del fallo")
+    metadatos: Optional[Dict[str, Any]] = Field(None, description="Metadatos adicionales del fallo")
@@ -0,0 +1,209 @@
+"""
+Corpus NDJSON pre-aplanado para el modo streaming
+
+Cada build volvía a parsear el árbol de fallos JSON jerárquicos (datasets/fallos_json). El
+corpus NDJSON guarda los párrafos ya extraídos y normalizados, un registro por línea:
+
+    {"type": "header", "format": "legal-rag-ndjson-v2", "base_mode": "enriched", ...}
+    {"type": "file", "path": "2024/04/12345.json", "hash": "..."}
+    ...
+    {"type": "document", "expediente": "...", "fields": {...}}
+    {"expediente": "...", "section": "...", "paragraph_id": 0, "text": "...", "path": "..."}
+    ...
+
+Cada registro de documento (campos del fallo, ver data/batch.py) precede a sus párrafos, que
+no los repiten. `path` sigue siendo la ruta del JSON original, así que el manifest de la
+indexación incremental no cambia. Los registros `file` (todos al principio) guardan el hash
+de cada JSON convertido: en modo streaming el manifest se arma con esos hashes y se comparan
+con el árbol de JSON para detectar un corpus desactualizado. Con sufijo .zst el archivo se comprime con zstandard
+(opcional: `pip install zstandard`).
+
+Conversión desde el árbol de JSON (mismos párrafos que el modo indicado):
+
+    python -m backend.data.ndjson /datasets/fallos_json /datasets/fallos.ndjson --mode enriched
+"""
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+from backend.config import get_settings
+from .batch import ParagraphBatch
+
+try:
+    import orjson
+except ImportError:  # opcional: `pip install orjson`
+    orjson = None
+
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+FORMAT = "legal-rag-ndjson-v2"
+
+
+def file_hash(path: Path) -> str:
+    """Hash del contenido de un archivo"""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def dumps(record: Dict[str, Any]) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(record)
+    return json.dumps(record, ensure_ascii=False).encode("utf-8")
+
+
+def loads(line: bytes) -> Dict[str, Any]:
+    if orjson is not None:
+        try:
+            return orjson.loads(line)
+        except orjson.JSONDecodeError:
+            pass  # json acepta algunas cosas que orjson no (NaN, Infinity)
+    return json.loads(line)
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("Los corpus .zst requieren el paquete zstandard (`pip install zstandard`)") from e
+    return zstandard
+
+
+@contextmanager
+def open_corpus(path: Path, write: bool = False):
+    """Archivo binario del corpus, con (de)compresión zstd en streaming si termina en .zst"""
+    path = Path(path)
+    with open(path, "wb" if write else "rb") as raw:
+        if path.suffix != ".zst":
+            yield raw
+        elif write:
+            with _zstd().ZstdCompressor(level=3).stream_writer(raw, closefd=False) as f:
+                yield f
+        else:
+            with _zstd().ZstdDecompressor().stream_reader(raw, closefd=False) as reader:
+                yield io.BufferedReader(reader, buffer_size=1 << 20)
+
+
+def iter_corpus(path: Path) -> Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]:
+    """Header del corpus y un iterador sobre el resto de los registros (decodifica línea por línea)"""
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(2, "Corpus NDJSON no encontrado (generarlo con `python -m backend.data.ndjson`)", str(path))
+
+    with open_corpus(path) as f:
+        header = loads(f.readline() or b"{}")
+    if header.get("format") != FORMAT:
+        raise ValueError(f"{path} no es un corpus {FORMAT} (header: {header}); regenerarlo con `python -m backend.data.ndjson`")
+
+    def records() -> Iterator[Dict[str, Any]]:
+        with open_corpus(path) as f:
+            f.readline()
+            for n, line in enumerate(f, start=2):
+                if line.strip():
+                    try:
+                        yield loads(line)
+                    except ValueError as e:
+                        yield {"type": "error", "error": f"Error en {path.name}:{n}: {e}"}
+
+    return header, records()
+
+
+def corpus_hashes(path: Path) -> Dict[str, str]:
+    """Hash de cada JSON convertido, por ruta relativa (registros `file` del principio del corpus)"""
+    _, records = iter_corpus(path)
+    hashes = {}
+    for record in records:
+        if record.get("type") != "file":
+            break
+        hashes[record["path"]] = record["hash"]
+    records.close()
+    return hashes
+
+
+def _file_lines(json_files: List[Path], json_dir: Path) -> bytes:
+    """Registros con el hash de cada archivo a convertir"""
+    return b"".join(
+        dumps({"type": "file", "path": p.relative_to(json_dir).as_posix(), "hash": file_hash(p)}) + b"\n"
+        for p in json_files
+    )
+
+
+def _batch_lines(batch: ParagraphBatch) -> bytes:
+    """Registros de una batch: el documento de cada tramo de párrafos y luego los párrafos"""
+    lines, last = [], None
+    for i, row in enumerate(batch.doc_row):
+        if row != last:
+            lines.append(dumps({"type": "document", "expediente": batch.documents.expedientes[row],
+                                "fields": batch.documents.records[row]}))
+            last = row
+        lines.append(dumps(batch.payload(i)))
+    return b"\n".join(lines) + b"\n"
+
+
+def write_corpus(json_dir: Path, out_path: Path, mode: str = settings.parallel_base_mode,
+                 batch_size: int = settings.processing_batch_size) -> dict:
+    """
+    Convierte el árbol de JSON en un corpus NDJSON
+
+    Los párrafos salen de process_batches del modo indicado (standard, enriched o parallel), en
+    orden de ruta, después del hash de cada archivo. Se escribe a un archivo temporal y se
+    reemplaza al final.
+    """
+    from .factory import get_processor
+
+    json_dir, out_path = Path(json_dir), Path(out_path)
+    processor = get_processor(mode)
+    base_mode = getattr(processor, "base_mode", mode)
+    json_files = sorted(json_dir.rglob("*.json"))
+    logger.info(f"📄 Convirtiendo {len(json_files)} archivos de {json_dir} ({mode}) → {out_path}")
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_name(f".tmp-{out_path.name}")  # conserva el sufijo (.zst)
+    paragraphs = 0
+    try:
+        with open_corpus(tmp_path, write=True) as f:
+            f.write(dumps({"type": "header", "format": FORMAT, "base_mode": base_mode,
+                           "source": json_dir.as_posix(), "files": len(json_files), "created": time.time()}) + b"\n")
+            f.write(_file_lines(json_files, json_dir))
+            for batch in processor.process_batches(json_files, json_dir, batch_size):
+                f.write(_batch_lines(batch))
+                paragraphs += len(batch)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, out_path)
+
+    return {**processor.get_stats(), "base_mode": base_mode, "paragraphs": paragraphs,
+            "size_mb": round(out_path.stat().st_size / (1024**2), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convierte los fallos JSON en un corpus NDJSON para PROCESSING_MODE=streaming")
+    parser.add_argument("json_dir", type=Path, help="Directorio de fallos JSON (p. ej. /datasets/fallos_json)")
+    parser.add_argument("out", type=Path, nargs="?", default=Path(settings.streaming_corpus_path),
+                        help="Corpus de salida (.ndjson o .ndjson.zst); por defecto STREAMING_CORPUS_PATH")
+    parser.add_argument("--mode", default=settings.parallel_base_mode, choices=["standard", "enriched", "parallel"],
+                        help="Modo que extrae los párrafos (parallel usa PARALLEL_BASE_MODE)")
+    parser.add_argument("--batch-size", type=int, default=settings.processing_batch_size)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    start = time.time()
+    stats = write_corpus(args.json_dir, args.out, args.mode, args.batch_size)
+    print(f"✅ Corpus {args.out} en {time.time() - start:.1f}s: {stats['paragraphs']:,} párrafos, "
+          f"{stats['files_processed']:,} archivos, {stats['errors']} errores, {stats['size_mb']:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
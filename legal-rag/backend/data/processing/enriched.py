@@ -1,15 +1,20 @@
 from pathlib import Path
 import json
 import logging
-from typing import Iterator, Set, Dict, Any
+from typing import Iterable, Iterator, Set, Dict, Any, Tuple
 from pydantic import ValidationError
 
-from ..models_enriched import LegalParagraphEnriched
+from ..batch import ParagraphBatch, iter_batches
+from ..models_enriched import EnrichedDocument, LegalParagraphEnriched
 
 logger = logging.getLogger(__name__)
 
 class EnrichedProcessor:
     """Procesador que extrae fragmentos enriquecidos de los fallos JSON"""
+    model = LegalParagraphEnriched
+    document_model = EnrichedDocument
+    strip_fields = False  # LegalParagraphEnriched no normaliza expediente ni texto
+
     def __init__(self):
         self.stats = {
             "files_processed": 0,
@@ -22,16 +27,24 @@ class EnrichedProcessor:
         """Procesa todos los archivos JSON en el directorio y subdirectorios"""
         json_files = list(json_dir.rglob("*.json"))
         logger.info(f"📄 Encontrados {len(json_files)} archivos")
+        yield from self.process_files(json_files, json_dir)
+        logger.info(f"✅ Procesamiento completado: {self.stats}")
+
+    def process_batches(self, json_files: Iterable[Path], base_dir: Path, batch_size: int) -> Iterator[ParagraphBatch]:
+        """Como process_files pero en lotes columnares: los campos del fallo van una vez en la tabla de documentos"""
+        yield from iter_batches(self, json_files, base_dir, batch_size)
+
+    def process_files(self, json_files: Iterable[Path], base_dir: Path) -> Iterator[LegalParagraphEnriched]:
+        """Procesa solo los archivos indicados (indexación incremental)"""
         for file_path in json_files:
             try:
-                yield from self._process_file(file_path, json_dir)
+                yield from self._process_file(file_path, base_dir)
                 self.stats["files_processed"] += 1
             except Exception as e:
                 error_msg = f"Error en {file_path.name}: {str(e)}"
                 logger.error(error_msg)
                 self.stats["errors"].append(error_msg)
                 continue
-        logger.info(f"✅ Procesamiento completado: {self.stats}")
 
     def _process_file(self, file_path: Path, base_dir: Path) -> Iterator[LegalParagraphEnriched]:
         content = file_path.read_text(encoding="utf-8")
@@ -42,35 +55,40 @@ class EnrichedProcessor:
             yield from self._process_document(doc, file_path, base_dir)
 
     def _process_document(self, doc: Dict[str, Any], file_path: Path, base_dir: Path) -> Iterator[LegalParagraphEnriched]:
-        contenido = doc["CONTENIDO"]
         expte = self._extract_expediente(doc=doc)
-        idea_central = doc.get("IDEA_CENTRAL")
-        articulos_citados = doc.get("METADATOS", {}).get("ARTICULOS_CITADOS", {}).get("citations", [])
-        materia_preliminar = doc.get("MATERIA_PRELIMINAR")
-        metadatos = doc.get("METADATOS", {})
         self.stats["expedientes_found"].add(expte)
-        for section, paragraphs in contenido.items():
+        for fields in self._paragraph_fields(doc, expte, file_path.relative_to(base_dir).as_posix()):
+            try:
+                paragraph = self.model(**fields)
+                self.stats["paragraphs_extracted"] += 1
+                yield paragraph
+            except ValidationError:
+                continue
+
+    def _paragraph_fields(self, doc: Dict[str, Any], expte: str, path: str) -> Iterator[Dict[str, Any]]:
+        """Campos de cada párrafo del documento, sin validar (ver también ParallelProcessor)"""
+        shared = self._document_fields(doc)
+        for section, idx, text in self._iter_texts(doc):
+            yield {"expediente": expte, "section": section, "paragraph_id": idx, "text": text, "path": path, **shared}
+
+    def _document_fields(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Campos del fallo que comparten todos sus párrafos"""
+        return {
+            "idea_central": doc.get("IDEA_CENTRAL"),
+            "articulos_citados": doc.get("METADATOS", {}).get("ARTICULOS_CITADOS", {}).get("citations", []),
+            "materia_preliminar": doc.get("MATERIA_PRELIMINAR"),
+            "metadatos": doc.get("METADATOS", {})
+        }
+
+    def _iter_texts(self, doc: Dict[str, Any]) -> Iterator[Tuple[str, int, str]]:
+        """(sección, índice, texto) de los párrafos con contenido"""
+        for section, paragraphs in doc["CONTENIDO"].items():
             if not isinstance(paragraphs, list):
                 continue
             for idx, text in enumerate(paragraphs):
                 if not text or not isinstance(text, str) or len(text.strip()) < 10:
                     continue
-                try:
-                    paragraph = LegalParagraphEnriched(
-                        expediente=expte,
-                        section=section,
-                        paragraph_id=idx,
-                        text=text,
-                        path=file_path.relative_to(base_dir).as_posix(),
-                        idea_central=idea_central,
-                        articulos_citados=articulos_citados,
-                        materia_preliminar=materia_preliminar,
-                        metadatos=metadatos
-                    )
-                    self.stats["paragraphs_extracted"] += 1
-                    yield paragraph
-                except ValidationError:
-                    continue
+                yield section, idx, text
 
     def _extract_expediente(self, doc: dict) -> str:
         """Extrae el expediente desde METADATOS['ID_FALLO']. Lanza error si no existe."""
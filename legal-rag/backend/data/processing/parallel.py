@@ -0,0 +1,200 @@
+"""
+Procesador paralelo: reparte los JSON entre procesos
+
+Con miles de fallos el build pasaba la mayor parte del tiempo en json.loads y en construir
+un modelo pydantic por párrafo, todo en un solo core. Acá:
+
+- Los archivos (ordenados por ruta) se reparten en tareas de PROCESSING_FILES_PER_TASK
+  archivos entre PROCESSING_WORKERS procesos.
+- Cada proceso parsea con orjson (json si no está instalado) y valida los párrafos de cada
+  archivo en bloque con un TypeAdapter; solo si el bloque falla se valida uno por uno para
+  descartar los inválidos, como los procesadores secuenciales.
+- Los resultados se devuelven en el orden de los archivos, con a lo sumo 2 tareas por
+  proceso en vuelo: la salida es determinística (mismos párrafos duplicados descartados,
+  mismos point ids) y la memoria no crece si el consumidor (embeddings) es más lento.
+
+Los campos de cada párrafo salen de _paragraph_fields del procesador base (PARALLEL_BASE_MODE),
+así que los párrafos son los mismos que con el modo secuencial equivalente. process_batches
+hace lo mismo pero cada proceso devuelve una ParagraphBatch (data/batch.py) en lugar de modelos.
+"""
+import json
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from backend.config import get_settings
+from ..batch import ParagraphBatch, parse_file, record_file
+
+try:
+    import orjson
+except ImportError:  # opcional: `pip install orjson`
+    orjson = None
+
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+# (párrafos validados, expedientes, error) de un archivo
+FileResult = Tuple[List[BaseModel], List[str], Optional[str]]
+
+
+def _loads(data: bytes):
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass  # json acepta algunas cosas que orjson no (NaN, Infinity)
+    return json.loads(data)
+
+
+@lru_cache(maxsize=None)
+def _base_processor(base_mode: str):
+    if base_mode == "enriched":
+        from .enriched import EnrichedProcessor
+        return EnrichedProcessor()
+    from .standard import StandardProcessor
+    return StandardProcessor()
+
+
+@lru_cache(maxsize=None)
+def _adapter(model: type) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def _validate(model: type, rows: List[dict]) -> List[BaseModel]:
+    """Validación en bloque; si algún párrafo es inválido, uno por uno descartando los inválidos"""
+    try:
+        return _adapter(model).validate_python(rows)
+    except ValidationError:
+        valid = []
+        for row in rows:
+            try:
+                valid.append(model(**row))
+            except ValidationError:
+                continue
+        return valid
+
+
+def _parse_file(processor, file_path: Path, base_dir: Path) -> FileResult:
+    """Párrafos de un archivo; ante un error se conservan los de los documentos anteriores"""
+    rows, exptes, error = [], [], None
+    try:
+        docs = _loads(file_path.read_bytes())
+        if not isinstance(docs, list):
+            docs = [docs]
+        path = file_path.relative_to(base_dir).as_posix()
+        for doc in docs:
+            expte = processor._extract_expediente(doc=doc)
+            exptes.append(expte)
+            rows.extend(processor._paragraph_fields(doc, expte, path))
+    except Exception as e:
+        error = f"Error en {file_path.name}: {str(e)}"
+    return _validate(processor.model, rows), exptes, error
+
+
+def _parse_files(base_mode: str, base_dir: str, paths: List[str]) -> List[FileResult]:
+    """Tarea de un proceso del pool"""
+    processor = _base_processor(base_mode)
+    return [_parse_file(processor, Path(p), Path(base_dir)) for p in paths]
+
+
+def _parse_batch(base_mode: str, base_dir: str, paths: List[str]) -> Tuple[ParagraphBatch, list]:
+    """Tarea de un proceso del pool en modo columnar: una batch y (expedientes, párrafos, error) por archivo"""
+    processor = _base_processor(base_mode)
+    batch = ParagraphBatch()
+    results = [parse_file(processor, batch, Path(p), Path(base_dir), loads=_loads) for p in paths]
+    return batch, results
+
+
+class ParallelProcessor:
+    """Procesador que parsea y valida los JSON en un pool de procesos"""
+
+    def __init__(self, base_mode: str = settings.parallel_base_mode, workers: int = settings.processing_workers,
+                 files_per_task: int = settings.processing_files_per_task):
+        self.base_mode = base_mode
+        self.workers = max(1, workers or multiprocessing.cpu_count())
+        self.files_per_task = max(1, files_per_task)
+        self.stats = {
+            "files_processed": 0,
+            "paragraphs_extracted": 0,
+            "expedientes_found": set(),
+            "errors": []
+        }
+
+    def process_directory(self, json_dir: Path) -> Iterator[BaseModel]:
+        """Procesa todos los archivos JSON del directorio y subdirectorios, en orden de ruta"""
+        logger.info(f"📁 Procesando directorio: {json_dir}")
+        json_files = sorted(json_dir.rglob("*.json"))
+        logger.info(f"📄 Encontrados {len(json_files)} archivos ({self.workers} procesos, "
+                    f"{'orjson' if orjson is not None else 'json'})")
+        yield from self.process_files(json_files, json_dir)
+        logger.info(f"✅ Procesamiento completado: {self.get_stats()}")
+
+    def process_files(self, json_files: Iterable[Path], base_dir: Path) -> Iterator[BaseModel]:
+        """Procesa solo los archivos indicados, en el orden dado (indexación incremental)"""
+        for results in self._run(_parse_files, json_files, base_dir):
+            yield from self._collect(results)
+
+    def process_batches(self, json_files: Iterable[Path], base_dir: Path, batch_size: int) -> Iterator[ParagraphBatch]:
+        """Como process_files pero en batches columnares de al menos batch_size párrafos (salvo la última)"""
+        batch = ParagraphBatch()
+        for task_batch, results in self._run(_parse_batch, json_files, base_dir):
+            for file_result in results:
+                record_file(self.stats, *file_result)
+            batch.extend(task_batch)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = ParagraphBatch()
+        if len(batch):
+            yield batch
+
+    def _run(self, task_func: Callable, json_files: Iterable[Path], base_dir: Path) -> Iterator:
+        """Resultados de task_func sobre los archivos repartidos en tareas, en el orden de los archivos"""
+        paths = [str(p) for p in json_files]
+        tasks = [paths[i:i + self.files_per_task] for i in range(0, len(paths), self.files_per_task)]
+
+        if self.workers == 1 or len(tasks) <= 1:
+            for task in tasks:
+                yield task_func(self.base_mode, str(base_dir), task)
+            return
+
+        # spawn: el build puede correr en un thread de la API con modelos cargados, y hacer
+        # fork de un proceso con threads puede dejar locks tomados en el hijo
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            pending = deque()
+            for task in tasks:
+                pending.append(pool.submit(task_func, self.base_mode, str(base_dir), task))
+                if len(pending) >= 2 * self.workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def _collect(self, results: List[FileResult]) -> Iterator[BaseModel]:
+        """Acumula estadísticas y devuelve los párrafos de cada archivo"""
+        for paragraphs, exptes, error in results:
+            self.stats["expedientes_found"].update(exptes)
+            self.stats["paragraphs_extracted"] += len(paragraphs)
+            if error is None:
+                self.stats["files_processed"] += 1
+            else:
+                logger.error(error)
+                self.stats["errors"].append(error)
+            yield from paragraphs
+
+    def get_stats(self) -> dict:
+        return {
+            "processor_type": "parallel",
+            "base_mode": self.base_mode,
+            "workers": self.workers,
+            "files_processed": self.stats["files_processed"],
+            "paragraphs_extracted": self.stats["paragraphs_extracted"],
+            "expedientes_found": len(self.stats["expedientes_found"]),
+            "errors": len(self.stats["errors"]),
+            "error_rate": len(self.stats["errors"]) / max(1, self.stats["files_processed"])
+        }
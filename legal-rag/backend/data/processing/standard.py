@@ -1,10 +1,11 @@
 from pathlib import Path
 import json
 import logging
-from typing import Iterator, Set
+from typing import Any, Dict, Iterable, Iterator, Set, Tuple
 from pydantic import ValidationError
 
 from .base import DataProcessor
+from ..batch import ParagraphBatch, iter_batches
 from ..models import LegalParagraph
 
 logger = logging.getLogger(__name__)
@@ -12,6 +13,10 @@ logger = logging.getLogger(__name__)
 class StandardProcessor(DataProcessor):
     """Procesador estándar"""
     
+    model = LegalParagraph
+    document_model = None  # sin campos por fallo
+    strip_fields = True  # strip de expediente y texto, como los validators de LegalParagraph
+    
     def __init__(self):
         self.stats = {
             "files_processed": 0,
@@ -27,17 +32,25 @@ class StandardProcessor(DataProcessor):
         json_files = list(json_dir.rglob("*.json"))
         logger.info(f"📄 Encontrados {len(json_files)} archivos")
         
+        yield from self.process_files(json_files, json_dir)
+        
+        logger.info(f"✅ Procesamiento completado: {self.stats}")
+    
+    def process_batches(self, json_files: Iterable[Path], base_dir: Path, batch_size: int) -> Iterator[ParagraphBatch]:
+        """Como process_files pero en lotes columnares (ver data/batch.py)"""
+        yield from iter_batches(self, json_files, base_dir, batch_size)
+    
+    def process_files(self, json_files: Iterable[Path], base_dir: Path) -> Iterator[LegalParagraph]:
+        """Procesa solo los archivos indicados (indexación incremental)"""
         for file_path in json_files:
             try:
-                yield from self._process_file(file_path, json_dir)
+                yield from self._process_file(file_path, base_dir)
                 self.stats["files_processed"] += 1
             except Exception as e:
                 error_msg = f"Error en {file_path.name}: {str(e)}"
                 logger.error(error_msg)
                 self.stats["errors"].append(error_msg)
                 continue
-        
-        logger.info(f"✅ Procesamiento completado: {self.stats}")
     
     def _process_file(self, file_path: Path, base_dir: Path) -> Iterator[LegalParagraph]:
         """Procesa un archivo JSON"""
@@ -52,11 +65,30 @@ class StandardProcessor(DataProcessor):
     
     def _process_document(self, doc: dict, file_path: Path, base_dir: Path) -> Iterator[LegalParagraph]:
         """Procesa un documento individual"""
-        contenido = doc["CONTENIDO"]
         expte = self._extract_expediente(doc=doc)
         self.stats["expedientes_found"].add(expte)
         
-        for section, paragraphs in contenido.items():
+        for fields in self._paragraph_fields(doc, expte, file_path.relative_to(base_dir).as_posix()):
+            try:
+                paragraph = self.model(**fields)
+                self.stats["paragraphs_extracted"] += 1
+                yield paragraph
+            except ValidationError:
+                continue
+    
+    def _paragraph_fields(self, doc: dict, expte: str, path: str) -> Iterator[Dict[str, Any]]:
+        """Campos de cada párrafo del documento, sin validar (ver también ParallelProcessor)"""
+        shared = self._document_fields(doc)
+        for section, idx, text in self._iter_texts(doc):
+            yield {"expediente": expte, "section": section, "paragraph_id": idx, "text": text, "path": path, **shared}
+    
+    def _document_fields(self, doc: dict) -> Dict[str, Any]:
+        """Campos del fallo que comparten todos sus párrafos"""
+        return {}
+    
+    def _iter_texts(self, doc: dict) -> Iterator[Tuple[str, int, str]]:
+        """(sección, índice, texto) de los párrafos con contenido"""
+        for section, paragraphs in doc["CONTENIDO"].items():
             if not isinstance(paragraphs, list):
                 continue
             
@@ -64,18 +96,7 @@ class StandardProcessor(DataProcessor):
                 if not text or not isinstance(text, str) or len(text.strip()) < 10:
                     continue
                 
-                try:
-                    paragraph = LegalParagraph(
-                        expediente=expte,
-                        section=section,
-                        paragraph_id=idx,
-                        text=text,
-                        path=file_path.relative_to(base_dir).as_posix()
-                    )
-                    self.stats["paragraphs_extracted"] += 1
-                    yield paragraph
-                except ValidationError:
-                    continue
+                yield section, idx, text
     
     def _extract_expediente(self, doc: dict) -> str:
         """Extrae el expediente desde METADATOS['ID_FALLO']. Lanza error si no existe."""
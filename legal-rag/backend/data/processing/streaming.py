@@ -0,0 +1,141 @@
+"""
+Procesador streaming: lee el corpus NDJSON pre-aplanado (ver data/ndjson.py)
+
+En lugar de parsear el árbol de fallos JSON en cada build, recorre STREAMING_CORPUS_PATH
+línea por línea: los párrafos ya vienen extraídos y validados por el modo con que se generó
+el corpus (base_mode del header), así que no hay validación por párrafo y la memoria queda
+acotada por la batch en curso y el fallo actual, no por el tamaño del corpus.
+
+process_files y process_batches con una lista de archivos filtran los párrafos por `path`
+(ruta del JSON original): la indexación incremental recorre el corpus completo pero solo
+embebe los archivos afectados. Igual que process_directory, si base_dir es un archivo se lee
+ese corpus en lugar de STREAMING_CORPUS_PATH. source_hashes() devuelve el hash de cada JSON con que se
+generó el corpus (lo usa el manifest). El corpus se regenera con `python -m backend.data.ndjson`.
+"""
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from pydantic import BaseModel
+
+from backend.config import get_settings
+from ..batch import ParagraphBatch
+from ..ndjson import corpus_hashes, iter_corpus
+
+settings = get_settings()
+
+logger = logging.getLogger(__name__)
+
+
+def _model(base_mode: str) -> type:
+    if base_mode == "enriched":
+        from ..models_enriched import LegalParagraphEnriched
+        return LegalParagraphEnriched
+    from ..models import LegalParagraph
+    return LegalParagraph
+
+
+class StreamingProcessor:
+    """Procesador que recorre un corpus NDJSON de párrafos ya aplanados"""
+
+    def __init__(self, corpus_path: str = settings.streaming_corpus_path):
+        self.corpus_path = Path(corpus_path)
+        self.base_mode = None
+        self.stats = {
+            "files_processed": set(),
+            "paragraphs_extracted": 0,
+            "expedientes_found": set(),
+            "errors": []
+        }
+
+    def _corpus(self, json_dir: Path) -> Path:
+        """La ruta pasada si es un archivo (un corpus NDJSON); si no, STREAMING_CORPUS_PATH"""
+        return json_dir if json_dir.is_file() else self.corpus_path
+
+    def _iter(self, corpus: Path, paths: Optional[Set[str]]) -> Iterator[Tuple[str, Dict[str, Any], Dict[str, Any]]]:
+        """(expediente del fallo, campos del fallo, párrafo) de los archivos pedidos (todos con paths=None)"""
+        header, records = iter_corpus(corpus)
+        self.base_mode = header.get("base_mode")
+        expediente, fields = None, {}
+        for record in records:
+            kind = record.get("type")
+            if kind == "document":
+                expediente, fields = record["expediente"], record["fields"]
+                continue
+            if kind == "file":
+                continue
+            if kind == "error":
+                logger.error(record["error"])
+                self.stats["errors"].append(record["error"])
+                continue
+            if paths is not None and record["path"] not in paths:
+                continue
+            self.stats["files_processed"].add(record["path"])
+            self.stats["expedientes_found"].add(expediente)
+            self.stats["paragraphs_extracted"] += 1
+            yield expediente, fields, record
+
+    def source_hashes(self, json_dir: Path) -> Dict[str, str]:
+        """Hash de cada JSON del corpus al convertirlo, por ruta relativa"""
+        return corpus_hashes(self._corpus(Path(json_dir)))
+
+    @staticmethod
+    def _paths(json_files: Iterable[Path], base_dir: Path) -> Set[str]:
+        return {Path(f).relative_to(base_dir).as_posix() for f in json_files}
+
+    def process_directory(self, json_dir: Path) -> Iterator[BaseModel]:
+        """Todos los párrafos del corpus"""
+        corpus = self._corpus(json_dir)
+        logger.info(f"📁 Leyendo corpus NDJSON: {corpus}")
+        yield from self._models(self._iter(corpus, None))
+        logger.info(f"✅ Procesamiento completado: {self.get_stats()}")
+
+    def process_files(self, json_files: Iterable[Path], base_dir: Path) -> Iterator[BaseModel]:
+        """Solo los párrafos de los archivos indicados (indexación incremental)"""
+        yield from self._models(self._iter(self._corpus(Path(base_dir)), self._paths(json_files, base_dir)))
+
+    def _models(self, rows: Iterator[Tuple[str, Dict[str, Any], Dict[str, Any]]]) -> Iterator[BaseModel]:
+        # El corpus ya está validado: model_construct evita repetir la validación por párrafo
+        model = None
+        for _, fields, paragraph in rows:
+            if model is None:
+                model = _model(self.base_mode)
+            yield model.model_construct(**paragraph, **fields)
+
+    def process_directory_batches(self, json_dir: Path, batch_size: int) -> Iterator[ParagraphBatch]:
+        """Todo el corpus en batches columnares (sin recorrer el árbol de JSON)"""
+        corpus = self._corpus(json_dir)
+        logger.info(f"📁 Leyendo corpus NDJSON: {corpus}")
+        yield from self._batches(self._iter(corpus, None), batch_size)
+        logger.info(f"✅ Procesamiento completado: {self.get_stats()}")
+
+    def process_batches(self, json_files: Iterable[Path], base_dir: Path, batch_size: int) -> Iterator[ParagraphBatch]:
+        """Batches columnares con los párrafos de los archivos indicados"""
+        yield from self._batches(self._iter(self._corpus(Path(base_dir)), self._paths(json_files, base_dir)), batch_size)
+
+    @staticmethod
+    def _batches(rows: Iterator[Tuple[str, Dict[str, Any], Dict[str, Any]]], batch_size: int) -> Iterator[ParagraphBatch]:
+        """Batches de al menos batch_size párrafos (salvo la última), sin cortar un archivo entre dos"""
+        batch = ParagraphBatch()
+        last_path = None
+        for expediente, fields, p in rows:
+            if p["path"] != last_path and len(batch) >= batch_size:
+                yield batch
+                batch = ParagraphBatch()
+            last_path = p["path"]
+            row = batch.documents.add(expediente, fields)
+            batch.append(p["expediente"], p["section"], p["paragraph_id"], p["text"], p["path"], row)
+        if len(batch):
+            yield batch
+
+    def get_stats(self) -> dict:
+        return {
+            "processor_type": "streaming",
+            "base_mode": self.base_mode,
+            "corpus": str(self.corpus_path),
+            "files_processed": len(self.stats["files_processed"]),
+            "paragraphs_extracted": self.stats["paragraphs_extracted"],
+            "expedientes_found": len(self.stats["expedientes_found"]),
+            "errors": len(self.stats["errors"]),
+            "error_rate": len(self.stats["errors"]) / max(1, len(self.stats["files_processed"]))
+        }
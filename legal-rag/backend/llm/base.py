@@ -1,5 +1,9 @@
+import asyncio
+import logging
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, Iterator, List, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
 
 class BaseLLMProvider(ABC):
     """Interface simple para proveedores LLM"""
@@ -26,6 +30,72 @@ class BaseLLMProvider(ABC):
         """
         pass
     
+    async def agenerate(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        **kwargs
+    ) -> str:
+        """Versión async de generate; por defecto corre generate en un thread"""
+        return await asyncio.to_thread(self.generate, messages, max_tokens, temperature, **kwargs)
+    
+    async def agenerate_batch(
+        self,
+        messages_list: List[List[Dict[str, str]]],
+        max_concurrency: int = 4,
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> List[str]:
+        """
+        agenerate para varios prompts en paralelo, con a lo sumo max_concurrency llamadas en vuelo
+        
+        Cada llamada tiene su propio timeout (cuenta desde que sale, no mientras espera turno) y
+        sus errores: un prompt que falla o vence devuelve "Error: ..." como generate tras agotar
+        los reintentos, y el resto del batch sigue.
+        """
+        semaphore = asyncio.Semaphore(max(max_concurrency, 1))
+        
+        async def _one(messages):
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(self.agenerate(messages, max_tokens, temperature, **kwargs), timeout)
+                except asyncio.TimeoutError:
+                    logger.error(f"❌ LLM sin respuesta en {timeout}s (batch)")
+                    return f"Error: No response after {timeout}s."
+                except Exception as e:
+                    logger.error(f"❌ Error en llamada LLM del batch: {e!r}")
+                    return f"Error: {e}"
+        
+        return list(await asyncio.gather(*(_one(m) for m in messages_list)))
+    
+    def generate_stream(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        **kwargs
+    ) -> Iterator[str]:
+        """
+        Genera la respuesta de a fragmentos a medida que el modelo los produce
+        
+        Por defecto devuelve la respuesta completa en un solo fragmento; los proveedores
+        con streaming (supports_streaming) lo sobreescriben.
+        """
+        yield self.generate(messages, max_tokens, temperature, **kwargs)
+    
+    async def agenerate_stream(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """Versión async de generate_stream; por defecto un solo fragmento con agenerate"""
+        yield await self.agenerate(messages, max_tokens, temperature, **kwargs)
+    
     def get_stats(self) -> Dict[str, Any]:
         """Retorna estadísticas del proveedor"""
         return {"provider_type": "base"}
@@ -1,8 +1,10 @@
+import asyncio
 import logging
 import time
-from typing import List, Dict, Any, Optional
-from openai import AzureOpenAI
+from typing import AsyncIterator, Iterator, List, Dict, Any, Optional
+from openai import AsyncAzureOpenAI, AzureOpenAI
 from backend.config import get_settings
+from backend.tracing import count
 
 
 from ..base import BaseLLMProvider
@@ -26,11 +28,26 @@ def get_azure_client() -> AzureOpenAI:
         )
     return _azure_client
 
+_async_azure_client = None
+
+def get_async_azure_client() -> AsyncAzureOpenAI:
+    """Singleton para cliente Azure OpenAI async (una conexión HTTP compartida por el worker)"""
+    global _async_azure_client
+    if _async_azure_client is None:
+        logger.info("🔑 Inicializando cliente Azure OpenAI async...")
+        _async_azure_client = AsyncAzureOpenAI(
+            api_key=settings.azure_api_key,
+            api_version="2024-02-01",
+            azure_endpoint=settings.azure_endpoint
+        )
+    return _async_azure_client
+
 class AzureProvider(BaseLLMProvider):
     """Proveedor Azure OpenAI optimizado - migrado de azure.py"""
     
     def __init__(self):
         self.client = None
+        self.async_client = None
         self.deployment = settings.azure_deployment
         self.default_max_tokens = settings.llm_max_tokens
         self.default_temperature = settings.llm_temperature
@@ -45,6 +62,39 @@ class AzureProvider(BaseLLMProvider):
             self.client = get_azure_client()
         return self.client
     
+    def _get_async_client(self) -> AsyncAzureOpenAI:
+        """Lazy loading del cliente async"""
+        if self.async_client is None:
+            self.async_client = get_async_azure_client()
+        return self.async_client
+    
+    def _call_params(self, messages, max_tokens, temperature, **kwargs) -> Dict[str, Any]:
+        """Parámetros de la llamada con los defaults del proveedor"""
+        return {
+            "model": self.deployment,
+            "messages": messages,
+            "max_tokens": max_tokens or self.default_max_tokens,
+            "temperature": temperature if temperature is not None else self.default_temperature,
+            "timeout": self.timeout,
+            **kwargs
+        }
+    
+    def _extract_content(self, response, start_time: float, call_params: Dict[str, Any]) -> str:
+        """Texto de la respuesta + logging de métricas"""
+        if response.choices and response.choices[0].message:
+            content = response.choices[0].message.content
+            if content:
+                self._log_generation_metrics(
+                    time.time() - start_time,
+                    response,
+                    call_params["max_tokens"],
+                    len(call_params["messages"])
+                )
+                return content.strip()
+        
+        logger.warning("⚠️ Empty response from Azure OpenAI")
+        return "Error: Empty model response"
+    
     def generate(
         self, 
         messages: List[Dict[str, str]], 
@@ -65,49 +115,16 @@ class AzureProvider(BaseLLMProvider):
             Texto generado por el modelo
         """
         start_time = time.time()
-        
-        # Configuración efectiva
-        effective_max_tokens = max_tokens or self.default_max_tokens
-        effective_temperature = temperature if temperature is not None else self.default_temperature
-        
         client = self._get_client()
-        
-        # Parámetros de la llamada
-        call_params = {
-            "model": self.deployment,
-            "messages": messages,
-            "max_tokens": effective_max_tokens,
-            "temperature": effective_temperature,
-            "timeout": self.timeout,
-            **kwargs
-        }
+        call_params = self._call_params(messages, max_tokens, temperature, **kwargs)
         
         # Intentos con retry
         last_error = None
         for attempt in range(self.max_retries):
             try:
                 logger.debug(f"🤖 Azure OpenAI call (attempt {attempt + 1}/{self.max_retries})")
-                
                 response = client.chat.completions.create(**call_params)
-                
-                # Extraer respuesta
-                if response.choices and response.choices[0].message:
-                    content = response.choices[0].message.content
-                    if content:
-                        generation_time = time.time() - start_time
-                        
-                        # Logging de métricas
-                        self._log_generation_metrics(
-                            generation_time, 
-                            response, 
-                            effective_max_tokens, 
-                            len(messages)
-                        )
-                        
-                        return content.strip()
-                
-                logger.warning("⚠️ Empty response from Azure OpenAI")
-                return "Error: Empty model response"
+                return self._extract_content(response, start_time, call_params)
                 
             except Exception as e:
                 last_error = e
@@ -120,13 +137,152 @@ class AzureProvider(BaseLLMProvider):
         
         # Si llegamos aquí, fallaron todos los intentos
         logger.error(f"❌ Failed after {self.max_retries} attempts: {last_error}")
+        count("llm_calls_total", status="error")
         return f"Error: Could not generate response after {self.max_retries} attempts."
     
+    async def agenerate(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        **kwargs
+    ) -> str:
+        """Igual que generate pero con AsyncAzureOpenAI: la espera y los backoffs no bloquean el event loop"""
+        start_time = time.time()
+        client = self._get_async_client()
+        call_params = self._call_params(messages, max_tokens, temperature, **kwargs)
+        
+        last_error = None
+        for attempt in range(self.max_retries):
+            try:
+                logger.debug(f"🤖 Azure OpenAI async call (attempt {attempt + 1}/{self.max_retries})")
+                response = await client.chat.completions.create(**call_params)
+                return self._extract_content(response, start_time, call_params)
+                
+            except Exception as e:
+                last_error = e
+                logger.warning(f"⚠️ Error on attempt {attempt + 1}: {str(e)}")
+                
+                if attempt < self.max_retries - 1:
+                    wait_time = 2 ** attempt  # Exponential backoff
+                    logger.info(f"🕐 Waiting {wait_time}s before retry...")
+                    await asyncio.sleep(wait_time)
+        
+        logger.error(f"❌ Failed after {self.max_retries} attempts: {last_error}")
+        count("llm_calls_total", status="error")
+        return f"Error: Could not generate response after {self.max_retries} attempts."
+
+    @staticmethod
+    def _delta_content(chunk) -> str:
+        """Texto de un chunk del stream (Azure manda chunks sin choices, p.ej. el de content filter)"""
+        if chunk.choices and chunk.choices[0].delta:
+            return chunk.choices[0].delta.content or ""
+        return ""
+
+    def generate_stream(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        **kwargs
+    ) -> Iterator[str]:
+        """
+        Igual que generate pero devuelve los fragmentos a medida que llegan (stream=True)
+
+        Los reintentos cubren solo la apertura del stream: una vez enviado el primer
+        fragmento, un error se propaga al consumidor.
+        """
+        start_time = time.time()
+        client = self._get_client()
+        call_params = self._call_params(messages, max_tokens, temperature, stream=True, **kwargs)
+
+        last_error = None
+        for attempt in range(self.max_retries):
+            try:
+                logger.debug(f"🤖 Azure OpenAI stream (attempt {attempt + 1}/{self.max_retries})")
+                stream = client.chat.completions.create(**call_params)
+                break
+            except Exception as e:
+                last_error = e
+                logger.warning(f"⚠️ Error on attempt {attempt + 1}: {str(e)}")
+                if attempt < self.max_retries - 1:
+                    wait_time = 2 ** attempt  # Exponential backoff
+                    logger.info(f"🕐 Waiting {wait_time}s before retry...")
+                    time.sleep(wait_time)
+        else:
+            logger.error(f"❌ Failed after {self.max_retries} attempts: {last_error}")
+            count("llm_calls_total", status="error")
+            yield f"Error: Could not generate response after {self.max_retries} attempts."
+            return
+
+        first_token_time, n_chunks = None, 0
+        for chunk in stream:
+            content = self._delta_content(chunk)
+            if content:
+                first_token_time = first_token_time or time.time()
+                n_chunks += 1
+                yield content
+        self._log_stream_metrics(start_time, first_token_time, n_chunks)
+
+    async def agenerate_stream(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """Igual que generate_stream pero con AsyncAzureOpenAI"""
+        start_time = time.time()
+        client = self._get_async_client()
+        call_params = self._call_params(messages, max_tokens, temperature, stream=True, **kwargs)
+
+        last_error = None
+        for attempt in range(self.max_retries):
+            try:
+                logger.debug(f"🤖 Azure OpenAI async stream (attempt {attempt + 1}/{self.max_retries})")
+                stream = await client.chat.completions.create(**call_params)
+                break
+            except Exception as e:
+                last_error = e
+                logger.warning(f"⚠️ Error on attempt {attempt + 1}: {str(e)}")
+                if attempt < self.max_retries - 1:
+                    wait_time = 2 ** attempt  # Exponential backoff
+                    logger.info(f"🕐 Waiting {wait_time}s before retry...")
+                    await asyncio.sleep(wait_time)
+        else:
+            logger.error(f"❌ Failed after {self.max_retries} attempts: {last_error}")
+            count("llm_calls_total", status="error")
+            yield f"Error: Could not generate response after {self.max_retries} attempts."
+            return
+
+        first_token_time, n_chunks = None, 0
+        async for chunk in stream:
+            content = self._delta_content(chunk)
+            if content:
+                first_token_time = first_token_time or time.time()
+                n_chunks += 1
+                yield content
+        self._log_stream_metrics(start_time, first_token_time, n_chunks)
+
+    def _log_stream_metrics(self, start_time, first_token_time, n_chunks):
+        """Log de métricas de una generación en streaming (sin usage: la API no lo manda en stream)"""
+        total_time = time.time() - start_time
+        count("llm_calls_total", status="stream")
+        count("llm_stream_chunks_total", n_chunks)
+        if first_token_time is None:
+            logger.warning("⚠️ Empty streamed response from Azure OpenAI")
+            return
+        logger.info(f"🤖 LLM stream completed in {total_time:.3f}s:")
+        logger.info(f"   First token: {first_token_time - start_time:.3f}s, chunks: {n_chunks}")
+
     def _log_generation_metrics(self, generation_time, response, max_tokens, num_messages):
         """Log detallado de métricas de generación"""
         usage = getattr(response, 'usage', None)
+        count("llm_calls_total", status="ok")
         
         if usage:
+            count("llm_tokens_total", usage.prompt_tokens, kind="prompt")
+            count("llm_tokens_total", usage.completion_tokens, kind="completion")
             logger.info(f"🤖 LLM completed in {generation_time:.3f}s:")
             logger.info(f"   Tokens: {usage.prompt_tokens} prompt + {usage.completion_tokens} completion = {usage.total_tokens} total")
             logger.info(f"   Efficiency: {usage.completion_tokens/generation_time:.1f} tokens/sec")
@@ -143,7 +299,8 @@ class AzureProvider(BaseLLMProvider):
             "default_temperature": self.default_temperature,
             "timeout": self.timeout,
             "max_retries": self.max_retries,
-            "client_initialized": self.client is not None
+            "client_initialized": self.client is not None,
+            "async_client_initialized": self.async_client is not None
         }
     
     def get_model_info(self) -> Dict[str, Any]:
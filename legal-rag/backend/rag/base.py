@@ -1,5 +1,14 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Tuple, List, Dict, Any
+from typing import AsyncIterator, Callable, Tuple, List, Dict, Any, Optional, Sequence, Union
+
+def batch_top_ns(top_n: Union[int, Sequence[int]], n_questions: int) -> List[int]:
+    """top_n de cada pregunta de un batch"""
+    if isinstance(top_n, int):
+        return [top_n] * n_questions
+    if len(top_n) != n_questions:
+        raise ValueError(f"Se esperaban {n_questions} valores de top_n, llegaron {len(top_n)}")
+    return list(top_n)
 
 class BaseRAGPipeline(ABC):
     """Interface simple para pipelines RAG"""
@@ -18,6 +27,56 @@ class BaseRAGPipeline(ABC):
         """
         pass
     
+    async def aquery(self, question: str, top_n: int = 8) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Versión async de query (no bloquea el event loop)
+        
+        Por defecto corre query en un thread; los pipelines la sobreescriben para usar
+        retrieval y LLM async.
+        """
+        return await asyncio.to_thread(self.query, question, top_n)
+    
+    async def aquery_batch(self, questions: List[str], top_n: Union[int, Sequence[int]] = 8, timeout: Optional[float] = None) -> List[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        aquery para varias preguntas (top_n único o uno por pregunta)
+        
+        Por defecto corre las consultas en paralelo; los pipelines la sobreescriben para
+        compartir el retrieval entre todas. Cada pregunta tiene su propio timeout y sus
+        errores: la que falla o vence responde "Error: ..." sin hits y el resto sigue.
+        """
+        top_ns = batch_top_ns(top_n, len(questions))
+        
+        async def _one(question: str, n: int) -> Tuple[str, List[Dict[str, Any]]]:
+            try:
+                return await asyncio.wait_for(self.aquery(question, n), timeout)
+            except asyncio.TimeoutError:
+                return f"Error: No response after {timeout}s.", []
+            except Exception as e:
+                return f"Error: {e}", []
+        
+        return list(await asyncio.gather(*(_one(q, n) for q, n in zip(questions, top_ns))))
+    
+    async def astream_query(self, question: str, top_n: int = 8) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Versión streaming de aquery: eventos (tipo, dato) a medida que están listos
+        
+        Primero ("hits", lista_de_hits) al terminar el retrieval y después ("token", texto)
+        por cada fragmento de la respuesta. Por defecto manda la respuesta completa en un
+        solo fragmento.
+        """
+        response, hits = await self.aquery(question, top_n)
+        yield "hits", hits
+        yield "token", response
+    
+    def warmup_components(self) -> Dict[str, Callable[[], Any]]:
+        """
+        Cargas pesadas del pipeline {componente: función que lo carga}
+        
+        La API las ejecuta en paralelo al arrancar (ver backend/warmup.py) para que la
+        primera consulta no pague la carga de modelos e índices.
+        """
+        return {}
+    
     def get_stats(self) -> Dict[str, Any]:
         """Retorna estadísticas del pipeline"""
         return {"pipeline_type": "base"}
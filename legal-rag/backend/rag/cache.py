@@ -0,0 +1,265 @@
+# backend/rag/cache.py
+"""
+Cache semántico de respuestas
+
+Delante del pipeline RAG: si llega una pregunta cuyo embedding es casi idéntico
+(coseno >= ANSWER_CACHE_THRESHOLD) al de una respondida hace poco, con el mismo top_n y
+sobre la misma generación de índices, se devuelven la respuesta y los hits guardados sin
+volver a llamar al LLM. Las variantes de una misma consulta ("honorarios del perito",
+"¿cómo se regulan los honorarios de peritos?") comparten así una sola llamada a Azure.
+
+La similitud sola no alcanza: "art. 67" y "art. 68" dan embeddings casi iguales. Cada entrada
+guarda además la firma de su pregunta (números y citas, ver question_signature) y solo se
+reutiliza si la de la pregunta nueva es idéntica.
+
+Los embeddings de las preguntas recientes viven en una matriz NumPy (capacidad
+CACHE_SIZE_LIMIT), así que la búsqueda es un producto matriz-vector. Eviction LRU + TTL.
+"""
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from backend.config import get_settings
+from backend.concurrency import run_cpu
+from backend.search.citations import extract_citations, normalize_article
+from .base import BaseRAGPipeline, batch_top_ns
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+_NUMBER_RE = re.compile(r'\d+(?:[./-]\d+)*')
+
+Signature = Tuple[FrozenSet[str], FrozenSet[Tuple[str, str]]]
+
+
+def question_signature(question: str) -> Signature:
+    """Números de la pregunta (artículos, leyes, expedientes, fechas) y pares (ley, artículo) citados"""
+    numbers = frozenset(normalize_article(n) for n in _NUMBER_RE.findall(question))
+    return numbers, frozenset(extract_citations(question).pairs)
+
+
+class _Entry:
+    """Respuesta cacheada"""
+
+    __slots__ = ("question", "signature", "generation", "top_n", "response", "hits", "created_at", "hits_count")
+
+    def __init__(self, question: str, generation: Optional[int], top_n: int, response: str, hits: list):
+        self.question = question
+        self.signature = question_signature(question)
+        self.generation = generation
+        self.top_n = top_n
+        self.response = response
+        self.hits = hits
+        self.created_at = time.time()
+        self.hits_count = 0
+
+
+class SemanticAnswerCache:
+    """Cache de respuestas por similitud de embeddings (LRU + TTL)"""
+
+    def __init__(
+        self,
+        capacity: int = settings.cache_size_limit,
+        threshold: float = settings.answer_cache_threshold,
+        ttl: float = settings.answer_cache_ttl,
+    ):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+
+        self._vectors: Optional[np.ndarray] = None        # (capacity, dim), filas normalizadas
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()  # slot -> entrada, en orden LRU
+        self._free: List[int] = list(range(capacity - 1, -1, -1))
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(v)
+        return v / norm if norm > 0 else v
+
+    def _drop(self, slot: int):
+        del self._entries[slot]
+        self._free.append(slot)
+
+    def lookup(self, vector, question: str, generation: Optional[int], top_n: int) -> Optional[Tuple[str, list, float]]:
+        """(respuesta, hits, similitud) de la entrada vigente más parecida con la misma firma, o None"""
+        signature = question_signature(question)
+        with self._lock:
+            if self._vectors is None or not self._entries:
+                self.stats["misses"] += 1
+                return None
+
+            slots = np.fromiter(self._entries.keys(), dtype=np.int64, count=len(self._entries))
+            sims = self._vectors[slots] @ self._normalize(vector)
+            now = time.time()
+            for i in np.argsort(-sims):
+                sim = float(sims[i])
+                if sim < self.threshold:
+                    break
+                slot = int(slots[i])
+                entry = self._entries[slot]
+                if now - entry.created_at > self.ttl:
+                    self._drop(slot)
+                    self.stats["expired"] += 1
+                    continue
+                if entry.generation != generation or entry.top_n != top_n or entry.signature != signature:
+                    continue
+                self._entries.move_to_end(slot)
+                entry.hits_count += 1
+                self.stats["hits"] += 1
+                return entry.response, entry.hits, sim
+
+            self.stats["misses"] += 1
+            return None
+
+    def store(self, vector, question: str, generation: Optional[int], top_n: int, response: str, hits: list):
+        """Guarda una respuesta (desaloja la menos usada si está lleno)"""
+        if self.capacity <= 0:
+            return
+        v = self._normalize(vector)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.capacity, v.shape[0]), dtype=np.float32)
+            if not self._free:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.stats["evictions"] += 1
+            slot = self._free.pop()
+            self._vectors[slot] = v
+            self._entries[slot] = _Entry(question, generation, top_n, response, hits)
+            self.stats["stores"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._free = list(range(self.capacity - 1, -1, -1))
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "ttl": self.ttl,
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+        }
+
+
+def _cacheable(response: str) -> bool:
+    """No se cachean los errores del proveedor LLM"""
+    return bool(response) and not response.startswith("Error:")
+
+
+class CachedRAGPipeline(BaseRAGPipeline):
+    """Pipeline RAG con cache semántico de respuestas delante"""
+
+    def __init__(self, pipeline: BaseRAGPipeline, cache: SemanticAnswerCache = None):
+        self.pipeline = pipeline
+        self.cache = cache or SemanticAnswerCache()
+
+    def _key(self, question: str) -> Tuple[Optional[np.ndarray], Optional[int]]:
+        """Embedding de la pregunta y generación de índices del retriever en servicio"""
+        retriever = self.pipeline._get_retriever()
+        vector = retriever.encode_question(question)
+        generation = getattr(getattr(retriever, "generation", None), "number", None)
+        return vector, generation
+
+    def query(self, question: str, top_n: int = 8) -> Tuple[str, List[Dict[str, Any]]]:
+        vector, generation = self._key(question)
+        if vector is None:
+            return self.pipeline.query(question, top_n)
+
+        cached = self.cache.lookup(vector, question, generation, top_n)
+        if cached is not None:
+            logger.info(f"♻️ Respuesta desde cache semántico (similitud {cached[2]:.3f})")
+            return cached[0], cached[1]
+
+        response, hits = self.pipeline.query(question, top_n)
+        if _cacheable(response):
+            self.cache.store(vector, question, generation, top_n, response, hits)
+        return response, hits
+
+    async def aquery(self, question: str, top_n: int = 8) -> Tuple[str, List[Dict[str, Any]]]:
+        vector, generation = await run_cpu(self._key, question)
+        if vector is None:
+            return await self.pipeline.aquery(question, top_n)
+
+        cached = self.cache.lookup(vector, question, generation, top_n)
+        if cached is not None:
+            logger.info(f"♻️ Respuesta desde cache semántico (similitud {cached[2]:.3f})")
+            return cached[0], cached[1]
+
+        response, hits = await self.pipeline.aquery(question, top_n)
+        if _cacheable(response):
+            self.cache.store(vector, question, generation, top_n, response, hits)
+        return response, hits
+
+    async def aquery_batch(self, questions: List[str], top_n: Union[int, Sequence[int]] = 8, timeout: Optional[float] = None) -> List[Tuple[str, List[Dict[str, Any]]]]:
+        """Las preguntas con respuesta en cache no pasan por el pipeline; el resto va en un solo batch"""
+        top_ns = batch_top_ns(top_n, len(questions))
+        retriever = self.pipeline._get_retriever()
+        vectors = await run_cpu(retriever.encode_questions, questions)
+        generation = getattr(getattr(retriever, "generation", None), "number", None)
+
+        results: List[Optional[Tuple[str, list]]] = [None] * len(questions)
+        for i, (vector, n) in enumerate(zip(vectors, top_ns)):
+            cached = self.cache.lookup(vector, questions[i], generation, n) if vector is not None else None
+            if cached is not None:
+                results[i] = (cached[0], cached[1])
+
+        pending = [i for i, r in enumerate(results) if r is None]
+        if len(pending) < len(questions):
+            logger.info(f"♻️ {len(questions) - len(pending)}/{len(questions)} respuestas del batch desde cache semántico")
+        if pending:
+            computed = await self.pipeline.aquery_batch([questions[i] for i in pending], [top_ns[i] for i in pending], timeout)
+            for i, (response, hits) in zip(pending, computed):
+                results[i] = (response, hits)
+                if vectors[i] is not None and _cacheable(response):
+                    self.cache.store(vectors[i], questions[i], generation, top_ns[i], response, hits)
+        return results
+
+    async def astream_query(self, question: str, top_n: int = 8) -> AsyncIterator[Tuple[str, Any]]:
+        vector, generation = await run_cpu(self._key, question)
+        cached = self.cache.lookup(vector, question, generation, top_n) if vector is not None else None
+        if cached is not None:
+            logger.info(f"♻️ Respuesta desde cache semántico (similitud {cached[2]:.3f})")
+            yield "hits", cached[1]
+            yield "token", cached[0]
+            return
+
+        hits, tokens = None, []
+        async for kind, payload in self.pipeline.astream_query(question, top_n):
+            if kind == "hits":
+                hits = payload
+            else:
+                tokens.append(payload)
+            yield kind, payload
+
+        # Solo respuestas completas (si el cliente corta el stream no se llega acá)
+        response = "".join(tokens).strip()
+        if vector is not None and hits is not None and _cacheable(response):
+            self.cache.store(vector, question, generation, top_n, response, hits)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.pipeline.get_stats(), "answer_cache": self.cache.get_stats()}
+
+    def supports_streaming(self) -> bool:
+        return self.pipeline.supports_streaming()
+
+    def warmup_components(self) -> Dict[str, Callable[[], Any]]:
+        return self.pipeline.warmup_components()
+
+    def __getattr__(self, name):
+        # Atributos propios del pipeline (retriever, max_results, etc.)
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.pipeline, name)
@@ -35,11 +35,16 @@ def get_rag_pipeline(strategy: str = None, **kwargs):
     # Manejar kwargs según la estrategia
     if strategy == "standard":
         # StandardRAGPipeline no acepta parámetros
-        return pipeline_class()
+        pipeline = pipeline_class()
     elif strategy == "enriched":
-        return pipeline_class()
+        pipeline = pipeline_class()
     else:
-        return pipeline_class(**kwargs)
+        pipeline = pipeline_class(**kwargs)
+    
+    if settings.answer_cache_enabled:
+        from .cache import CachedRAGPipeline
+        pipeline = CachedRAGPipeline(pipeline)
+    return pipeline
 
 def get_available_strategies():
     """Retorna estrategias disponibles"""
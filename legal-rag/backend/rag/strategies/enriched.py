@@ -1,11 +1,12 @@
 import textwrap, time
 import logging
-from typing import Tuple, List, Dict, Any
+from typing import AsyncIterator, Callable, Tuple, List, Dict, Any, Optional, Sequence, Union
 
-from ..base import BaseRAGPipeline
-from backend.search import get_retriever
+from ..base import BaseRAGPipeline, batch_top_ns
+from backend.search import get_shared_retriever
 from backend.llm import get_llm_provider
 from backend.config import get_settings
+from backend.tracing import span
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
@@ -47,7 +48,7 @@ class EnrichedRAGPipeline(BaseRAGPipeline):
 
     def _get_retriever(self):
         if self.retriever is None:
-            self.retriever = get_retriever("hybrid_enriched")
+            self.retriever = get_shared_retriever("hybrid_enriched")
         return self.retriever
 
     def _get_llm_provider(self):
@@ -58,6 +59,7 @@ class EnrichedRAGPipeline(BaseRAGPipeline):
     def _group_hits_by_expediente(self, hits: list) -> List[Dict[str, Any]]:
         """Une los hits de un mismo expediente y consolida campos, usando nombres correctos del retriever."""
         grouped: Dict[str, Dict[str, Any]] = {}
+        merged_articles: Dict[str, list] = {}
 
         for h in hits:
             expte = h.get("expte") or h.get("expediente") or "N/A"
@@ -73,10 +75,14 @@ class EnrichedRAGPipeline(BaseRAGPipeline):
                 "search_types": [],
             })
 
-            # artículos (lista de dicts) sin duplicados
-            for art in h.get("articulos_citados", []):
-                if art not in g["articulos_citados"]:
-                    g["articulos_citados"].append(art)
+            # artículos (lista de dicts) sin duplicados; con tabla de documentos los párrafos de
+            # un fallo comparten la misma lista y se recorre una sola vez
+            articles = h.get("articulos_citados", [])
+            if articles is not merged_articles.get(expte):
+                merged_articles[expte] = articles
+                for art in articles:
+                    if art not in g["articulos_citados"]:
+                        g["articulos_citados"].append(art)
 
             # resto de info
             g["extractos"].append(h.get("paragraph", h.get("text", "Sin contenido")))
@@ -91,20 +97,71 @@ class EnrichedRAGPipeline(BaseRAGPipeline):
         start_time = time.time()
         retriever = self._get_retriever()
         effective_top_n = min(top_n, self.max_results)
-        search_start = time.time()
-        hits = retriever.query(question, effective_top_n)
-        search_time = time.time() - search_start
-        ctx_start = time.time()
-        grouped_hits = self._group_hits_by_expediente(hits)
-        context = self._build_context(grouped_hits)
-        ctx_time = time.time() - ctx_start
-        llm_start = time.time()
-        response = self._generate_response(question, context)
-        llm_time = time.time() - llm_start
+        with span("retrieval") as search:
+            hits = retriever.query(question, effective_top_n)
+        with span("context") as ctx:
+            grouped_hits = self._group_hits_by_expediente(hits)
+            context = self._build_context(grouped_hits)
+        with span("llm") as llm:
+            response = self._generate_response(question, context)
         total_time = time.time() - start_time
-        self._log_performance(total_time, search_time, ctx_time, llm_time, hits, context)
+        self._log_performance(total_time, search.elapsed, ctx.elapsed, llm.elapsed, hits, context)
         return response, grouped_hits
 
+    async def aquery(self, question: str, top_n: int = 8) -> Tuple[str, List[Dict[str, Any]]]:
+        """Versión async de query: retrieval async + LLM async, sin bloquear el event loop"""
+        start_time = time.time()
+        retriever = self._get_retriever()
+        effective_top_n = min(top_n, self.max_results)
+        with span("retrieval") as search:
+            hits = await retriever.aquery(question, effective_top_n)
+        with span("context") as ctx:
+            grouped_hits = self._group_hits_by_expediente(hits)
+            context = self._build_context(grouped_hits)
+        with span("llm") as llm:
+            response = await self._get_llm_provider().agenerate(self._build_messages(question, context), max_tokens=self.max_tokens)
+        self._log_performance(time.time() - start_time, search.elapsed, ctx.elapsed, llm.elapsed, hits, context)
+        return response, grouped_hits
+
+    async def aquery_batch(self, questions: List[str], top_n: Union[int, Sequence[int]] = 8, timeout: Optional[float] = None) -> List[Tuple[str, List[Dict[str, Any]]]]:
+        """Varias consultas: un retrieval en batch y las llamadas al LLM concurrentes (LLM_BATCH_CONCURRENCY), cada una con su timeout"""
+        if not questions:
+            return []
+        start_time = time.time()
+        retriever = self._get_retriever()
+        effective_top_ns = [min(n, self.max_results) for n in batch_top_ns(top_n, len(questions))]
+        with span("retrieval") as search:
+            hits_batch = await retriever.aquery_batch(questions, max(effective_top_ns))
+        with span("context"):
+            grouped_batch = [self._group_hits_by_expediente(hits[:n]) for hits, n in zip(hits_batch, effective_top_ns)]
+            contexts = [self._build_context(grouped) for grouped in grouped_batch]
+        with span("llm") as llm:
+            responses = await self._get_llm_provider().agenerate_batch(
+                [self._build_messages(q, ctx) for q, ctx in zip(questions, contexts)],
+                max_concurrency=settings.llm_batch_concurrency,
+                max_tokens=self.max_tokens,
+                timeout=timeout
+            )
+        logger.info(f"📊 EnrichedRAG batch of {len(questions)} processed in {time.time() - start_time:.3f}s "
+                    f"(Search: {search.elapsed:.3f}s, LLM: {llm.elapsed:.3f}s)")
+        return list(zip(responses, grouped_batch))
+
+    async def astream_query(self, question: str, top_n: int = 8) -> AsyncIterator[Tuple[str, Any]]:
+        """Versión streaming de aquery: hits agrupados apenas termina la búsqueda y después los tokens del LLM"""
+        start_time = time.time()
+        retriever = self._get_retriever()
+        effective_top_n = min(top_n, self.max_results)
+        with span("retrieval") as search:
+            hits = await retriever.aquery(question, effective_top_n)
+        with span("context") as ctx:
+            grouped_hits = self._group_hits_by_expediente(hits)
+            context = self._build_context(grouped_hits)
+        yield "hits", grouped_hits
+        with span("llm") as llm:
+            async for token in self._get_llm_provider().agenerate_stream(self._build_messages(question, context), max_tokens=self.max_tokens):
+                yield "token", token
+        self._log_performance(time.time() - start_time, search.elapsed, ctx.elapsed, llm.elapsed, hits, context)
+
     def _build_context(self, grouped_hits: List[Dict[str, Any]]) -> str:
         """Devuelve:  FALLO → GENERAL → DETALLES  para cada expediente."""
         def fmt_articulos(arts):
@@ -136,11 +193,13 @@ class EnrichedRAGPipeline(BaseRAGPipeline):
 
         return "\n".join(lines)
 
-    def _generate_response(self, question: str, context: str) -> str:
+    def _build_messages(self, question: str, context: str) -> List[Dict[str, str]]:
         prompt = textwrap.dedent(MULTI_JUSTIFY_PROMPT).format(question=question, context=context)
-        messages = [{"role": "user", "content": prompt}]
+        return [{"role": "user", "content": prompt}]
+
+    def _generate_response(self, question: str, context: str) -> str:
         llm_provider = self._get_llm_provider()
-        return llm_provider.generate(messages, max_tokens=self.max_tokens)
+        return llm_provider.generate(self._build_messages(question, context), max_tokens=self.max_tokens)
 
     def _log_performance(self, total_time, search_time, ctx_time, llm_time, hits, context):
         logger.info(f"📊 EnrichedRAG query processed in {total_time:.3f}s:")
@@ -161,8 +220,11 @@ class EnrichedRAGPipeline(BaseRAGPipeline):
             "llm_stats": llm_provider.get_stats() if llm_provider else None
         }
 
+    def warmup_components(self) -> Dict[str, Callable[[], Any]]:
+        return {"retriever": self._get_retriever, "llm": self._get_llm_provider}
+
     def supports_streaming(self) -> bool:
-        return False
+        return self._get_llm_provider().supports_streaming()
 
 # Alias para compatibilidad
 RAGPipeline = EnrichedRAGPipeline
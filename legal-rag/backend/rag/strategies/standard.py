@@ -1,12 +1,13 @@
 import textwrap, time
 import logging
-from typing import Tuple, List, Dict, Any
+from typing import AsyncIterator, Callable, Tuple, List, Dict, Any, Optional, Sequence, Union
 
-from ..base import BaseRAGPipeline
-from backend.search import get_retriever
+from ..base import BaseRAGPipeline, batch_top_ns
+from backend.search import get_shared_retriever
 from backend.llm import get_llm_provider
 
 from backend.config import get_settings
+from backend.tracing import span
 
 settings = get_settings()
 
@@ -21,7 +22,8 @@ def get_retriever_singleton():
     global _retriever_instance
     if _retriever_instance is None:
         logger.info("🚀 Inicializando retriever (primera vez)...")
-        _retriever_instance = get_retriever("hybrid")
+        # Handle compartido: tras un rebuild se reemplaza en caliente (ver search/hot_swap.py)
+        _retriever_instance = get_shared_retriever("hybrid")
     return _retriever_instance
 
 def get_llm_singleton():
@@ -74,27 +76,94 @@ class StandardRAGPipeline(BaseRAGPipeline):
         retriever = self._get_retriever()
         effective_top_n = min(top_n, self.max_results)
         
-        search_start = time.time()
-        hits = retriever.query(question, effective_top_n)
-        search_time = time.time() - search_start
+        with span("retrieval") as search:
+            hits = retriever.query(question, effective_top_n)
         
         # Construcción de contexto
-        ctx_start = time.time()
-        context = self._build_context(hits)
-        ctx_time = time.time() - ctx_start
+        with span("context") as ctx:
+            context = self._build_context(hits)
         
         # Generación de respuesta
-        llm_start = time.time()
-        response = self._generate_response(question, context)
-        llm_time = time.time() - llm_start
+        with span("llm") as llm:
+            response = self._generate_response(question, context)
         
         total_time = time.time() - start_time
         
         # Logging
-        self._log_performance(total_time, search_time, ctx_time, llm_time, hits, context)
+        self._log_performance(total_time, search.elapsed, ctx.elapsed, llm.elapsed, hits, context)
         
         return response, hits
     
+    async def aquery(self, question: str, top_n: int = 8) -> Tuple[str, List[Dict[str, Any]]]:
+        """Versión async de query: retrieval async + LLM async, sin bloquear el event loop"""
+        start_time = time.time()
+        
+        retriever = self._get_retriever()
+        effective_top_n = min(top_n, self.max_results)
+        
+        with span("retrieval") as search:
+            hits = await retriever.aquery(question, effective_top_n)
+        
+        with span("context") as ctx:
+            context = self._build_context(hits)
+        
+        with span("llm") as llm:
+            response = await self._get_llm_provider().agenerate(self._build_messages(question, context), max_tokens=self.max_tokens)
+        
+        self._log_performance(time.time() - start_time, search.elapsed, ctx.elapsed, llm.elapsed, hits, context)
+        
+        return response, hits
+    
+    async def aquery_batch(self, questions: List[str], top_n: Union[int, Sequence[int]] = 8, timeout: Optional[float] = None) -> List[Tuple[str, List[Dict[str, Any]]]]:
+        """Varias consultas: un retrieval en batch y las llamadas al LLM concurrentes (LLM_BATCH_CONCURRENCY), cada una con su timeout"""
+        if not questions:
+            return []
+        start_time = time.time()
+        
+        retriever = self._get_retriever()
+        effective_top_ns = [min(n, self.max_results) for n in batch_top_ns(top_n, len(questions))]
+        
+        # Un solo retrieval con el top_n mayor; cada pregunta se queda con sus primeros top_n
+        with span("retrieval") as search:
+            hits_batch = await retriever.aquery_batch(questions, max(effective_top_ns))
+            hits_batch = [hits[:n] for hits, n in zip(hits_batch, effective_top_ns)]
+        
+        with span("context"):
+            contexts = [self._build_context(hits) for hits in hits_batch]
+        
+        with span("llm") as llm:
+            responses = await self._get_llm_provider().agenerate_batch(
+                [self._build_messages(q, ctx) for q, ctx in zip(questions, contexts)],
+                max_concurrency=settings.llm_batch_concurrency,
+                max_tokens=self.max_tokens,
+                timeout=timeout
+            )
+        
+        logger.info(f"📊 StandardRAG batch of {len(questions)} processed in {time.time() - start_time:.3f}s "
+                    f"(Search: {search.elapsed:.3f}s, LLM: {llm.elapsed:.3f}s)")
+        
+        return list(zip(responses, hits_batch))
+    
+    async def astream_query(self, question: str, top_n: int = 8) -> AsyncIterator[Tuple[str, Any]]:
+        """Versión streaming de aquery: manda los hits apenas termina la búsqueda y después los tokens del LLM"""
+        start_time = time.time()
+        
+        retriever = self._get_retriever()
+        effective_top_n = min(top_n, self.max_results)
+        
+        with span("retrieval") as search:
+            hits = await retriever.aquery(question, effective_top_n)
+        yield "hits", hits
+        
+        with span("context") as ctx:
+            context = self._build_context(hits)
+        
+        with span("llm") as llm:
+            async for token in self._get_llm_provider().agenerate_stream(self._build_messages(question, context), max_tokens=self.max_tokens):
+                yield "token", token
+        
+        self._log_performance(time.time() - start_time, search.elapsed, ctx.elapsed, llm.elapsed, hits, context)
+    
     def _build_context(self, hits: List[Dict[str, Any]]) -> str:
         """Construye el contexto optimizado"""
         return "\n".join(
@@ -102,13 +171,15 @@ class StandardRAGPipeline(BaseRAGPipeline):
             for h in hits
         )
     
+    def _build_messages(self, question: str, context: str) -> List[Dict[str, str]]:
+        """Mensajes para el LLM"""
+        prompt = textwrap.dedent(PROMPT).format(question=question, context=context)
+        return [{"role": "user", "content": prompt}]
+    
     def _generate_response(self, question: str, context: str) -> str:
         """Genera respuesta usando LLM"""
-        prompt = textwrap.dedent(PROMPT).format(question=question, context=context)
-        messages = [{"role": "user", "content": prompt}]
-        
         llm_provider = self._get_llm_provider()
-        return llm_provider.generate(messages, max_tokens=self.max_tokens)
+        return llm_provider.generate(self._build_messages(question, context), max_tokens=self.max_tokens)
     
     def _log_performance(self, total_time, search_time, ctx_time, llm_time, hits, context):
         """Log de métricas de rendimiento"""
@@ -132,9 +203,12 @@ class StandardRAGPipeline(BaseRAGPipeline):
             "llm_stats": llm_provider.get_stats() if llm_provider else None
         }
     
+    def warmup_components(self) -> Dict[str, Callable[[], Any]]:
+        return {"retriever": self._get_retriever, "llm": self._get_llm_provider}
+    
     def supports_streaming(self) -> bool:
-        """StandardRAG no soporta streaming por ahora"""
-        return False
+        """Streaming de tokens si el proveedor LLM lo soporta (ver astream_query)"""
+        return self._get_llm_provider().supports_streaming()
 
 # Alias para compatibilidad
 RAGPipeline = StandardRAGPipeline
\ No newline at end of file
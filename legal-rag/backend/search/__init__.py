@@ -2,9 +2,11 @@
 from .base import BaseRetriever
 from .builders import BM25Builder, QdrantBuilder, EmbeddingBuilder
 from .indexing import build_indexes
+from .incremental import update_indexes
 
 # Factory principal
 from .factory import get_retriever, get_available_strategies, get_default_strategy
+from .hot_swap import RetrieverHandle, get_shared_retriever, reload_retrievers
 
 # Acceso directo a estrategias
 from .strategies import HybridRetriever, DenseOnlyRetriever
@@ -16,11 +18,15 @@ __all__ = [
     "QdrantBuilder", 
     "EmbeddingBuilder",
     "build_indexes",
+    "update_indexes",
     
     # Factory
     "get_retriever",
     "get_available_strategies", 
     "get_default_strategy",
+    "RetrieverHandle",
+    "get_shared_retriever",
+    "reload_retrievers",
     
     # Estrategias directas
     "HybridRetriever",
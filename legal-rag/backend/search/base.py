@@ -1,6 +1,6 @@
 # backend/search/base.py
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 class BaseRetriever(ABC):
     """Interface simple para retrievers"""
@@ -19,6 +19,32 @@ class BaseRetriever(ABC):
         """
         pass
     
+    async def aquery(self, question: str, top_n: int = 10) -> List[Dict[str, Any]]:
+        """Versión async de query; por defecto corre query en el pool CPU"""
+        from backend.concurrency import run_cpu
+        return await run_cpu(self.query, question, top_n)
+    
+    def query_batch(self, questions: List[str], top_n: int = 10) -> List[List[Dict[str, Any]]]:
+        """query para varias preguntas; por defecto una a una"""
+        return [self.query(q, top_n) for q in questions]
+    
+    async def aquery_batch(self, questions: List[str], top_n: int = 10) -> List[List[Dict[str, Any]]]:
+        """Versión async de query_batch; por defecto corre query_batch en el pool CPU"""
+        from backend.concurrency import run_cpu
+        return await run_cpu(self.query_batch, questions, top_n)
+    
+    def encode_question(self, question: str) -> Optional[Any]:
+        """Embedding de la pregunta (None si el retriever no usa embeddings)"""
+        return None
+    
+    def encode_questions(self, questions: List[str]) -> List[Optional[Any]]:
+        """Embeddings de varias preguntas; por defecto una a una"""
+        return [self.encode_question(q) for q in questions]
+    
+    def warm_up(self):
+        """Precalienta modelos e índices (una inferencia de prueba); por defecto no hace nada"""
+        pass
+    
     def get_stats(self) -> Dict[str, Any]:
         """Retorna estadísticas del retriever"""
         return {"retriever_type": "base"}
@@ -0,0 +1,378 @@
+# backend/search/bm25.py
+"""
+Índice BM25 disperso en disco (formato CSR, memory-mapped)
+
+Estructura del directorio del índice:
+    vocab.npy     términos ordenados (unicode de ancho fijo) → búsqueda con searchsorted
+    indptr.npy    offsets CSR por término (len = n_terms + 1)
+    postings.npy  ids de documento de cada posting, ordenados por (término, doc)
+    tf.npy        frecuencia del término en el documento
+    weights.npy   contribución BM25 precalculada de cada posting
+    max_weights.npy  cota superior por término (máximo de sus pesos), usada por MaxScore
+    doc_len.npy   longitud (en tokens) de cada documento
+    point_ids.npy point id (Qdrant / payload store) de cada documento
+    meta.json     parámetros (k1, b, epsilon, avgdl, n_docs, n_terms)
+
+Todos los arrays se abren con np.load(mmap_mode="r"), de modo que varios workers
+comparten las mismas páginas del page-cache en lugar de tener cada uno su copia.
+"""
+import json
+import os
+from array import array
+from collections import Counter
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+# Parámetros por defecto de rank_bm25.BM25Okapi (mismo ranking que el índice pickled anterior)
+BM25_K1 = 1.5
+BM25_B = 0.75
+BM25_EPSILON = 0.25
+
+# Tokens más largos suelen ser basura de OCR y agrandan el ancho fijo del vocabulario
+MAX_TOKEN_LENGTH = 64
+
+META_FILE = "meta.json"
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokenización compartida entre indexación y consulta"""
+    return [t for t in text.lower().split() if len(t) <= MAX_TOKEN_LENGTH]
+
+
+class BM25Accumulator:
+    """
+    Acumula estadísticas BM25 documento a documento (indexación streaming).
+
+    Solo guarda los postings (término, doc, tf) en arrays tipados compactos, nunca los textos,
+    así que la memoria crece con el tamaño del índice y no con el del corpus.
+    """
+
+    def __init__(self):
+        self.vocab = {}
+        self.term_ids = array("q")
+        self.doc_ids = array("i")
+        self.tfs = array("f")
+        self.doc_len = array("i")
+        self.point_ids = array("q")
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.doc_len)
+
+    def add(self, tokens: List[str], point_id: int = None) -> int:
+        """Agrega un documento tokenizado y devuelve su doc id"""
+        doc_id = len(self.doc_len)
+        self.doc_len.append(len(tokens))
+        self.point_ids.append(doc_id if point_id is None else point_id)
+        for term, tf in Counter(tokens).items():
+            self.term_ids.append(self.vocab.setdefault(term, len(self.vocab)))
+            self.doc_ids.append(doc_id)
+            self.tfs.append(tf)
+        return doc_id
+
+    def add_many(self, tokenized_texts: Iterable[List[str]]):
+        for tokens in tokenized_texts:
+            self.add(tokens)
+
+    def write(self, index_dir: str, k1: float = BM25_K1, b: float = BM25_B, epsilon: float = BM25_EPSILON) -> dict:
+        """Ordena los postings en formato CSR y guarda el índice en index_dir"""
+        if self.n_docs == 0:
+            raise ValueError("Lista de textos no puede estar vacía")
+        return write_csr(
+            index_dir,
+            list(self.vocab.keys()),
+            np.frombuffer(self.term_ids, dtype=np.int64),
+            np.frombuffer(self.doc_ids, dtype=np.int32),
+            np.frombuffer(self.tfs, dtype=np.float32),
+            np.frombuffer(self.doc_len, dtype=np.int32),
+            k1, b, epsilon,
+            point_ids=np.frombuffer(self.point_ids, dtype=np.int64),
+        )
+
+
+def write_bm25_index(index_dir: str, tokenized_texts: Iterable[List[str]],
+                     k1: float = BM25_K1, b: float = BM25_B, epsilon: float = BM25_EPSILON) -> dict:
+    """Construye el índice CSR a partir de documentos tokenizados y lo guarda en index_dir"""
+    accumulator = BM25Accumulator()
+    accumulator.add_many(tokenized_texts)
+    return accumulator.write(index_dir, k1, b, epsilon)
+
+
+def write_csr(index_dir: str, terms: List[str], term_ids: np.ndarray, doc_ids: np.ndarray,
+              tfs: np.ndarray, doc_len: np.ndarray,
+              k1: float = BM25_K1, b: float = BM25_B, epsilon: float = BM25_EPSILON,
+              point_ids: np.ndarray = None) -> dict:
+    """
+    Escribe el índice a partir de postings sin ordenar (term_id, doc_id, tf).
+
+    term_ids indexa en `terms`; los pesos BM25 se recalculan con las estadísticas globales.
+    point_ids mapea cada doc id a su point id (por defecto, el propio doc id).
+    """
+    n_docs = len(doc_len)
+    point_ids = np.arange(n_docs, dtype=np.int64) if point_ids is None else np.asarray(point_ids, dtype=np.int64)
+
+    # Términos sin postings (p.ej. tras eliminar documentos) se descartan: todas las listas quedan no vacías
+    term_ids = np.asarray(term_ids, dtype=np.int64)
+    used = np.bincount(term_ids, minlength=len(terms)) > 0
+    if not used.all():
+        compact = np.cumsum(used) - 1
+        terms = [t for t, u in zip(terms, used) if u]
+        term_ids = compact[term_ids]
+
+    # Vocabulario ordenado alfabéticamente para poder buscar términos con searchsorted
+    width = max((len(t) for t in terms), default=1)
+    terms = np.array(terms, dtype=f"<U{width}")
+    order = np.argsort(terms, kind="stable")
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+
+    term_ids = rank[term_ids]
+    doc_ids = np.asarray(doc_ids, dtype=np.int32)
+    tfs = np.asarray(tfs, dtype=np.float32)
+    doc_len = np.asarray(doc_len, dtype=np.int32)
+
+    # Postings ordenados por (término, documento)
+    perm = np.lexsort((doc_ids, term_ids))
+    term_ids, doc_ids, tfs = term_ids[perm], doc_ids[perm], tfs[perm]
+
+    df = np.bincount(term_ids, minlength=len(terms))
+    indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(df, out=indptr[1:])
+
+    weights, avgdl = _compute_weights(term_ids, doc_ids, tfs, df, doc_len, n_docs, k1, b, epsilon)
+
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(os.path.join(index_dir, "vocab.npy"), terms[order])
+    np.save(os.path.join(index_dir, "indptr.npy"), indptr)
+    np.save(os.path.join(index_dir, "postings.npy"), doc_ids)
+    np.save(os.path.join(index_dir, "tf.npy"), tfs)
+    np.save(os.path.join(index_dir, "weights.npy"), weights)
+    np.save(os.path.join(index_dir, "doc_len.npy"), doc_len)
+    np.save(os.path.join(index_dir, "max_weights.npy"), term_upper_bounds(weights, indptr))
+    np.save(os.path.join(index_dir, "point_ids.npy"), point_ids)
+
+    meta = {
+        "format": "csr-v1",
+        "k1": k1,
+        "b": b,
+        "epsilon": epsilon,
+        "avgdl": avgdl,
+        "n_docs": n_docs,
+        "n_terms": len(terms),
+        "n_postings": int(len(doc_ids)),
+    }
+    # meta.json se escribe al final: su presencia indica un índice completo
+    with open(os.path.join(index_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    return meta
+
+
+def update_bm25_index(src_dir: str, dst_dir: str, remove_point_ids: Iterable[int],
+                      new_tokenized: Iterable[List[str]], new_point_ids: Iterable[int]) -> Tuple[dict, np.ndarray]:
+    """
+    Actualización incremental: elimina documentos por point id y agrega documentos nuevos
+
+    Los postings existentes se leen del índice en src_dir (sin re-tokenizar el corpus), se
+    filtran, se les suman los del lote nuevo y se reescribe el CSR en dst_dir con idf y avgdl
+    recalculados. dst_dir debe ser distinto de src_dir: src_dir está memory-mapped.
+
+    Returns:
+        (meta, kept_doc_ids): doc ids de src_dir que se conservan, en el orden del nuevo índice.
+        Los documentos nuevos quedan a continuación, en el orden recibido.
+    """
+    index = SparseBM25Index(src_dir)
+
+    keep = ~np.isin(index.point_ids, np.asarray(list(remove_point_ids), dtype=np.int64))
+    kept_doc_ids = np.flatnonzero(keep)
+    remap = np.full(index.n_docs, -1, dtype=np.int64)
+    remap[kept_doc_ids] = np.arange(len(kept_doc_ids))
+
+    # Postings existentes como tripletas (término, doc, tf), sin los documentos eliminados
+    term_ids = np.repeat(np.arange(len(index.vocab), dtype=np.int64), np.diff(index.indptr))
+    doc_ids = remap[index.postings]
+    alive = doc_ids >= 0
+    term_ids, doc_ids = term_ids[alive], doc_ids[alive]
+    tfs = np.asarray(index.tf)[alive]
+
+    # Documentos nuevos, extendiendo el vocabulario existente
+    acc = BM25Accumulator()
+    acc.vocab = {str(t): i for i, t in enumerate(index.vocab.tolist())}
+    for tokens, point_id in zip(new_tokenized, new_point_ids):
+        acc.add(tokens, point_id)
+
+    new_term_ids = np.frombuffer(acc.term_ids, dtype=np.int64)
+    new_doc_ids = np.frombuffer(acc.doc_ids, dtype=np.int32).astype(np.int64) + len(kept_doc_ids)
+
+    meta = write_csr(
+        dst_dir,
+        list(acc.vocab.keys()),
+        np.concatenate([term_ids, new_term_ids]),
+        np.concatenate([doc_ids, new_doc_ids]),
+        np.concatenate([tfs, np.frombuffer(acc.tfs, dtype=np.float32)]),
+        np.concatenate([np.asarray(index.doc_len)[kept_doc_ids], np.frombuffer(acc.doc_len, dtype=np.int32)]),
+        index.meta["k1"], index.meta["b"], index.meta["epsilon"],
+        point_ids=np.concatenate([np.asarray(index.point_ids)[kept_doc_ids], np.frombuffer(acc.point_ids, dtype=np.int64)]),
+    )
+    return meta, kept_doc_ids
+
+
+def _compute_weights(term_ids, doc_ids, tfs, df, doc_len, n_docs, k1, b, epsilon) -> Tuple[np.ndarray, float]:
+    """Contribución BM25Okapi de cada posting (idf * saturación de tf normalizada por longitud)"""
+    avgdl = float(doc_len.mean()) if n_docs else 0.0
+
+    idf = np.log(n_docs - df + 0.5) - np.log(df + 0.5)
+    if len(idf):
+        # Igual que rank_bm25: idf negativos se reemplazan por epsilon * idf promedio
+        idf = np.where(idf < 0, epsilon * idf.mean(), idf)
+
+    norm = k1 * (1 - b + b * doc_len[doc_ids] / max(avgdl, 1e-9))
+    weights = idf[term_ids] * (tfs * (k1 + 1) / (tfs + norm))
+    return weights.astype(np.float32), avgdl
+
+
+def term_upper_bounds(weights: np.ndarray, indptr: np.ndarray) -> np.ndarray:
+    """Máximo peso de cada lista de postings (todas las listas tienen al menos un posting)"""
+    if len(indptr) <= 1:
+        return np.empty(0, dtype=np.float32)
+    return np.maximum.reduceat(weights, indptr[:-1]).astype(np.float32)
+
+
+class SparseBM25Index:
+    """Índice BM25 memory-mapped; el scoring solo toca los postings de los términos de la consulta"""
+
+    def __init__(self, index_dir: str):
+        meta_path = os.path.join(index_dir, META_FILE)
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(2, "BM25 index not found", meta_path)
+
+        with open(meta_path, encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        self.index_dir = index_dir
+        self.vocab = self._load("vocab.npy")
+        self.indptr = self._load("indptr.npy")
+        self.postings = self._load("postings.npy")
+        self.weights = self._load("weights.npy")
+        self.doc_len = self._load("doc_len.npy")
+        self._max_weights = None
+
+        # Índices sin point_ids.npy usan el doc id como point id
+        if os.path.exists(os.path.join(index_dir, "point_ids.npy")):
+            self.point_ids = self._load("point_ids.npy")
+        else:
+            self.point_ids = np.arange(self.n_docs, dtype=np.int64)
+
+    @property
+    def tf(self) -> np.ndarray:
+        return self._load("tf.npy")
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.index_dir, name), mmap_mode="r")
+
+    @property
+    def n_docs(self) -> int:
+        return int(self.meta["n_docs"])
+
+    @property
+    def max_weights(self) -> np.ndarray:
+        """Cotas superiores por término; índices viejos sin max_weights.npy las calculan al vuelo"""
+        if self._max_weights is None:
+            path = os.path.join(self.index_dir, "max_weights.npy")
+            if os.path.exists(path):
+                self._max_weights = np.load(path, mmap_mode="r")
+            else:
+                self._max_weights = term_upper_bounds(self.weights, self.indptr)
+        return self._max_weights
+
+    def postings_of(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Doc ids (ordenados) y pesos de la lista de postings de un término"""
+        s = slice(self.indptr[term_id], self.indptr[term_id + 1])
+        return self.postings[s], self.weights[s]
+
+    def term_ids(self, tokens: List[str]) -> np.ndarray:
+        """Ids de los tokens presentes en el vocabulario (se conservan repetidos, como rank_bm25)"""
+        # Tokens más largos que el ancho del vocabulario se truncarían y podrían dar falsos matches
+        width = self.vocab.dtype.itemsize // 4
+        tokens = [t for t in tokens if len(t) <= width]
+        if not tokens or len(self.vocab) == 0:
+            return np.empty(0, dtype=np.int64)
+        query = np.asarray(tokens, dtype=self.vocab.dtype)
+        pos = np.searchsorted(self.vocab, query)
+        pos = np.minimum(pos, len(self.vocab) - 1)
+        return pos[self.vocab[pos] == query].astype(np.int64)
+
+    def _gather(self, term_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Concatena los postings (doc ids y pesos) de los términos dados"""
+        if len(term_ids) == 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        slices = [slice(self.indptr[t], self.indptr[t + 1]) for t in term_ids]
+        docs = np.concatenate([self.postings[s] for s in slices])
+        weights = np.concatenate([self.weights[s] for s in slices])
+        return docs, weights
+
+    def get_scores(self, tokens: List[str]) -> np.ndarray:
+        """Scores BM25 densos (uno por documento), compatible con BM25Okapi.get_scores"""
+        docs, weights = self._gather(self.term_ids(tokens))
+        return np.bincount(docs, weights=weights, minlength=self.n_docs)
+
+    def top_k(self, tokens: List[str], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k documentos con score > 0, ordenados de mayor a menor"""
+        docs, weights = self._gather(self.term_ids(tokens))
+        if len(docs) == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        # Acumulación dispersa: solo documentos que aparecen en algún posting
+        uniq, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights)
+
+        if len(uniq) > k:
+            part = np.argpartition(scores, -k)[-k:]
+            uniq, scores = uniq[part], scores[part]
+        order = np.argsort(scores)[::-1]
+        return uniq[order].astype(np.int64), scores[order]
+
+    def top_k_batch(self, token_lists: List[List[str]], k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        top_k de varias consultas en una sola acumulación
+
+        Los postings de todas las consultas se acumulan juntos con clave (consulta, doc), como
+        una matriz dispersa consultas x documentos, y el top-k de cada fila sale de un único
+        ordenamiento.
+        """
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+        if k <= 0 or not token_lists:
+            return [empty for _ in token_lists]
+
+        query_parts, doc_parts, weight_parts = [], [], []
+        for qi, tokens in enumerate(token_lists):
+            docs, weights = self._gather(self.term_ids(tokens))
+            query_parts.append(np.full(len(docs), qi, dtype=np.int64))
+            doc_parts.append(docs)
+            weight_parts.append(weights)
+
+        keys = np.concatenate(query_parts) * self.n_docs + np.concatenate(doc_parts).astype(np.int64)
+        if len(keys) == 0:
+            return [empty for _ in token_lists]
+
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(weight_parts))
+        query_ids, docs = np.divmod(uniq, self.n_docs)
+
+        # Por consulta y, dentro de cada una, por score descendente
+        order = np.lexsort((-scores, query_ids))
+        query_ids, docs, scores = query_ids[order], docs[order], scores[order]
+        bounds = np.searchsorted(query_ids, np.arange(len(token_lists) + 1))
+        return [
+            (docs[start:min(start + k, end)], scores[start:min(start + k, end)])
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+
+    def get_stats(self) -> dict:
+        return {
+            "n_docs": self.n_docs,
+            "n_terms": int(self.meta["n_terms"]),
+            "n_postings": int(self.meta["n_postings"]),
+            "avgdl": float(self.meta["avgdl"]),
+        }
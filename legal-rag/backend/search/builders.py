@@ -1,125 +1,229 @@
-import pickle
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient, models as qmodels
-from rank_bm25 import BM25Okapi
 from tqdm import tqdm
 from backend.config import get_settings
+from backend.data.batch import ParagraphBatch
+from .bm25 import BM25Accumulator, SparseBM25Index, tokenize
+from .citations import INDEXED_FIELDS, citation_fields
+from .corpus import CorpusWriter
+from .documents import filter_fields
+from .embedding_cache import EmbeddingCache
+from .inference import EMB_MODEL, get_encoder, model_tag
+from .payload_store import PayloadStoreWriter
+from .qdrant_config import optimizers_config, vectors_config
 import os
+import time
 
 settings = get_settings()
 
-
-EMB_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
-
 class BM25Builder:
-    """Construye y guarda índices BM25"""
+    """Construye y guarda índices BM25 (CSR memory-mapped) y el corpus de textos"""
     
-    def __init__(self, bm25_path: str, corpus_path: str):
-        self.bm25_path = bm25_path
-        self.corpus_path = corpus_path
+    def __init__(self, index_dir: str, corpus_dir: str):
+        self.index_dir = index_dir
+        self.corpus_dir = corpus_dir
+        self.accumulator = BM25Accumulator()
+        self.corpus_writer = None
     
-    def build(self, texts: list[str]) -> BM25Okapi:
-        """Construye el índice BM25"""
-        if not texts:
+    def add(self, texts: list[str], point_ids: list[int] = None):
+        """Agrega un lote de textos a las estadísticas BM25 y al corpus (streaming)"""
+        if self.corpus_writer is None:
+            self.corpus_writer = CorpusWriter(self.corpus_dir)
+        for i, text in enumerate(texts):
+            self.accumulator.add(tokenize(text), None if point_ids is None else point_ids[i])
+            self.corpus_writer.add(text)
+    
+    def finish(self) -> dict:
+        """Escribe el índice CSR y cierra el corpus"""
+        if self.accumulator.n_docs == 0:
             raise ValueError("Lista de textos no puede estar vacía")
             
-        print("📝 Construyendo índice BM25...")
-        
-        # Tu lógica de tokenización optimizada
-        if len(texts) > 50000:
-            print("⚡ Optimizando tokenización para gran volumen...")
-            tokenized_texts = []
-            for text in tqdm(texts, desc="Tokenizando"):
-                tokens = [
-                    token.lower() for token in text.split() 
-                    if len(token) > 2 and len(token) < 20
-                ]
-                tokenized_texts.append(tokens)
-        else:
-            tokenized_texts = [text.split() for text in texts]
-        
-        bm25 = BM25Okapi(tokenized_texts)
-        
-        # Guardar
-        os.makedirs(os.path.dirname(self.bm25_path), exist_ok=True)
-        os.makedirs(os.path.dirname(self.corpus_path), exist_ok=True)
-        
-        np.save(self.corpus_path, texts, allow_pickle=True)
-        with open(self.bm25_path, "wb") as f:
-            pickle.dump(bm25, f, protocol=pickle.HIGHEST_PROTOCOL)
-        
-        return bm25
+        print("📝 Escribiendo índice BM25...")
+        meta = self.accumulator.write(self.index_dir)
+        self.corpus_writer.close()
+        print(f"   Vocabulario: {meta['n_terms']:,} términos, {meta['n_postings']:,} postings")
+        return meta
+    
+    def build(self, texts: list[str]) -> SparseBM25Index:
+        """Construye el índice BM25"""
+        self.add(tqdm(texts, desc="Tokenizando"))
+        self.finish()
+        return SparseBM25Index(self.index_dir)
+
+class PayloadStoreBuilder:
+    """Construye el payload store local (msgpack + offsets memory-mapped)"""
+    
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        self.writer = None
+    
+    def add(self, ids: list[int], payloads: list):
+        """Agrega un lote de payloads (streaming)"""
+        if self.writer is None:
+            self.writer = PayloadStoreWriter(self.store_dir)
+        self.writer.add_many(ids, payloads)
+    
+    def finish(self) -> dict:
+        return self.writer.close()
+    
+    def build(self, ids: list[int], payloads: list) -> dict:
+        """Guarda los payloads indexados por point id"""
+        print("🗃️  Construyendo payload store local...")
+        self.add(ids, payloads)
+        return self.finish()
 
 class QdrantBuilder:
     """Construye colección Qdrant"""
     
-    def __init__(self, qdrant_url: str):
+    def __init__(self, qdrant_url: str, collection_name: str = settings.qdrant_collection):
         self.client = QdrantClient(url=qdrant_url)
+        self.collection_name = collection_name
     
-    def build(self, vectors: np.ndarray, payloads: list, batch_size: int = 1000):
-        """Construye la colección Qdrant"""
+    def create_collection(self, dim: int):
+        """(Re)crea la colección vacía"""
         print("🗄️  Configurando Qdrant...")
         
         # Recrear colección
         try:
             collections = self.client.get_collections().collections
-            if any(c.name == "fallos" for c in collections):
+            if any(c.name == self.collection_name for c in collections):
                 print("🔄 Recreando colección existente...")
-                self.client.delete_collection("fallos")
+                self.client.delete_collection(self.collection_name)
         except Exception as e:
             print(f"ℹ️  Colección no existía previamente: {e}")
         
+        # Datatype, cuantización, HNSW y segmentos según Settings (ver qdrant_config.py)
         self.client.create_collection(
-            collection_name="fallos",
-            vectors_config=qmodels.VectorParams(
-                size=vectors.shape[1], 
-                distance="Cosine"
-            ),
-            optimizers_config=qmodels.OptimizersConfigDiff(
-                deleted_threshold=0.2,
-                vacuum_min_vector_number=1000,
-                default_segment_number=2,
-                max_segment_size=20000,
-                flush_interval_sec=5
-            )
+            collection_name=self.collection_name,
+            vectors_config=vectors_config(dim),
+            optimizers_config=optimizers_config()
+        )
+        self.create_payload_indexes()
+    
+    def copy_collection(self, source: str, timeout: float = 600):
+        """
+        Crea la colección como copia de `source` (misma configuración de vectores)
+
+        La indexación incremental modifica la copia y después mueve el alias: la colección que
+        está sirviendo no cambia hasta la activación.
+        """
+        print(f"🗄️  Copiando colección {source} → {self.collection_name}...")
+        info = self.client.get_collection(source)
+        self.client.create_collection(
+            collection_name=self.collection_name,
+            vectors_config=info.config.params.vectors,
+            hnsw_config=qmodels.HnswConfigDiff(**info.config.hnsw_config.model_dump()),
+            quantization_config=info.config.quantization_config,
+            optimizers_config=optimizers_config(),
+            init_from=qmodels.InitFrom(collection=source),
         )
+        # Esperar a que la copia tenga todos los puntos antes de modificarla
+        expected = self.client.count(source, exact=True).count
+        deadline = time.time() + timeout
+        while self.client.count(self.collection_name, exact=True).count < expected:
+            if time.time() > deadline:
+                raise TimeoutError(f"La copia de {source} no terminó en {timeout:.0f}s")
+            time.sleep(1)
+        self.create_payload_indexes()
+    
+    def create_payload_indexes(self):
+        """Payload indexes keyword para la búsqueda densa filtrada por citas (ver citations.py)"""
+        for field in INDEXED_FIELDS:
+            self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name=field,
+                field_schema=qmodels.PayloadSchemaType.KEYWORD
+            )
         
-        # Subir en lotes
-        print("📤 Subiendo vectores a Qdrant...")
-        for i in tqdm(range(0, len(vectors), batch_size), desc="Subiendo lotes"):
+    def upload(self, vectors: np.ndarray, payloads: list, ids: list[int], batch_size: int = 1000, show_progress: bool = False):
+        """Sube vectores con sus ids en lotes (payloads completos llevan además los campos planos de citas)"""
+        payloads = [{**p, **citation_fields(p)} if "articulos_citados" in p else p for p in payloads]
+        batches = range(0, len(vectors), batch_size)
+        for i in (tqdm(batches, desc="Subiendo lotes") if show_progress else batches):
             end_idx = min(i + batch_size, len(vectors))
             batch_vectors = vectors[i:end_idx]
             batch_payloads = payloads[i:end_idx]
-            batch_ids = list(range(i, end_idx))
+            batch_ids = ids[i:end_idx]
             
             try:
                 self.client.upload_collection(
-                    collection_name="fallos",
+                    collection_name=self.collection_name,
                     vectors=batch_vectors,
                     payload=batch_payloads,
                     ids=batch_ids,
                     batch_size=min(100, len(batch_vectors))
                 )
             except Exception as e:
-                print(f"❌ Error subiendo lote {i//batch_size + 1}: {e}")
+                print(f"❌ Error subiendo ids {batch_ids[0]}-{batch_ids[-1]}: {e}")
                 raise
+    
+    def upload_batch(self, vectors: np.ndarray, batch: ParagraphBatch, ids: list[int], batch_size: int = 1000):
+        """Sube una ParagraphBatch: cada punto lleva su párrafo y los campos filtrables de su fallo"""
+        fields = [filter_fields(document) for document in batch.documents.records]
+        payloads = [{**p, **fields[row]} for p, row in zip(batch.payloads(), batch.doc_row)]
+        self.upload(vectors, payloads, ids, batch_size)
+    
+    def delete(self, ids: list[int], batch_size: int = 1000):
+        """Elimina puntos por id (indexación incremental)"""
+        for i in range(0, len(ids), batch_size):
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=qmodels.PointIdsList(points=ids[i:i + batch_size])
+            )
+    
+    def build(self, vectors: np.ndarray, payloads: list, batch_size: int = 1000):
+        """Construye la colección Qdrant"""
+        self.create_collection(vectors.shape[1])
+        print("📤 Subiendo vectores a Qdrant...")
+        self.upload(vectors, payloads, list(range(len(vectors))), batch_size, show_progress=True)
 
 class EmbeddingBuilder:
-    """Genera embeddings"""
+    """Genera embeddings (consultando antes el cache persistente, ver embedding_cache.py)"""
     
-    def __init__(self, model_name: str = EMB_MODEL):
-        self.encoder = SentenceTransformer(model_name)
+    def __init__(self, model_name: str = EMB_MODEL, cache_dir: str = settings.embedding_cache_dir,
+                 use_cache: bool = settings.embedding_cache_enabled):
+        self.encoder = get_encoder(model_name, device=None)  # torch usa GPU si está disponible
+        self.cache = EmbeddingCache(cache_dir, model_tag(model_name, self.encoder)) if use_cache else None
     
-    def build(self, texts: list[str], batch_size: int = 32) -> np.ndarray:
-        """Genera embeddings para los textos"""
-        print("🧠 Generando embeddings densos...")
-        
-        vectors = self.encoder.encode(
+    def _encode(self, texts: list[str], batch_size: int, show_progress: bool) -> np.ndarray:
+        return self.encoder.encode(
             texts, 
             batch_size=batch_size, 
-            show_progress_bar=True,
+            show_progress_bar=show_progress,
             convert_to_numpy=True
         )
+    
+    def build(self, texts: list[str], batch_size: int = 32, show_progress: bool = True) -> np.ndarray:
+        """Genera embeddings para los textos; con cache solo se codifican los textos nuevos (una vez cada uno)"""
+        if show_progress:
+            print("🧠 Generando embeddings densos...")
         
-        return vectors
\ No newline at end of file
+        if self.cache is None:
+            return self._encode(texts, batch_size, show_progress)
+        
+        keys = self.cache.keys(texts)
+        found, cached = self.cache.lookup(keys)
+        missing = np.flatnonzero(~found)
+        if len(missing) == 0:
+            return cached.astype(np.float32)
+        
+        new_keys, first, inverse = np.unique(keys[missing], return_index=True, return_inverse=True)
+        encoded = self._encode([texts[i] for i in missing[first]], batch_size, show_progress).astype(np.float16)
+        self.cache.add(new_keys, encoded)
+        
+        vectors = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+        if len(cached):
+            vectors[found] = cached
+        vectors[missing] = encoded[inverse.reshape(-1)]
+        return vectors
+    
+    def close(self):
+        """Persiste los embeddings nuevos del cache"""
+        if self.cache is not None:
+            self.cache.flush()
+            stats = self.cache.get_stats()
+            print(f"💾 Cache de embeddings: {stats['hits']:,} reutilizados, {stats['misses']:,} a codificar "
+                  f"({stats['entries']:,} vectores en {stats['segments']} segmentos)")
+    
+    def get_stats(self) -> dict:
+        return self.cache.get_stats() if self.cache is not None else {"enabled": False}
@@ -0,0 +1,111 @@
+# backend/search/citations.py
+"""
+Citas legales (artículos y leyes) en preguntas y payloads
+
+- extract_citations(): números de artículo y de ley mencionados en un texto, y los pares
+  (ley, artículo) cuando el artículo viene seguido de su ley ("art. 5 de la ley 24.240").
+  El número del artículo tiene que seguir directamente a "art."/"artículo" (no se saltea
+  texto hasta el próximo número, que podía ser el de una ley); las leyes aceptan separador
+  de miles ("ley 24.449").
+- citation_fields(): campos planos que se agregan al payload de Qdrant al indexar
+  (citas_articulos, citas_leyes y citas_pares "ley:artículo") para filtrar con payload
+  indexes keyword.
+- citation_filter(): filtro de Qdrant para las citas de una pregunta (None si no hay).
+"""
+import re
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Set, Tuple
+
+from qdrant_client import models as qmodels
+
+ARTICLES_FIELD = "citas_articulos"
+LAWS_FIELD = "citas_leyes"
+PAIRS_FIELD = "citas_pares"
+# Campos con payload index keyword en cada colección
+INDEXED_FIELDS = (ARTICLES_FIELD, LAWS_FIELD, PAIRS_FIELD, "materia_preliminar", "expediente")
+
+_ARTICLE_NUMBER = r'\d+(?:\.\d{3})?(?:º|°)?'
+# "art. 5", "arts. 3, 14 y 29", "artículo 1.078", "Art. Nº 28", "-arts. 1º y 4º", "del art.114"
+_ARTICLE_RE = re.compile(
+    rf'\b(?:arts?\b\.?|art[íi]culos?\b)\s*(?:n[º°]\s*)?({_ARTICLE_NUMBER}(?:\s*(?:,|\by\b|\be\b)\s*{_ARTICLE_NUMBER}(?!\d))*)',
+    re.IGNORECASE,
+)
+_LAW_NUMBER = r'\d+(?:\.\d{3})*(?:/\d+)?'
+_LAW_PATTERNS = [re.compile(p, re.IGNORECASE) for p in (
+    rf'\bley\s+n?[º°]?\s*({_LAW_NUMBER})',  # ley 7046, ley nº 5678/90, ley 24.449
+    rf'\bleyes\s+n?[º°]?\s*({_LAW_NUMBER})(?:\s*[,y]\s*({_LAW_NUMBER}))*',  # leyes 123 y 456
+)]
+# Ley inmediatamente después de los artículos: "art. 5 ley 24.240", "arts. 1 y 2 de la ley 10.855"
+_LAW_AFTER_RE = re.compile(rf'\s*,?\s*(?:de\s+la\s+)?ley\s+n?[º°]?\s*({_LAW_NUMBER})', re.IGNORECASE)
+_NUMBER_RE = re.compile(_ARTICLE_NUMBER)
+_LAW_NUMBER_RE = re.compile(_LAW_NUMBER)
+
+
+class Citations(NamedTuple):
+    articles: Set[str]
+    laws: Set[str]
+    pairs: FrozenSet[Tuple[str, str]] = frozenset()  # (ley, artículo)
+
+    def __bool__(self) -> bool:
+        return bool(self.articles or self.laws)
+
+
+def normalize_article(num) -> str:
+    """'1.078' / '4º' / 1078 / ' 1078 ' -> '1078' / '4' / '1078' / '1078'"""
+    return str(num).strip().lower().replace(".", "").rstrip("º°")
+
+
+def _numbers(match: re.Match, number_re: re.Pattern) -> List[str]:
+    return [n for group in match.groups() if group for n in number_re.findall(group)]
+
+
+def pair_key(law: str, article: str) -> str:
+    return f"{law}:{article}"
+
+
+def extract_citations(text: str) -> Citations:
+    """Artículos, leyes y pares (ley, artículo) citados en el texto (normalizados)"""
+    articles, laws, pairs = set(), set(), set()
+    for match in _ARTICLE_RE.finditer(text):
+        numbers = [normalize_article(n) for n in _NUMBER_RE.findall(match.group(1))]
+        articles.update(numbers)
+        law = _LAW_AFTER_RE.match(text, match.end())
+        if law:
+            pairs.update((normalize_article(law.group(1)), n) for n in numbers)
+    for pattern in _LAW_PATTERNS:
+        for match in pattern.finditer(text):
+            laws.update(normalize_article(n) for n in _numbers(match, _LAW_NUMBER_RE))
+    return Citations(articles, laws, pairs)
+
+
+def citation_fields(payload: dict) -> Dict[str, List[str]]:
+    """Campos planos de citas del payload (artículos citados, leyes de sus fuentes y sus pares)"""
+    articles, laws, pairs = set(), set(), set()
+    for art in payload.get("articulos_citados") or []:
+        cited = {normalize_article(n) for n in art.get("cited_articles") or []}
+        source_laws = extract_citations(art.get("main_source") or "").laws
+        articles.update(cited)
+        laws.update(source_laws)
+        pairs.update(pair_key(law, n) for law in source_laws for n in cited)
+    return {ARTICLES_FIELD: sorted(articles), LAWS_FIELD: sorted(laws), PAIRS_FIELD: sorted(pairs)}
+
+
+def citation_filter(citations: Citations) -> Optional[qmodels.Filter]:
+    """
+    Filtro que pide citar alguna de las citas de la pregunta
+
+    Una condición `should` por par (ley, artículo) sobre citas_pares, así "art. 5 ley 24.240
+    y art. 1078 CC" no acepta un fallo que cite el art. 5 de otra ley; los artículos sin ley
+    y las leyes sin artículo se buscan en sus propios campos.
+    """
+    should = [
+        qmodels.FieldCondition(key=PAIRS_FIELD, match=qmodels.MatchValue(value=pair_key(law, article)))
+        for law, article in sorted(citations.pairs)
+    ]
+    articles = citations.articles - {article for _, article in citations.pairs}
+    laws = citations.laws - {law for law, _ in citations.pairs}
+    should += [
+        qmodels.FieldCondition(key=field, match=qmodels.MatchAny(any=sorted(values)))
+        for field, values in ((ARTICLES_FIELD, articles), (LAWS_FIELD, laws))
+        if values
+    ]
+    return qmodels.Filter(should=should) if should else None
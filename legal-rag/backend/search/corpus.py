@@ -0,0 +1,185 @@
+# backend/search/corpus.py
+"""
+Corpus de textos en disco, escrito en streaming y leído con mmap bajo demanda
+
+Estructura del directorio:
+    texts.bin    textos UTF-8 concatenados (en orden de doc id), o bloques zstd
+    offsets.npy  offset de inicio de cada texto; offsets[n] = tamaño total (sin comprimir)
+    blocks.npy   solo zstd: offset de cada bloque comprimido en texts.bin
+    meta.json    cantidad de textos, formato y tamaños
+
+Con CORPUS_COMPRESSION=zstd los textos se comprimen en bloques de BLOCK_SIZE textos, así que
+leer un doc id descomprime un solo bloque. Requiere el paquete opcional `zstandard`; si no
+está instalado se escribe sin comprimir.
+
+Ninguna query lee el corpus: CorpusReader solo abre meta.json al crearse y mapea los
+archivos en el primer acceso a un texto.
+"""
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Iterable, List
+
+import numpy as np
+
+from backend.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+META_FILE = "meta.json"
+BLOCK_SIZE = 64         # textos por bloque comprimido
+BLOCK_CACHE_SIZE = 16   # bloques descomprimidos en memoria por reader
+
+
+def _zstd():
+    """Módulo zstandard o None si no está instalado"""
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def read_corpus_meta(corpus_dir: str) -> dict:
+    """meta.json del corpus (sin mapear textos ni offsets)"""
+    meta_path = os.path.join(corpus_dir, META_FILE)
+    if not os.path.exists(meta_path):
+        raise FileNotFoundError(2, "Corpus not found", meta_path)
+    with open(meta_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class CorpusWriter:
+    """Escritura incremental (append) del corpus, opcionalmente comprimido con zstd"""
+
+    def __init__(self, corpus_dir: str, compression: str = settings.corpus_compression, level: int = 3):
+        self.corpus_dir = corpus_dir
+        os.makedirs(corpus_dir, exist_ok=True)
+
+        zstandard = _zstd() if compression == "zstd" else None
+        if compression == "zstd" and zstandard is None:
+            logger.warning("⚠️ zstandard not installed, writing uncompressed corpus")
+        self._compressor = zstandard.ZstdCompressor(level=level) if zstandard else None
+
+        self._blob = open(os.path.join(corpus_dir, "texts.bin"), "wb")
+        self._offsets = [0]
+        self._pending: List[bytes] = []
+        self._blocks = [0]
+
+    def add(self, text: str) -> int:
+        data = text.encode("utf-8")
+        self._offsets.append(self._offsets[-1] + len(data))
+        if self._compressor is None:
+            self._blob.write(data)
+        else:
+            self._pending.append(data)
+            if len(self._pending) == BLOCK_SIZE:
+                self._flush_block()
+        return len(self._offsets) - 2
+
+    def add_many(self, texts: Iterable[str]):
+        for text in texts:
+            self.add(text)
+
+    def _flush_block(self):
+        if self._pending:
+            compressed = self._compressor.compress(b"".join(self._pending))
+            self._blob.write(compressed)
+            self._blocks.append(self._blocks[-1] + len(compressed))
+            self._pending = []
+
+    def close(self) -> dict:
+        meta = {"format": "utf8-v1", "count": len(self._offsets) - 1, "bytes": self._offsets[-1]}
+        if self._compressor is not None:
+            self._flush_block()
+            np.save(os.path.join(self.corpus_dir, "blocks.npy"), np.asarray(self._blocks, dtype=np.int64))
+            meta.update({"format": "utf8-zstd-v1", "block_size": BLOCK_SIZE, "stored_bytes": self._blocks[-1]})
+        self._blob.close()
+        np.save(os.path.join(self.corpus_dir, "offsets.npy"), np.asarray(self._offsets, dtype=np.int64))
+
+        with open(os.path.join(self.corpus_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        return meta
+
+
+class CorpusReader:
+    """Acceso por doc id a los textos del corpus (memory-mapped en el primer acceso)"""
+
+    def __init__(self, corpus_dir: str):
+        self.meta = read_corpus_meta(corpus_dir)
+        self.corpus_dir = corpus_dir
+        self.compressed = self.meta.get("format") == "utf8-zstd-v1"
+        if self.compressed and _zstd() is None:
+            raise ImportError("zstandard is required to read a zstd-compressed corpus (pip install zstandard)")
+
+        self.offsets = None
+        self.blob = None
+        self.blocks = None
+        self._lock = threading.Lock()
+        self._block_cache: "OrderedDict[int, bytes]" = OrderedDict()
+
+    def _open(self):
+        with self._lock:
+            if self.offsets is not None:
+                return
+            blob_path = os.path.join(self.corpus_dir, "texts.bin")
+            if os.path.getsize(blob_path) > 0:
+                self.blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+            else:
+                self.blob = np.empty(0, dtype=np.uint8)
+            if self.compressed:
+                self.blocks = np.load(os.path.join(self.corpus_dir, "blocks.npy"), mmap_mode="r")
+            self.offsets = np.load(os.path.join(self.corpus_dir, "offsets.npy"), mmap_mode="r")
+
+    def _block(self, block_id: int) -> bytes:
+        with self._lock:
+            data = self._block_cache.get(block_id)
+            if data is not None:
+                self._block_cache.move_to_end(block_id)
+                return data
+
+        start, end = int(self.blocks[block_id]), int(self.blocks[block_id + 1])
+        # Un decompressor por llamada: las instancias de zstandard no son thread-safe
+        data = _zstd().ZstdDecompressor().decompress(self.blob[start:end].tobytes())
+
+        with self._lock:
+            self._block_cache[block_id] = data
+            while len(self._block_cache) > BLOCK_CACHE_SIZE:
+                self._block_cache.popitem(last=False)
+        return data
+
+    def __len__(self) -> int:
+        return int(self.meta["count"])
+
+    def __getitem__(self, doc_id: int) -> str:
+        if not 0 <= doc_id < len(self):
+            raise IndexError(doc_id)
+        if self.offsets is None:
+            self._open()
+        start, end = int(self.offsets[doc_id]), int(self.offsets[doc_id + 1])
+        if not self.compressed:
+            return self.blob[start:end].tobytes().decode("utf-8")
+
+        block_id = doc_id // self.meta["block_size"]
+        base = int(self.offsets[block_id * self.meta["block_size"]])
+        return self._block(block_id)[start - base:end - base].decode("utf-8")
+
+    def get_many(self, doc_ids: Iterable[int]) -> List[str]:
+        return [self[i] for i in doc_ids]
+
+    def get_stats(self) -> dict:
+        return corpus_stats(self.meta)
+
+
+def corpus_stats(meta: dict) -> dict:
+    """Cantidad de textos y tamaños (sin comprimir / en disco) a partir de meta.json"""
+    return {
+        "count": int(meta["count"]),
+        "format": meta.get("format", "utf8-v1"),
+        "size_mb": round(meta["bytes"] / (1024**2), 2),
+        "stored_mb": round(meta.get("stored_bytes", meta["bytes"]) / (1024**2), 2),
+    }
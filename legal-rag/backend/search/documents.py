@@ -0,0 +1,106 @@
+# backend/search/documents.py
+"""
+Tabla de documentos: los campos de cada fallo, una vez por expediente
+
+Los payloads de párrafo (payload store y Qdrant) ya no repiten metadatos, artículos citados,
+materia e idea central de su fallo: quedan acá, con el mismo formato del payload store y
+direccionados por document_id(expediente). Qdrant conserva de cada fallo solo los campos
+con payload index (materia y citas, ver filter_fields) para poder filtrar.
+
+En la query, DocumentStore.join() lee cada fallo de los candidatos una sola vez y lo combina
+con los payloads de sus párrafos (los valores del fallo se comparten entre ellos). Las
+generaciones anteriores no tienen tabla y traen esos campos en cada payload.
+"""
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterable, Optional
+
+from backend.data.batch import DocumentTable
+from .citations import citation_fields
+from .payload_store import META_FILE, PayloadStore, PayloadStoreWriter
+
+
+def document_id(expediente: str) -> int:
+    """Id estable (entero de 63 bits) de un fallo en la tabla de documentos"""
+    digest = hashlib.blake2b(f"doc\x1f{expediente}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") & 0x7FFF_FFFF_FFFF_FFFF
+
+
+def filter_fields(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Campos del fallo que van en cada punto de Qdrant (los que tienen payload index)"""
+    fields = citation_fields(document)
+    if document.get("materia_preliminar") is not None:
+        fields["materia_preliminar"] = document["materia_preliminar"]
+    return fields
+
+
+class DocumentStoreWriter(PayloadStoreWriter):
+    """Escritura de la tabla de documentos (cada expediente se escribe una sola vez)"""
+
+    def __init__(self, store_dir: str):
+        super().__init__(store_dir)
+        self.written = set()
+        self.fields = set()
+
+    def add_document(self, expediente: str, fields: Dict[str, Any]) -> bool:
+        doc_id = document_id(expediente)
+        if doc_id in self.written:
+            return False
+        self.written.add(doc_id)
+        self.fields.update(fields)
+        self.add(doc_id, {"expediente": expediente, **fields})
+        return True
+
+    def add_table(self, documents: DocumentTable) -> int:
+        """Agrega los fallos de la tabla de una batch que todavía no estaban; devuelve cuántos"""
+        return sum(self.add_document(expediente, fields) for expediente, fields in documents)
+
+    def add_raw(self, point_id: int, data: bytes):
+        self.written.add(point_id)
+        super().add_raw(point_id, data)
+
+    def close(self) -> dict:
+        meta = super().close()
+        meta["fields"] = sorted(self.fields)
+        with open(os.path.join(self.store_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        return meta
+
+
+class DocumentStore(PayloadStore):
+    """Lectura de la tabla de documentos"""
+
+    @property
+    def fields(self):
+        return self.meta.get("fields", [])
+
+    def get_documents(self, expedientes: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Campos de cada expediente pedido (sin el propio expediente)"""
+        expedientes = list(set(expedientes))
+        found = self.get_many(document_id(e) for e in expedientes)
+        documents = {}
+        for expediente in expedientes:
+            record = found.get(document_id(expediente))
+            if record is not None:
+                record.pop("expediente", None)
+                documents[expediente] = record
+        return documents
+
+    def join(self, payloads: Dict[int, Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        """Payloads de párrafo con los campos de su fallo (cada fallo se lee una vez)"""
+        documents = self.get_documents(p.get("expediente") for p in payloads.values())
+        for point_id, payload in payloads.items():
+            document = documents.get(payload.get("expediente"))
+            if document:
+                payloads[point_id] = {**payload, **document}
+        return payloads
+
+
+def open_document_store(store_dir: str) -> Optional[DocumentStore]:
+    """Tabla de documentos de la generación (None si no existe o los fallos no tienen campos propios)"""
+    try:
+        store = DocumentStore(store_dir)
+    except FileNotFoundError:
+        return None
+    return store if store.fields else None
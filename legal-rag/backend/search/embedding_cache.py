@@ -0,0 +1,168 @@
+# backend/search/embedding_cache.py
+"""
+Cache persistente de embeddings de párrafos, direccionado por contenido
+
+EmbeddingBuilder re-embebía todos los párrafos en cada build aunque casi ninguno hubiera
+cambiado (rebuilds completos, reindexaciones de evaluación). Acá cada vector se guarda bajo
+hash(modelo + backend, texto normalizado) y solo se codifican los textos que no están:
+
+    {EMBEDDING_CACHE_DIR}/<modelo>/
+        seg-<id>.vecs.npy    vectores float16
+        seg-<id>.keys.npy    claves uint64 ordenadas, alineadas con vecs (se escribe al final)
+
+Cada build agrega segmentos (de a lo sumo SEGMENT_ROWS vectores) y, si quedan más de
+MAX_SEGMENTS, los compacta en uno. Los segmentos se abren memory-mapped: buscar una batch de
+claves son unos searchsorted por segmento. Los vectores se devuelven en float32 pero pasan
+siempre por float16, así que el índice sale igual haya o no aciertos. El directorio se puede
+borrar en cualquier momento (solo se pierde el ahorro).
+"""
+import glob
+import hashlib
+import logging
+import os
+import re
+import time
+import unicodedata
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_ROWS = 100_000
+MAX_SEGMENTS = 16
+
+
+def normalize_text(text: str) -> str:
+    """NFC y espacios colapsados: variaciones de formato no cambian la clave"""
+    return unicodedata.normalize("NFC", " ".join(text.split()))
+
+
+def embedding_keys(tag: str, texts: List[str]) -> np.ndarray:
+    prefix = f"{tag}\x1f".encode("utf-8")
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(prefix + normalize_text(t).encode("utf-8"), digest_size=8).digest(), "big")
+         for t in texts),
+        dtype=np.uint64, count=len(texts),
+    )
+
+
+def _segment_paths(cache_dir: str) -> List[Tuple[str, str]]:
+    """(keys, vecs) de los segmentos completos, los más viejos primero"""
+    keys = sorted(glob.glob(os.path.join(cache_dir, "seg-*.keys.npy")))
+    return [(k, k[:-len(".keys.npy")] + ".vecs.npy") for k in keys]
+
+
+def _save(path: str, values: np.ndarray):
+    tmp = f"{path}.tmp.npy"
+    np.save(tmp, values)
+    os.replace(tmp, path)
+
+
+class EmbeddingCache:
+    """Vectores float16 por clave de contenido, para un modelo"""
+
+    def __init__(self, cache_dir: str, tag: str):
+        self.tag = tag
+        self.cache_dir = os.path.join(cache_dir, re.sub(r"[^\w.-]+", "_", tag))
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.segments = [
+            (np.load(k, mmap_mode="r"), np.load(v, mmap_mode="r")) for k, v in _segment_paths(self.cache_dir)
+        ]
+        self._pending_keys: List[np.ndarray] = []
+        self._pending_vecs: List[np.ndarray] = []
+        self._pending: Dict[int, np.ndarray] = {}  # textos repetidos entre batches del mismo build
+        self.stats = {"hits": 0, "misses": 0}
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys, _ in self.segments)
+
+    def keys(self, texts: List[str]) -> np.ndarray:
+        return embedding_keys(self.tag, texts)
+
+    def lookup(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Máscara de claves encontradas y sus vectores (float16, en el orden de la máscara)"""
+        found = np.zeros(len(keys), dtype=bool)
+        out = None
+        for seg_keys, seg_vecs in reversed(self.segments):  # los más nuevos primero
+            if len(seg_keys) == 0 or found.all():
+                continue
+            pos = np.minimum(np.searchsorted(seg_keys, keys), len(seg_keys) - 1)
+            match = (seg_keys[pos] == keys) & ~found
+            if match.any():
+                if out is None:
+                    out = np.empty((len(keys), seg_vecs.shape[1]), dtype=np.float16)
+                out[match] = seg_vecs[pos[match]]
+                found |= match
+        if self._pending:
+            for i in np.flatnonzero(~found).tolist():
+                vector = self._pending.get(int(keys[i]))
+                if vector is not None:
+                    if out is None:
+                        out = np.empty((len(keys), len(vector)), dtype=np.float16)
+                    out[i] = vector
+                    found[i] = True
+        hits = int(found.sum())
+        self.stats["hits"] += hits
+        self.stats["misses"] += len(keys) - hits
+        return found, (out[found] if out is not None else np.empty((0, 0), dtype=np.float16))
+
+    def add(self, keys: np.ndarray, vectors: np.ndarray):
+        """Agrega vectores nuevos (se escriben en un segmento al acumular SEGMENT_ROWS o en flush)"""
+        keys, vectors = np.asarray(keys, dtype=np.uint64), np.asarray(vectors, dtype=np.float16)
+        self._pending_keys.append(keys)
+        self._pending_vecs.append(vectors)
+        self._pending.update(zip(keys.tolist(), vectors))
+        if sum(len(k) for k in self._pending_keys) >= SEGMENT_ROWS:
+            self._write_segment()
+
+    def _write_segment(self):
+        if not self._pending_keys:
+            return
+        keys = np.concatenate(self._pending_keys)
+        vecs = np.concatenate(self._pending_vecs)
+        self._pending_keys, self._pending_vecs, self._pending = [], [], {}
+        keys, first = np.unique(keys, return_index=True)
+        base = os.path.join(self.cache_dir, f"seg-{time.time_ns():020d}-{os.getpid()}")
+        _save(f"{base}.vecs.npy", vecs[first])
+        _save(f"{base}.keys.npy", keys)  # el segmento existe recién cuando están las claves
+        self.segments.append((np.load(f"{base}.keys.npy", mmap_mode="r"), np.load(f"{base}.vecs.npy", mmap_mode="r")))
+
+    def flush(self):
+        """Escribe lo pendiente y compacta si hay demasiados segmentos"""
+        self._write_segment()
+        if len(self.segments) > MAX_SEGMENTS:
+            self._compact()
+
+    def _compact(self):
+        """Une todos los segmentos en uno (memoria proporcional a las claves, no a los vectores)"""
+        paths = _segment_paths(self.cache_dir)
+        segments = [(np.load(k, mmap_mode="r"), np.load(v, mmap_mode="r")) for k, v in paths]
+        keys = np.concatenate([k for k, _ in segments])
+        seg_of = np.concatenate([np.full(len(k), i, dtype=np.int32) for i, (k, _) in enumerate(segments)])
+        row_of = np.concatenate([np.arange(len(k), dtype=np.int64) for k, _ in segments])
+        keys, first = np.unique(keys, return_index=True)
+        dim = segments[0][1].shape[1]
+
+        base = os.path.join(self.cache_dir, f"seg-{time.time_ns():020d}-{os.getpid()}")
+        tmp = f"{base}.vecs.npy.tmp.npy"
+        out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float16, shape=(len(keys), dim))
+        for start in range(0, len(keys), SEGMENT_ROWS):
+            idx = first[start:start + SEGMENT_ROWS]
+            for i, (_, vecs) in enumerate(segments):
+                sel = np.flatnonzero(seg_of[idx] == i)
+                if len(sel):
+                    out[start + sel] = vecs[row_of[idx[sel]]]
+        out.flush()
+        del out
+        os.replace(tmp, f"{base}.vecs.npy")
+        _save(f"{base}.keys.npy", keys)
+
+        for k, v in paths:
+            os.remove(k)
+            os.remove(v)
+        self.segments = [(np.load(f"{base}.keys.npy", mmap_mode="r"), np.load(f"{base}.vecs.npy", mmap_mode="r"))]
+        logger.info(f"🗜️ Cache de embeddings compactado: {len(paths)} segmentos → 1 ({len(keys):,} vectores)")
+
+    def get_stats(self) -> dict:
+        return {"dir": self.cache_dir, "segments": len(self.segments), "entries": len(self), **self.stats}
@@ -0,0 +1,148 @@
+# backend/search/fusion.py
+"""
+Estrategias de fusión de las patas densa (coseno, 0..1) y léxica (BM25, sin cota)
+
+Sumar el coseno con el BM25 crudo dejaba el ranking dominado por la escala de BM25 (10+),
+y los hits solo léxicos competían con su score crudo contra cosenos. Estas estrategias
+trabajan sobre arrays alineados (unión de ids de ambas patas) con NumPy:
+
+- rrf:     Reciprocal Rank Fusion, sum w / (k + rank). Solo usa posiciones, no escalas.
+           Se divide por el máximo alcanzable, así que queda en (0, 1].
+- minmax:  cada pata normalizada a [0, 1] y suma ponderada, dividida por la suma de pesos.
+- zscore:  cada pata estandarizada (media 0, desvío 1) y suma ponderada.
+- combsum: suma ponderada de los scores crudos (CombSUM clásico).
+
+A un candidato que falta en una pata le corresponde el peor valor de esa pata (0 en rrf,
+minmax y combsum; el z-score mínimo en zscore). rrf y minmax quedan en [0, 1], la misma
+escala de los boosts de HybridRetrieverEnriched.
+"""
+import logging
+from typing import Tuple
+
+import numpy as np
+
+from backend.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+def _align(dense_ids: np.ndarray, lex_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Unión de ids y posición de cada pata en ella"""
+    ids, inverse = np.unique(np.concatenate([dense_ids, lex_ids]), return_inverse=True)
+    return ids, inverse[:len(dense_ids)], inverse[len(dense_ids):]
+
+
+class FusionStrategy:
+    """Fusión de dos listas de (id, score) en un score por candidato"""
+
+    name = "base"
+
+    def __init__(self, dense_weight: float = settings.fusion_dense_weight,
+                 lexical_weight: float = settings.fusion_lexical_weight):
+        self.dense_weight = dense_weight
+        self.lexical_weight = lexical_weight
+
+    def _transform(self, scores: np.ndarray) -> Tuple[np.ndarray, float]:
+        """Scores de una pata en la escala de la fusión + valor para quienes no aparecen en ella"""
+        return scores, 0.0
+
+    def _finish(self, fused: np.ndarray) -> np.ndarray:
+        return fused
+
+    def fuse(self, dense_ids: np.ndarray, dense_scores: np.ndarray,
+             lex_ids: np.ndarray, lex_scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Fusiona ambas patas
+
+        Returns:
+            (ids, scores) de la unión de candidatos, ordenados por score fusionado descendente
+        """
+        ids, dense_pos, lex_pos = _align(np.asarray(dense_ids, dtype=np.int64), np.asarray(lex_ids, dtype=np.int64))
+        fused = np.zeros(len(ids), dtype=np.float64)
+        for weight, pos, scores in ((self.dense_weight, dense_pos, dense_scores),
+                                    (self.lexical_weight, lex_pos, lex_scores)):
+            values, missing = self._transform(np.asarray(scores, dtype=np.float64))
+            leg = np.full(len(ids), missing, dtype=np.float64)
+            leg[pos] = values
+            fused += weight * leg
+
+        fused = self._finish(fused)
+        order = np.argsort(-fused, kind="stable")
+        return ids[order], fused[order]
+
+    def get_stats(self) -> dict:
+        return {"name": self.name, "dense_weight": self.dense_weight, "lexical_weight": self.lexical_weight}
+
+
+class ReciprocalRankFusion(FusionStrategy):
+    """RRF: w / (k + rank), normalizado por el máximo alcanzable"""
+
+    name = "rrf"
+
+    def __init__(self, k: int = settings.fusion_rrf_k, **kwargs):
+        super().__init__(**kwargs)
+        self.k = k
+
+    def _transform(self, scores: np.ndarray) -> Tuple[np.ndarray, float]:
+        ranks = np.empty(len(scores), dtype=np.float64)
+        ranks[np.argsort(-scores, kind="stable")] = np.arange(1, len(scores) + 1)
+        return 1.0 / (self.k + ranks), 0.0
+
+    def _finish(self, fused: np.ndarray) -> np.ndarray:
+        return fused * (self.k + 1) / ((self.dense_weight + self.lexical_weight) or 1.0)
+
+    def get_stats(self) -> dict:
+        return {**super().get_stats(), "k": self.k}
+
+
+class MinMaxFusion(FusionStrategy):
+    """Suma ponderada de scores min-max normalizados, en [0, 1]"""
+
+    name = "minmax"
+
+    def _transform(self, scores: np.ndarray) -> Tuple[np.ndarray, float]:
+        if len(scores) == 0:
+            return scores, 0.0
+        low, high = scores.min(), scores.max()
+        if high == low:
+            return np.ones_like(scores), 0.0
+        return (scores - low) / (high - low), 0.0
+
+    def _finish(self, fused: np.ndarray) -> np.ndarray:
+        return fused / ((self.dense_weight + self.lexical_weight) or 1.0)
+
+
+class ZScoreFusion(FusionStrategy):
+    """Suma ponderada de z-scores"""
+
+    name = "zscore"
+
+    def _transform(self, scores: np.ndarray) -> Tuple[np.ndarray, float]:
+        if len(scores) == 0:
+            return scores, 0.0
+        std = scores.std()
+        z = (scores - scores.mean()) / std if std > 0 else np.zeros_like(scores)
+        return z, float(z.min())
+
+
+class CombSumFusion(FusionStrategy):
+    """CombSUM: suma ponderada de los scores crudos"""
+
+    name = "combsum"
+
+
+def get_fusion_strategy(name: str = None, **kwargs) -> FusionStrategy:
+    """Factory de estrategias de fusión (FUSION_STRATEGY)"""
+    name = name or settings.fusion_strategy
+    strategies = {
+        "rrf": ReciprocalRankFusion,
+        "minmax": MinMaxFusion,
+        "zscore": ZScoreFusion,
+        "combsum": CombSumFusion,
+    }
+    if name not in strategies:
+        raise ValueError(f"Fusión '{name}' no disponible. Opciones: {list(strategies.keys())}")
+    logger.info(f"🔀 Fusion strategy: {name}")
+    return strategies[name](**kwargs)
@@ -0,0 +1,319 @@
+# backend/search/generations.py
+"""
+Generaciones de índices versionadas
+
+Cada build escribe una generación nueva y completa en lugar de pisar los índices en uso:
+
+    {INDEX_ROOT}/generations/000007/
+        bm25/  bm25_corpus/  payloads/  documents/  metadata/  manifest.json  generation.json
+        recall_report.json (recall vs latencia de la colección, ver qdrant_config.py)
+    {INDEX_ROOT}/CURRENT          número de la generación activa
+
+Los vectores van a una colección Qdrant propia de la generación ("fallos_g7") y el alias
+QDRANT_COLLECTION ("fallos") apunta a la activa. Activar una generación cambia el alias
+(una sola operación atómica en Qdrant) y luego reescribe CURRENT con os.replace, así que
+nunca hay un momento sin índices. Los retrievers abren una generación concreta y la usan
+hasta que se los reemplaza (ver hot_swap.py); mientras tanto la marcan con un pin
+(pins/<id>.json con host y pid) y prune_generations no borra generaciones con pins de
+procesos vivos, aunque sean de otro proceso (la API tras un rebuild por CLI, otro worker).
+
+Sin CURRENT se usa el layout anterior (BM25_INDEX_DIR, BM25_CORPUS_PATH, PAYLOAD_STORE_DIR).
+Ahí "fallos" es una colección real, que impide crear el alias: al activar la primera
+generación los retrievers nuevos ya usan su colección directamente, y la colección vieja se
+reemplaza por el alias (retire_legacy_collection) recién cuando ningún proceso tiene abierto
+el layout anterior (pins en INDEX_ROOT/legacy_pins).
+"""
+import json
+import logging
+import os
+import shutil
+import socket
+import time
+import uuid
+from typing import List, Optional
+
+from qdrant_client import models as qmodels
+
+from backend.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+CURRENT_FILE = "CURRENT"
+GENERATION_FILE = "generation.json"
+PINS_DIR = "pins"
+
+
+class IndexGeneration:
+    """Rutas y colección Qdrant de una generación de índices"""
+
+    def __init__(self, number: Optional[int], root: Optional[str], collection: str):
+        self.number = number
+        self.root = root
+        self.collection = collection
+
+        if root is None:
+            # Layout anterior a las generaciones
+            self.bm25_index_dir = settings.bm25_index_dir
+            self.corpus_dir = settings.bm25_corpus_path
+            self.payload_store_dir = settings.payload_store_dir
+            self.document_store_dir = os.path.join(settings.index_root, "documents")
+            self.metadata_index_dir = os.path.join(settings.index_root, "metadata")
+            self.manifest_path = settings.index_manifest_path
+            self.recall_report_path = os.path.join(settings.index_root, "recall_report.json")
+            self.pins_dir = os.path.join(settings.index_root, "legacy_pins")
+        else:
+            self.bm25_index_dir = os.path.join(root, "bm25")
+            self.corpus_dir = os.path.join(root, "bm25_corpus")
+            self.payload_store_dir = os.path.join(root, "payloads")
+            self.document_store_dir = os.path.join(root, "documents")
+            self.metadata_index_dir = os.path.join(root, "metadata")
+            self.manifest_path = os.path.join(root, "manifest.json")
+            self.recall_report_path = os.path.join(root, "recall_report.json")
+            self.pins_dir = os.path.join(root, PINS_DIR)
+
+    @property
+    def is_legacy(self) -> bool:
+        return self.number is None
+
+    def is_complete(self) -> bool:
+        """Los tres stores terminaron de escribirse (meta.json se escribe al final)"""
+        return all(
+            os.path.exists(os.path.join(d, "meta.json"))
+            for d in (self.bm25_index_dir, self.corpus_dir, self.payload_store_dir)
+        )
+
+    def to_dict(self) -> dict:
+        return {"number": self.number, "root": self.root, "collection": self.collection}
+
+    def __repr__(self) -> str:
+        return f"IndexGeneration(number={self.number}, collection={self.collection!r})"
+
+
+def _generations_dir() -> str:
+    return os.path.join(settings.index_root, "generations")
+
+
+def _generation_root(number: int) -> str:
+    return os.path.join(_generations_dir(), f"{number:06d}")
+
+
+def list_generations() -> List[int]:
+    """Números de las generaciones presentes en disco, en orden"""
+    if not os.path.isdir(_generations_dir()):
+        return []
+    return sorted(int(name) for name in os.listdir(_generations_dir()) if name.isdigit())
+
+
+def load_generation(number: int) -> IndexGeneration:
+    root = _generation_root(number)
+    with open(os.path.join(root, GENERATION_FILE), encoding="utf-8") as f:
+        info = json.load(f)
+    return IndexGeneration(number, root, info["collection"])
+
+
+def current_generation() -> IndexGeneration:
+    """Generación activa (o el layout anterior si todavía no hay generaciones)"""
+    current_path = os.path.join(settings.index_root, CURRENT_FILE)
+    if os.path.exists(current_path):
+        with open(current_path, encoding="utf-8") as f:
+            return load_generation(int(f.read().strip()))
+    return IndexGeneration(None, None, settings.qdrant_collection)
+
+
+def create_generation(collection: Optional[str] = None, mode: str = "full") -> IndexGeneration:
+    """
+    Reserva el directorio de una generación nueva
+
+    Args:
+        collection: Colección Qdrant de la generación; por defecto una nueva ("fallos_g<N>").
+            Las actualizaciones incrementales también usan una nueva (copia de la activa).
+    """
+    number = max(list_generations(), default=0) + 1
+    root = _generation_root(number)
+    os.makedirs(root)
+
+    collection = collection or f"{settings.qdrant_collection}_g{number}"
+    with open(os.path.join(root, GENERATION_FILE), "w", encoding="utf-8") as f:
+        json.dump({"number": number, "collection": collection, "mode": mode, "created_at": time.time()}, f, indent=2)
+
+    return IndexGeneration(number, root, collection)
+
+
+def activate_generation(generation: IndexGeneration, client) -> IndexGeneration:
+    """Apunta el alias de Qdrant y CURRENT a la generación (debe estar completa)"""
+    if not generation.is_complete():
+        raise RuntimeError(f"Generación incompleta, no se activa: {generation}")
+
+    alias = settings.qdrant_collection
+    if generation.collection != alias:
+        if _collection_exists(client, alias):
+            # Migración: la colección real del layout anterior sigue sirviendo a sus retrievers;
+            # el alias se crea cuando se la retire (ver retire_legacy_collection)
+            logger.warning(f"🔄 La colección '{alias}' del layout anterior se reemplaza por el alias cuando nadie la use")
+        else:
+            _point_alias(client, alias, generation.collection)
+
+    current_path = os.path.join(settings.index_root, CURRENT_FILE)
+    tmp_path = f"{current_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(str(generation.number))
+    os.replace(tmp_path, current_path)
+
+    logger.info(f"✅ Generación {generation.number} activa (colección {generation.collection})")
+    prune_generations(client)
+    return generation
+
+
+def _collection_exists(client, name: str) -> bool:
+    """Colección real con ese nombre (no alias)"""
+    return any(c.name == name for c in client.get_collections().collections)
+
+
+def _point_alias(client, alias: str, collection: str):
+    """Borrar y crear el alias en la misma llamada: el cambio es atómico para las queries"""
+    operations = []
+    for a in client.get_aliases().aliases:
+        if a.alias_name == alias:
+            if a.collection_name == collection:
+                return
+            operations.append(qmodels.DeleteAliasOperation(delete_alias=qmodels.DeleteAlias(alias_name=alias)))
+    operations.append(qmodels.CreateAliasOperation(
+        create_alias=qmodels.CreateAlias(collection_name=collection, alias_name=alias)
+    ))
+    client.update_collection_aliases(change_aliases_operations=operations)
+
+
+def retire_legacy_collection(client):
+    """
+    Reemplaza la colección real del layout anterior por el alias de la generación activa
+
+    Solo cuando ya hay generaciones y ningún proceso tiene abierto el layout anterior; si
+    el alias falló en un intento previo (colección ya borrada), lo vuelve a crear.
+    """
+    current = current_generation()
+    alias = settings.qdrant_collection
+    if current.is_legacy or current.collection == alias:
+        return
+    if _collection_exists(client, alias):
+        pins = _live_pins(IndexGeneration(None, None, alias).pins_dir)
+        if pins:
+            logger.info(f"📌 Layout anterior abierto por {pins} proceso(s): la colección '{alias}' se conserva")
+            return
+        logger.warning(f"🔄 Eliminando colección '{alias}' del layout anterior para crear el alias")
+        client.delete_collection(alias)
+    _point_alias(client, alias, current.collection)
+
+
+def pin_generation(generation: IndexGeneration) -> Optional[str]:
+    """Marca la generación como abierta por este proceso; devuelve el pin para unpin_generation"""
+    if generation.is_legacy:
+        os.makedirs(generation.pins_dir, exist_ok=True)
+    else:
+        try:
+            os.mkdir(generation.pins_dir)  # sin makedirs: no recrear una generación ya eliminada
+        except FileExistsError:
+            pass
+    path = os.path.join(generation.pins_dir, f"{uuid.uuid4().hex}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"host": socket.gethostname(), "pid": os.getpid(), "created_at": time.time()}, f)
+    return path
+
+
+def unpin_generation(pin: Optional[str]):
+    if pin is not None:
+        try:
+            os.remove(pin)
+        except FileNotFoundError:
+            pass
+
+
+def _pin_alive(path: str) -> bool:
+    """Pin de un proceso vivo (los de otro host no se pueden verificar: se consideran vivos)"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if info.get("host") != socket.gethostname():
+        return True
+    try:
+        os.kill(info["pid"], 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _live_pins(pins_dir: str) -> int:
+    """Procesos vivos con la generación abierta (borra los pins de procesos que ya no existen)"""
+    if not os.path.isdir(pins_dir):
+        return 0
+    alive = 0
+    for name in os.listdir(pins_dir):
+        path = os.path.join(pins_dir, name)
+        if _pin_alive(path):
+            alive += 1
+        else:
+            unpin_generation(path)
+    return alive
+
+
+def prune_generations(client=None, keep: int = settings.index_generations_keep):
+    """
+    Elimina generaciones viejas conservando las `keep` más recientes
+
+    La anterior a la activa se conserva (keep >= 2) porque un retriever puede seguir
+    drenando queries sobre ella, y nunca se borra una generación que algún proceso tenga
+    abierta (pins): se elimina en una llamada posterior (la API vuelve a llamar después de
+    reemplazar sus retrievers), cuando ya nadie la use. Una colección se borra solo si
+    ninguna generación conservada la usa.
+    """
+    if client is None:
+        from qdrant_client import QdrantClient
+        client = QdrantClient(url=settings.qdrant_url, timeout=30.0)
+    try:
+        retire_legacy_collection(client)
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo reemplazar la colección del layout anterior por el alias: {e}")
+
+    numbers = list_generations()
+    current = current_generation().number
+    stale = []
+    for n in numbers[:-max(keep, 1)]:
+        if n == current:
+            continue
+        pins = _live_pins(os.path.join(_generation_root(n), PINS_DIR))
+        if pins:
+            logger.info(f"📌 Generación {n} abierta por {pins} proceso(s): se conserva")
+            continue
+        stale.append(n)
+    if not stale:
+        return
+
+    kept_collections = {load_generation(n).collection for n in numbers if n not in stale}
+    deleted = set()
+    for n in stale:
+        try:
+            collection = load_generation(n).collection
+            if collection not in kept_collections and collection not in deleted:
+                client.delete_collection(collection)
+                deleted.add(collection)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo eliminar la colección de la generación {n}: {e}")
+        shutil.rmtree(_generation_root(n), ignore_errors=True)
+        logger.info(f"🗑️ Generación {n} eliminada")
+
+
+def discard_generation(generation: IndexGeneration, client=None):
+    """Elimina una generación que no llegó a activarse (build fallido)"""
+    if generation.is_legacy or generation.number == current_generation().number:
+        return
+    if client is not None and generation.collection != current_generation().collection:
+        try:
+            client.delete_collection(generation.collection)
+        except Exception:
+            pass
+    shutil.rmtree(generation.root, ignore_errors=True)
@@ -0,0 +1,162 @@
+# backend/search/hot_swap.py
+"""
+Retrievers compartidos con reemplazo en caliente
+
+Los pipelines RAG guardan un RetrieverHandle en lugar del retriever. Tras un rebuild,
+reload_retrievers() crea el retriever nuevo sobre la generación recién activada (mientras
+el viejo sigue atendiendo), lo pone en servicio con un cambio de referencia y después
+espera a que terminen las queries en curso sobre el viejo antes de liberarlo.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from backend.config import get_settings
+from .base import BaseRetriever
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+class _Lease:
+    """Retriever en servicio + cantidad de queries en curso sobre él"""
+
+    def __init__(self, retriever: BaseRetriever):
+        self.retriever = retriever
+        self.in_flight = 0
+
+
+class RetrieverHandle(BaseRetriever):
+    """Proxy de un retriever que puede reemplazarse sin cortar queries"""
+
+    def __init__(self, factory: Callable[[], BaseRetriever], name: str = "retriever"):
+        self.name = name
+        self._factory = factory
+        self._lease = _Lease(factory())
+        self._cond = threading.Condition()
+        self._swap_lock = threading.Lock()
+        self.swaps = 0
+
+    @property
+    def current(self) -> BaseRetriever:
+        return self._lease.retriever
+
+    def _acquire(self) -> _Lease:
+        with self._cond:
+            lease = self._lease
+            lease.in_flight += 1
+            return lease
+
+    def _release(self, lease: _Lease):
+        with self._cond:
+            lease.in_flight -= 1
+            if lease.in_flight == 0:
+                self._cond.notify_all()
+
+    def query(self, question: str, top_n: int = 10) -> List[Dict[str, Any]]:
+        lease = self._acquire()
+        try:
+            return lease.retriever.query(question, top_n)
+        finally:
+            self._release(lease)
+
+    async def aquery(self, question: str, top_n: int = 10) -> List[Dict[str, Any]]:
+        lease = self._acquire()
+        try:
+            return await lease.retriever.aquery(question, top_n)
+        finally:
+            self._release(lease)
+
+    def query_batch(self, questions: List[str], top_n: int = 10) -> List[List[Dict[str, Any]]]:
+        lease = self._acquire()
+        try:
+            return lease.retriever.query_batch(questions, top_n)
+        finally:
+            self._release(lease)
+
+    async def aquery_batch(self, questions: List[str], top_n: int = 10) -> List[List[Dict[str, Any]]]:
+        lease = self._acquire()
+        try:
+            return await lease.retriever.aquery_batch(questions, top_n)
+        finally:
+            self._release(lease)
+
+    def encode_question(self, question: str):
+        return self.current.encode_question(question)
+
+    def encode_questions(self, questions: List[str]):
+        return self.current.encode_questions(questions)
+
+    def warm_up(self):
+        return self.current.warm_up()
+
+    def swap(self, new_retriever: BaseRetriever = None, drain_timeout: float = settings.retriever_drain_timeout) -> BaseRetriever:
+        """
+        Pone en servicio un retriever nuevo y libera el anterior cuando termina de drenar
+
+        El retriever nuevo se construye y precalienta antes del cambio (si no se pasa uno),
+        así que las queries nunca esperan la carga de modelos ni índices.
+        """
+        with self._swap_lock:
+            new_retriever = new_retriever or self._factory()
+            try:
+                new_retriever.warm_up()
+            except Exception as e:
+                logger.warning(f"⚠️ {self.name}: falló el precalentamiento del retriever nuevo: {e}")
+            with self._cond:
+                old = self._lease
+                self._lease = _Lease(new_retriever)
+                self.swaps += 1
+
+            start = time.time()
+            with self._cond:
+                drained = self._cond.wait_for(lambda: old.in_flight == 0, timeout=drain_timeout)
+            if not drained:
+                logger.warning(f"⚠️ {self.name}: {old.in_flight} queries siguen en curso tras {drain_timeout}s; se libera igual")
+
+            close = getattr(old.retriever, "close", None)
+            if close is not None:
+                close()
+            logger.info(f"🔁 {self.name} reemplazado (drenado en {time.time() - start:.2f}s)")
+            return new_retriever
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.current.get_stats(), "swaps": self.swaps, "in_flight": self._lease.in_flight}
+
+    def supports_reranking(self) -> bool:
+        return self.current.supports_reranking()
+
+    def __getattr__(self, name):
+        # Atributos propios del retriever (use_reranking, generation, etc.)
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.current, name)
+
+
+_handles: Dict[str, RetrieverHandle] = {}
+_handles_lock = threading.Lock()
+
+
+def get_shared_retriever(strategy: str = None) -> RetrieverHandle:
+    """Retriever compartido por estrategia (uno por proceso), reemplazable con reload_retrievers"""
+    from .factory import get_retriever
+
+    strategy = strategy or settings.search_strategy
+    with _handles_lock:
+        if strategy not in _handles:
+            _handles[strategy] = RetrieverHandle(lambda: get_retriever(strategy), name=strategy)
+        return _handles[strategy]
+
+
+def reload_retrievers() -> Dict[str, int]:
+    """Reemplaza todos los retrievers compartidos por instancias sobre la generación activa"""
+    with _handles_lock:
+        handles = list(_handles.items())
+
+    swapped = {}
+    for strategy, handle in handles:
+        new_retriever = handle.swap()
+        swapped[strategy] = getattr(getattr(new_retriever, "generation", None), "number", None)
+    return swapped
@@ -0,0 +1,253 @@
+# backend/search/incremental.py
+"""
+Indexación incremental: agrega, actualiza y elimina fallos sin reconstruir todo
+
+- Point ids estables derivados de (expediente, section, paragraph_id): el mismo párrafo
+  conserva su id entre builds, así que un fallo modificado se re-sube con upsert.
+- Manifest (manifest.json de cada generación) con el hash de contenido de cada JSON indexado,
+  los point ids que generó y los expedientes de sus fallos; comparándolo con el directorio se
+  detectan archivos nuevos, modificados y eliminados.
+- Solo se embeben los párrafos de los archivos afectados. BM25 se actualiza a partir de
+  los postings existentes (update_bm25_index) y el corpus, el payload store y la tabla de
+  documentos se reescriben copiando los registros conservados, en una generación nueva.
+  Los vectores se actualizan en una copia de la colección de la activa (init_from de Qdrant),
+  así que las queries no ven cambios hasta que se activa la generación nueva y un update que
+  falla no deja la colección en uso a medio modificar.
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from backend.config import get_settings
+from backend.data import iter_paragraph_batches
+from backend.data.batch import DocumentTable, ParagraphBatch
+from backend.data.ndjson import file_hash
+from .bm25 import update_bm25_index, tokenize
+from .corpus import CorpusReader, CorpusWriter
+from .documents import DocumentStoreWriter, document_id, open_document_store
+from .metadata_index import build_metadata_index
+from .payload_store import PayloadStore, PayloadStoreWriter
+from .generations import activate_generation, create_generation, current_generation, discard_generation
+
+settings = get_settings()
+
+MANIFEST_VERSION = 1
+
+
+def paragraph_point_id(expediente: str, section: str, paragraph_id: int) -> int:
+    """Point id estable (entero de 63 bits) para un párrafo"""
+    key = f"{expediente}\x1f{section}\x1f{paragraph_id}".encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big") & 0x7FFF_FFFF_FFFF_FFFF
+
+
+def scan_dataset(json_dir: Path) -> Dict[str, str]:
+    """Hash de cada JSON del dataset, por ruta relativa (mismo recorrido que los processors)"""
+    return {
+        p.relative_to(json_dir).as_posix(): file_hash(p)
+        for p in sorted(json_dir.rglob("*.json"))
+    }
+
+
+def dataset_hashes(json_dir: Path) -> Dict[str, str]:
+    """
+    Hashes con que se arma el manifest
+
+    En modo streaming los párrafos salen del corpus NDJSON, así que valen los hashes guardados
+    en el corpus; si el árbol de JSON no coincide con ellos (corpus desactualizado) se corta,
+    porque el manifest registraría como indexados archivos cuyo texto no se leyó.
+    """
+    if settings.processing_mode != "streaming":
+        return scan_dataset(json_dir)
+
+    from backend.data.processing.streaming import StreamingProcessor
+    processor = StreamingProcessor()
+    hashes = processor.source_hashes(json_dir)
+    if json_dir.is_file():
+        return hashes  # se indexa directamente un corpus: no hay árbol con que comparar
+    stale = diff_dataset({f: {"hash": h} for f, h in hashes.items()}, scan_dataset(json_dir))
+    if any(stale.values()):
+        example = next(f for v in stale.values() for f in v)
+        raise ValueError(
+            f"El corpus NDJSON {processor.corpus_path} no corresponde a {json_dir}: "
+            f"{len(stale['added'])} archivos sin convertir, {len(stale['changed'])} modificados y "
+            f"{len(stale['removed'])} eliminados (p. ej. {example}). Regenerarlo con "
+            f"`python -m backend.data.ndjson {json_dir} {processor.corpus_path}`"
+        )
+    return hashes
+
+
+def load_manifest(path: str) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+
+def save_manifest(files: Dict[str, dict], path: str):
+    """Escritura atómica del manifest: {ruta: {"hash": ..., "ids": [...]}}"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "updated_at": time.time(), "files": files}, f)
+    os.replace(tmp_path, path)
+
+
+def diff_dataset(manifest_files: Dict[str, dict], current: Dict[str, str]) -> Dict[str, List[str]]:
+    """Archivos nuevos, modificados y eliminados respecto del manifest"""
+    return {
+        "added": sorted(f for f in current if f not in manifest_files),
+        "changed": sorted(f for f in current if f in manifest_files and manifest_files[f]["hash"] != current[f]),
+        "removed": sorted(f for f in manifest_files if f not in current),
+    }
+
+
+def _rewrite_corpus(corpus_dir: str, out_dir: str, kept_doc_ids: np.ndarray, new_texts: Iterable[str]) -> dict:
+    reader = CorpusReader(corpus_dir)
+    writer = CorpusWriter(out_dir)
+    for doc_id in kept_doc_ids.tolist():
+        writer.add(reader[doc_id])
+    writer.add_many(new_texts)
+    return writer.close()
+
+
+def _rewrite_payloads(store_dir: str, out_dir: str, removed: set, new_ids: List[int], new_payloads: List[dict]) -> dict:
+    store = PayloadStore(store_dir)
+    writer = PayloadStoreWriter(out_dir)
+    for point_id, data in store.iter_raw():
+        if point_id not in removed:
+            writer.add_raw(point_id, data)
+    writer.add_many(new_ids, new_payloads)
+    return writer.close()
+
+
+def _rewrite_documents(store_dir: str, out_dir: str, removed: set, new_documents: DocumentTable) -> dict:
+    """Tabla de documentos con los fallos nuevos o modificados y los de la base que siguen referenciados"""
+    writer = DocumentStoreWriter(out_dir)
+    writer.add_table(new_documents)
+    base = open_document_store(store_dir)  # generaciones anteriores a la tabla no la tienen
+    if base is not None:
+        writer.fields.update(base.fields)
+        for doc_id, data in base.iter_raw():
+            if doc_id not in removed and doc_id not in writer.written:
+                writer.add_raw(doc_id, data)
+    return writer.close()
+
+
+def update_indexes(json_dir: Path, qdrant_url: str = "http://qdrant:6333") -> dict:
+    """
+    Actualiza los índices con los cambios del dataset desde el último build
+
+    Si no hay manifest o la generación activa está incompleta (o es el layout anterior),
+    hace un build completo.
+    """
+    from .builders import EmbeddingBuilder, QdrantBuilder
+    from .indexing import build_indexes
+
+    json_dir = Path(json_dir)
+    base = current_generation()
+    manifest = load_manifest(base.manifest_path)
+    if base.is_legacy or manifest is None or not base.is_complete():
+        print("ℹ️  Sin manifest o generación previa: construcción completa")
+        return build_indexes(json_dir, qdrant_url)
+
+    start_time = time.time()
+    print(f"🔄 Actualización incremental desde: {json_dir} (base: generación {base.number})")
+
+    files = manifest["files"]
+    current = dataset_hashes(json_dir)
+    delta = diff_dataset(files, current)
+    print(f"   ➕ Nuevos: {len(delta['added'])}, ✏️  Modificados: {len(delta['changed'])}, "
+          f"➖ Eliminados: {len(delta['removed'])}")
+
+    report = {"mode": "incremental", **{k: len(v) for k, v in delta.items()}}
+    if not any(delta.values()):
+        print("✅ Índices ya están actualizados")
+        return {**report, "paragraphs_added": 0, "paragraphs_removed": 0,
+                "generation": base.number, "elapsed_s": round(time.time() - start_time, 1)}
+
+    # 1) Point ids a eliminar: todo lo que generaron los archivos eliminados o modificados
+    removed_ids = {pid for f in delta["removed"] + delta["changed"] for pid in files[f]["ids"]}
+    kept_ids = {pid for f, entry in files.items() if f not in delta["removed"] and f not in delta["changed"] for pid in entry["ids"]}
+
+    # 2) Párrafos de los archivos nuevos o modificados (ids duplicados se descartan)
+    touched = delta["added"] + delta["changed"]
+    new_ids, new = [], ParagraphBatch()
+    ids_by_file = {f: [] for f in touched}
+    docs_by_file = {f: set() for f in touched}
+    for batch in iter_paragraph_batches(json_dir, settings.processing_mode, files=[json_dir / f for f in touched]):
+        keep = []
+        for i, key in enumerate(zip(batch.expediente, batch.section, batch.paragraph_id)):
+            pid = paragraph_point_id(*key)
+            if pid in kept_ids:
+                continue
+            kept_ids.add(pid)
+            new_ids.append(pid)
+            keep.append(i)
+            ids_by_file[batch.path[i]].append(pid)
+            docs_by_file[batch.path[i]].add(batch.expediente[i])
+        new.extend(batch.take(keep))
+
+    # Fallos que dejan de estar referenciados por algún archivo conservado
+    kept_files = [entry for f, entry in files.items() if f not in delta["removed"] and f not in delta["changed"]]
+    kept_docs = {e for entry in kept_files for e in entry.get("docs", ())}
+    removed_docs = {
+        document_id(e) for f in delta["removed"] + delta["changed"] for e in files[f].get("docs", ())
+        if e not in kept_docs
+    }
+
+    # 3) BM25 + corpus + payload store + metadatos en una generación nueva (la activa sigue sirviendo)
+    generation = create_generation(mode="incremental")
+    qdrant_builder = QdrantBuilder(qdrant_url, generation.collection)
+    try:
+        bm25_meta, kept_doc_ids = update_bm25_index(
+            base.bm25_index_dir, generation.bm25_index_dir, removed_ids,
+            (tokenize(t) for t in new.text), new_ids,
+        )
+        _rewrite_corpus(base.corpus_dir, generation.corpus_dir, kept_doc_ids, new.text)
+        _rewrite_payloads(base.payload_store_dir, generation.payload_store_dir, removed_ids, new_ids, new.payloads())
+        _rewrite_documents(base.document_store_dir, generation.document_store_dir, removed_docs, new.documents)
+        build_metadata_index(generation.payload_store_dir, generation.metadata_index_dir, generation.document_store_dir)
+
+        for f in delta["removed"]:
+            del files[f]
+        for f in touched:
+            files[f] = {"hash": current[f], "ids": ids_by_file[f], "docs": sorted(docs_by_file[f])}
+        save_manifest(files, generation.manifest_path)
+
+        # 4) Qdrant, sobre una copia de la colección activa: upsert de lo nuevo con ids estables y
+        #    después borrar lo que ya no existe. Los párrafos de un fallo modificado conservan su
+        #    id, así que se reemplazan en el lugar.
+        qdrant_builder.copy_collection(base.collection)
+        if new_ids:
+            embedding_builder = EmbeddingBuilder()
+            try:
+                vectors = embedding_builder.build(new.text, batch_size=settings.embedding_batch_size)
+            finally:
+                embedding_builder.close()
+            qdrant_builder.upload_batch(vectors, new, new_ids, batch_size=settings.upload_batch_size)
+        stale_ids = sorted(removed_ids - set(new_ids))
+        if stale_ids:
+            qdrant_builder.delete(stale_ids)
+    except BaseException:
+        discard_generation(generation, qdrant_builder.client)
+        raise
+
+    # 5) Activar (si algo falla antes, la generación base sigue activa y el próximo update repite el delta)
+    activate_generation(generation, qdrant_builder.client)
+
+    report.update({
+        "paragraphs_added": len(new_ids),
+        "paragraphs_removed": len(removed_ids),
+        "bm25_docs": bm25_meta["n_docs"],
+        "generation": generation.number,
+        "elapsed_s": round(time.time() - start_time, 1),
+    })
+    print(f"✅ Actualización incremental completada en {report['elapsed_s']:.1f}s (generación {generation.number}): "
+          f"+{len(new_ids):,} / -{len(removed_ids):,} párrafos ({bm25_meta['n_docs']:,} en total)")
+    return report
@@ -1,59 +1,189 @@
 from pathlib import Path
-import os, gc, psutil
-import pickle
-import numpy as np
+import os, gc, time, resource, psutil
+from tqdm import tqdm
 
-from backend.data import iter_paragraphs  # ← Usar factory directamente
-from .builders import BM25Builder, QdrantBuilder, EmbeddingBuilder
+from backend.data import iter_paragraph_batches  # ← Usar factory directamente
+from .builders import BM25Builder, QdrantBuilder, EmbeddingBuilder, PayloadStoreBuilder
+from .documents import DocumentStoreWriter
+from .incremental import dataset_hashes, paragraph_point_id, save_manifest
+from .metadata_index import build_metadata_index
+from .generations import activate_generation, create_generation, discard_generation
+from .qdrant_config import recall_report
 from backend.config import get_settings
 
 # Configuración de rutas y parámetros
 settings = get_settings()
 
 
-def build_indexes(json_dir: Path, qdrant_url: str = "http://qdrant:6333"):
-    """Función principal de construcción de índices"""
+def _peak_rss_mb() -> float:
+    """Pico de memoria residente del proceso (ru_maxrss está en KB en Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _dir_size_mb(path: str) -> float:
+    return sum(f.stat().st_size for f in Path(path).iterdir() if f.is_file()) / (1024**2)
+
+
+def build_indexes(json_dir: Path, qdrant_url: str = "http://qdrant:6333", chunk_size: int = settings.processing_batch_size) -> dict:
+    """
+    Función principal de construcción de índices (streaming)
+
+    Los párrafos se leen del processor en batches columnares de `chunk_size` (ver
+    data/batch.py); cada batch se codifica, se sube a Qdrant y se agrega al payload store, a
+    la tabla de documentos (una vez por fallo), al corpus y a las estadísticas BM25 antes de
+    leer la siguiente. La memoria pico queda acotada por el tamaño del chunk
+    (más los postings BM25 en arrays compactos), no por el tamaño del corpus.
+
+    Todo se escribe en una generación nueva (directorio + colección Qdrant propios) que se
+    activa al final; los índices en uso no se tocan mientras tanto (ver generations.py).
+    """
     print(f"🚀 Iniciando construcción de índices desde: {json_dir}")
+    start_time = time.time()
     
     # Verificar memoria disponible
     memory_gb = psutil.virtual_memory().total / (1024**3)
     print(f"💾 Memoria total disponible: {memory_gb:.1f} GB")
+    print(f"📦 Tamaño de chunk: {chunk_size:,} párrafos")
     
-    # 1) Cargar documentos
-    print("📊 Contando documentos...")
-    paras = list(iter_paragraphs(Path(json_dir), settings.processing_mode))
-    total_docs = len(paras)
-    print(f"📄 Total de párrafos a procesar: {total_docs:,}")
-    
-    texts = [p.text for p in paras]
+    # 1) Generación nueva y builders
+    generation = create_generation(mode="full")
+    print(f"🆕 Generación {generation.number} (colección {generation.collection})")
     
-    # 2) Crear builders
     embedding_builder = EmbeddingBuilder()
-    qdrant_builder = QdrantBuilder(qdrant_url)
-    bm25_builder = BM25Builder(settings.bm25_path, settings.bm25_corpus_path)
-    
-    # 3) Generar embeddings
-    dynamic_batch_size = min(settings.embedding_batch_size, max(8, int(memory_gb * 8)))
-    vectors = embedding_builder.build(texts, batch_size=dynamic_batch_size)
+    qdrant_builder = QdrantBuilder(qdrant_url, generation.collection)
+    try:
+        report = _build_generation(
+            generation, Path(json_dir), embedding_builder, qdrant_builder, chunk_size,
+            min(settings.embedding_batch_size, max(8, int(memory_gb * 8))),
+        )
+    except BaseException:
+        discard_generation(generation, qdrant_builder.client)
+        raise
+    finally:
+        embedding_builder.close()  # los vectores ya calculados sirven aunque el build falle
     
-    # 4) Construir Qdrant
-    payloads = [p.model_dump() for p in paras]
-    qdrant_builder.build(vectors, payloads, batch_size=settings.upload_batch_size)
-    
-    # 5) Construir BM25
-    bm25_builder.build(texts)
+    # 4) Activar: alias de Qdrant + CURRENT (los retrievers en uso siguen con la anterior)
+    activate_generation(generation, qdrant_builder.client)
     
     # Cleanup
-    del vectors, payloads, embedding_builder
+    del embedding_builder
     gc.collect()
     
-    # Verificar tamaños de archivo
-    bm25_size_mb = os.path.getsize(settings.bm25_path) / (1024**2)
-    corpus_size_mb = os.path.getsize(settings.bm25_corpus_path) / (1024**2)
+    # 5) Recall vs latencia de la búsqueda densa con la configuración de la colección (informativo)
+    if settings.qdrant_recall_report_queries > 0:
+        try:
+            report["recall"] = recall_report(qdrant_builder.client, generation.collection,
+                                             out_path=generation.recall_report_path)
+        except Exception as e:
+            print(f"⚠️  No se pudo generar el reporte de recall: {e}")
+    
+    report["generation"] = generation.number
+    report["collection"] = generation.collection
+    report["peak_rss_mb"] = round(max(report["peak_rss_mb"], _peak_rss_mb()), 1)
+    report["elapsed_s"] = round(time.time() - start_time, 1)
 
-    print(f"✅ Indexación completada:")
-    print(f"   📄 Párrafos procesados: {total_docs:,}")
-    print(f"   🧠 Vectores en Qdrant: {total_docs:,}")
-    print(f"   📝 BM25 index: {bm25_size_mb:.1f} MB")
-    print(f"   📚 Corpus file: {corpus_size_mb:.1f} MB")
-    print(f"   💾 Memoria final: {psutil.virtual_memory().percent:.1f}% usada")
\ No newline at end of file
+    print(f"✅ Indexación completada en {report['elapsed_s']:.1f}s (generación {generation.number}):")
+    print(f"   📄 Párrafos procesados: {report['paragraphs']:,} ({report['duplicates_skipped']:,} duplicados descartados)")
+    print(f"   🧠 Vectores en Qdrant: {report['paragraphs']:,} ({report['embeddings_cache'].get('hits', 0):,} desde el cache de embeddings)")
+    print(f"   📝 BM25 index: {report['bm25_index_mb']:.1f} MB")
+    print(f"   📚 Corpus: {report['corpus_mb']:.1f} MB")
+    print(f"   🗃️  Payload store: {report['payload_store_mb']:.1f} MB")
+    print(f"   📑 Documentos: {report['documents']:,} ({report['document_store_mb']:.1f} MB)")
+    print(f"   📈 Pico de memoria (RSS): {report['peak_rss_mb']:.1f} MB")
+    for row in report.get("recall", {}).get("results", []):
+        recall = next(v for key, v in row.items() if key.startswith("recall@"))
+        print(f"   🎯 {row['config']:<24} recall {recall:.3f}  {row['mean_ms']:.1f} ms (p95 {row['p95_ms']:.1f} ms)")
+    print(f"   💾 Memoria final: {psutil.virtual_memory().percent:.1f}% usada")
+    
+    return report
+
+
+def _build_generation(generation, json_dir: Path, embedding_builder: EmbeddingBuilder,
+                      qdrant_builder: QdrantBuilder, chunk_size: int, dynamic_batch_size: int) -> dict:
+    """Escribe colección Qdrant, payload store, corpus, BM25 y manifest de la generación"""
+    process = psutil.Process()
+    bm25_builder = BM25Builder(generation.bm25_index_dir, generation.corpus_dir)
+    payload_builder = PayloadStoreBuilder(generation.payload_store_dir)
+    document_writer = DocumentStoreWriter(generation.document_store_dir)
+    
+    collection_ready = False
+    total_docs = 0
+    total_documents = 0
+    duplicates = 0
+    peak_sampled_mb = 0.0
+    
+    # Hashes de los archivos para el manifest de la indexación incremental
+    file_hashes = dataset_hashes(json_dir)
+    ids_by_file = {f: [] for f in file_hashes}
+    docs_by_file = {}
+    seen_ids = set()
+    
+    # 2) Procesar batch a batch: embeddings → Qdrant → payload store + documentos → BM25 + corpus
+    progress = tqdm(desc="Indexando párrafos", unit="párr")
+    for batch in iter_paragraph_batches(json_dir, settings.processing_mode, batch_size=chunk_size):
+        # Point ids estables por (expediente, section, paragraph_id); repetidos se descartan
+        ids = []
+        keep = []
+        for i, key in enumerate(zip(batch.expediente, batch.section, batch.paragraph_id)):
+            pid = paragraph_point_id(*key)
+            if pid in seen_ids:
+                duplicates += 1
+                continue
+            seen_ids.add(pid)
+            ids.append(pid)
+            keep.append(i)
+            ids_by_file.setdefault(batch.path[i], []).append(pid)
+        if not keep:
+            continue
+        if len(keep) < len(batch):
+            batch = batch.take(keep)
+        for expediente, path in zip(batch.expediente, batch.path):
+            docs_by_file.setdefault(path, set()).add(expediente)
+        
+        vectors = embedding_builder.build(batch.text, batch_size=dynamic_batch_size, show_progress=False)
+        if not collection_ready:
+            qdrant_builder.create_collection(vectors.shape[1])
+            collection_ready = True
+        qdrant_builder.upload_batch(vectors, batch, ids, batch_size=settings.upload_batch_size)
+        
+        payload_builder.add(ids, batch.payloads())
+        total_documents += document_writer.add_table(batch.documents)
+        bm25_builder.add(batch.text, ids)
+        
+        total_docs += len(batch)
+        progress.update(len(batch))
+        peak_sampled_mb = max(peak_sampled_mb, process.memory_info().rss / (1024**2))
+        
+        del batch, vectors
+    progress.close()
+    
+    if total_docs == 0:
+        raise ValueError(f"No se encontraron párrafos en {json_dir}")
+    
+    # 3) Cerrar stores y escribir índice BM25 + manifest
+    payload_meta = payload_builder.finish()
+    document_meta = document_writer.close()
+    bm25_meta = bm25_builder.finish()
+    metadata_meta = build_metadata_index(generation.payload_store_dir, generation.metadata_index_dir,
+                                         generation.document_store_dir)
+    save_manifest({
+        f: {"hash": h, "ids": ids_by_file[f], "docs": sorted(docs_by_file.get(f, ()))}
+        for f, h in file_hashes.items()
+    }, generation.manifest_path)
+    
+    return {
+        "mode": "full",
+        "paragraphs": total_docs,
+        "duplicates_skipped": duplicates,
+        "chunk_size": chunk_size,
+        "bm25_terms": bm25_meta["n_terms"],
+        "bm25_postings": bm25_meta["n_postings"],
+        "bm25_index_mb": round(_dir_size_mb(generation.bm25_index_dir), 1),
+        "corpus_mb": round(_dir_size_mb(generation.corpus_dir), 1),
+        "payload_store_mb": round(payload_meta["bytes"] / (1024**2), 1),
+        "documents": total_documents,
+        "document_store_mb": round(document_meta["bytes"] / (1024**2), 1),
+        "metadata_articles": metadata_meta["n_articles"],
+        "embeddings_cache": embedding_builder.get_stats(),
+        "peak_rss_mb": round(peak_sampled_mb, 1),
+    }
@@ -0,0 +1,358 @@
+# backend/search/inference.py
+"""
+Backends de inferencia para el encoder (MiniLM) y el cross-encoder
+
+- torch: SentenceTransformer / CrossEncoder en modo eager (comportamiento original)
+- onnx:  modelos exportados a ONNX Runtime, opcionalmente con cuantización dinámica int8.
+         Si faltan los modelos exportados u onnxruntime no está instalado se vuelve a torch.
+
+Uso desde la línea de comandos (dentro del contenedor backend):
+    python -m backend.search.inference export [--no-quantize]   # exporta ambos modelos (+ int8)
+    python -m backend.search.inference parity [--fp32]         # compara ONNX vs PyTorch
+La misma verificación corre en tests/test_onnx_parity.py si onnxruntime está instalado.
+"""
+import argparse
+import inspect
+import json
+import logging
+import os
+import sys
+from typing import List, Sequence, Tuple, Union
+
+import numpy as np
+from tqdm import tqdm
+
+from backend.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+EMB_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+# Umbrales de paridad (int8 introduce algo de ruido de cuantización)
+PARITY_MIN_COSINE = {"fp32": 0.9999, "int8": 0.98}
+PARITY_MAX_SCORE_DIFF = {"fp32": 1e-3, "int8": 0.5}
+
+
+def _model_dir(model_name: str, base_dir: str = None) -> str:
+    return os.path.join(base_dir or settings.onnx_model_dir, model_name.replace("/", "__"))
+
+
+def _onnx_file(quantize: bool) -> str:
+    return "model.int8.onnx" if quantize else "model.onnx"
+
+
+# =================================
+# ONNX RUNTIME
+# =================================
+
+class _OnnxModel:
+    """Sesión ONNX Runtime + tokenizer + config de exportación"""
+
+    def __init__(self, model_dir: str, quantize: bool):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, "export.json"), encoding="utf-8") as f:
+            self.export_config = json.load(f)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, _onnx_file(quantize)),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_seq_length = int(self.export_config.get("max_seq_length", 256))
+        self.quantized = quantize
+
+    def _run(self, *texts) -> Tuple[np.ndarray, np.ndarray]:
+        features = self.tokenizer(
+            *texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np",
+        )
+        inputs = {k: v.astype(np.int64) for k, v in features.items() if k in self.input_names}
+        output = self.session.run(None, inputs)[0]
+        return output, features["attention_mask"]
+
+    @staticmethod
+    def _batches(lengths: Sequence[int], batch_size: int, show_progress_bar: bool):
+        """Índices agrupados por largo similar (menos padding por batch)"""
+        order = np.argsort(lengths, kind="stable")
+        starts = range(0, len(order), batch_size)
+        if show_progress_bar:
+            starts = tqdm(starts, desc="Batches")
+        for start in starts:
+            yield order[start:start + batch_size]
+
+
+class OnnxEncoder(_OnnxModel):
+    """Reemplazo de SentenceTransformer.encode (mean pooling + normalización L2)"""
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        convert_to_numpy: bool = True,
+        **kwargs,
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        dim = self.get_sentence_embedding_dimension()
+        embeddings = np.empty((len(texts), dim), dtype=np.float32)
+
+        for idx in self._batches([len(t) for t in texts], batch_size, show_progress_bar):
+            hidden, mask = self._run([texts[i] for i in idx])
+            mask = mask[..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if self.export_config.get("normalize", True):
+                pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            embeddings[idx] = pooled
+
+        return embeddings[0] if single else embeddings
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return int(self.export_config["dimension"])
+
+
+class OnnxCrossEncoder(_OnnxModel):
+    """Reemplazo de CrossEncoder.predict"""
+
+    def predict(
+        self,
+        sentences: List[Tuple[str, str]],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        convert_to_numpy: bool = True,
+        **kwargs,
+    ) -> np.ndarray:
+        pairs = list(sentences)
+        scores = np.empty(len(pairs), dtype=np.float32)
+
+        for idx in self._batches([len(a) + len(b) for a, b in pairs], batch_size, show_progress_bar):
+            logits, _ = self._run([pairs[i][0] for i in idx], [pairs[i][1] for i in idx])
+            batch_scores = logits[:, 0]
+            if self.export_config.get("activation") == "sigmoid":
+                batch_scores = 1.0 / (1.0 + np.exp(-batch_scores))
+            scores[idx] = batch_scores
+
+        return scores
+
+
+# =================================
+# FACTORIES
+# =================================
+
+def _use_onnx(model_name: str, backend: str, quantize: bool) -> bool:
+    if backend != "onnx":
+        return False
+    path = os.path.join(_model_dir(model_name), _onnx_file(quantize))
+    if not os.path.exists(path):
+        logger.warning(f"⚠️ ONNX model not found at {path}, falling back to PyTorch")
+        return False
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        logger.warning("⚠️ onnxruntime not installed, falling back to PyTorch")
+        return False
+    return True
+
+
+def get_encoder(model_name: str = EMB_MODEL, backend: str = None, quantize: bool = None, device: str = "cpu"):
+    """Encoder de oraciones según el backend configurado (INFERENCE_BACKEND)"""
+    backend = backend or settings.inference_backend
+    quantize = settings.onnx_quantize if quantize is None else quantize
+
+    if _use_onnx(model_name, backend, quantize):
+        logger.info(f"⚡ Loading ONNX encoder {model_name} ({'int8' if quantize else 'fp32'})")
+        return OnnxEncoder(_model_dir(model_name), quantize)
+
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, device=device)
+
+
+def model_tag(model_name: str, model) -> str:
+    """Modelo + backend, para claves de cache (int8 da resultados levemente distintos a PyTorch)"""
+    if isinstance(model, _OnnxModel):
+        return f"{model_name}:onnx-{'int8' if model.quantized else 'fp32'}"
+    return f"{model_name}:torch"
+
+
+def get_cross_encoder(model_name: str = RERANK_MODEL, backend: str = None, quantize: bool = None):
+    """Cross-encoder según el backend configurado (INFERENCE_BACKEND)"""
+    backend = backend or settings.inference_backend
+    quantize = settings.onnx_quantize if quantize is None else quantize
+
+    if _use_onnx(model_name, backend, quantize):
+        logger.info(f"⚡ Loading ONNX cross-encoder {model_name} ({'int8' if quantize else 'fp32'})")
+        return OnnxCrossEncoder(_model_dir(model_name), quantize)
+
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(model_name, device="cpu")
+
+
+# =================================
+# EXPORT + PARITY
+# =================================
+
+def _forward_inputs(torch_model, features) -> List[str]:
+    """
+    Entradas del tokenizer en el orden de forward()
+
+    ONNX asigna input_names a las entradas del grafo por posición, en el orden de la firma de
+    forward; con el orden del dict del tokenizer (p. ej. token_type_ids antes que
+    attention_mask) las entradas quedaban cruzadas sin ningún error.
+    """
+    params = list(inspect.signature(torch_model.forward).parameters)
+    unknown = [name for name in features if name not in params]
+    if unknown:
+        raise ValueError(f"El tokenizer devuelve entradas que forward() no acepta: {unknown}")
+    names = params[:max(params.index(name) for name in features) + 1]
+    missing = [name for name in names if name not in features]
+    if missing:
+        raise ValueError(f"Faltan entradas intermedias de forward() para pasarlas por posición: {missing}")
+    return names
+
+
+def _export(torch_model, tokenizer, sample: tuple, output_names: List[str], model_dir: str,
+            export_config: dict, quantize: bool):
+    import torch
+
+    os.makedirs(model_dir, exist_ok=True)
+    features = tokenizer(*sample, padding=True, truncation=True, return_tensors="pt")
+    input_names = _forward_inputs(torch_model, features)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes[output_names[0]] = {0: "batch"}
+
+    onnx_path = os.path.join(model_dir, "model.onnx")
+    torch_model.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            torch_model,
+            tuple(features[name] for name in input_names),
+            onnx_path,
+            input_names=input_names,
+            output_names=output_names,
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(onnx_path, os.path.join(model_dir, _onnx_file(True)), weight_type=QuantType.QInt8)
+
+    tokenizer.save_pretrained(model_dir)
+    with open(os.path.join(model_dir, "export.json"), "w", encoding="utf-8") as f:
+        json.dump(export_config, f, indent=2)
+
+
+def export_models(output_dir: str = None, quantize: bool = True):
+    """Exporta encoder y cross-encoder a ONNX (y sus variantes int8 si quantize)"""
+    from sentence_transformers import CrossEncoder, SentenceTransformer
+
+    print(f"📦 Exportando {EMB_MODEL} a ONNX...")
+    encoder = SentenceTransformer(EMB_MODEL, device="cpu")
+    has_normalize = any(type(m).__name__ == "Normalize" for m in encoder)
+    _export(
+        encoder[0].auto_model,
+        encoder.tokenizer,
+        (["texto de ejemplo"],),
+        ["last_hidden_state"],
+        _model_dir(EMB_MODEL, output_dir),
+        {
+            "model": EMB_MODEL,
+            "dimension": encoder.get_sentence_embedding_dimension(),
+            "max_seq_length": 256,
+            "normalize": has_normalize,
+        },
+        quantize,
+    )
+
+    print(f"📦 Exportando {RERANK_MODEL} a ONNX...")
+    cross = CrossEncoder(RERANK_MODEL, device="cpu")
+    activation = getattr(cross, "activation_fn", None) or getattr(cross, "default_activation_function", None)
+    _export(
+        cross.model,
+        cross.tokenizer,
+        (["pregunta"], ["párrafo de ejemplo"]),
+        ["logits"],
+        _model_dir(RERANK_MODEL, output_dir),
+        {
+            "model": RERANK_MODEL,
+            "max_seq_length": 512,
+            "activation": "sigmoid" if type(activation).__name__ == "Sigmoid" else "identity",
+        },
+        quantize,
+    )
+    print(f"✅ Modelos exportados en {output_dir or settings.onnx_model_dir}")
+
+
+PARITY_TEXTS = [
+    "Se regulan los honorarios profesionales del letrado conforme a la ley 7046.",
+    "La notificación por cédula se considera válida cuando fue recibida en el domicilio constituido.",
+    "El recurso de apelación fue interpuesto fuera del plazo previsto en el art. 244 del CPCC.",
+    "Corresponde confirmar la sentencia de primera instancia en todas sus partes.",
+]
+PARITY_QUESTION = "¿Cómo se regulan los honorarios del abogado?"
+
+
+def check_parity(quantize: bool = None) -> bool:
+    """Compara embeddings (coseno) y scores del cross-encoder ONNX contra PyTorch"""
+    quantize = settings.onnx_quantize if quantize is None else quantize
+    variant = "int8" if quantize else "fp32"
+
+    torch_encoder = get_encoder(backend="torch")
+    onnx_encoder = get_encoder(backend="onnx", quantize=quantize)
+    if not isinstance(onnx_encoder, OnnxEncoder):
+        print("❌ ONNX encoder no disponible (¿se ejecutó 'export'?)")
+        return False
+
+    a = torch_encoder.encode(PARITY_TEXTS, convert_to_numpy=True)
+    b = onnx_encoder.encode(PARITY_TEXTS)
+    cosine = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+    torch_cross = get_cross_encoder(backend="torch")
+    onnx_cross = get_cross_encoder(backend="onnx", quantize=quantize)
+    pairs = [(PARITY_QUESTION, t) for t in PARITY_TEXTS]
+    torch_scores = np.asarray(torch_cross.predict(pairs), dtype=np.float32)
+    onnx_scores = onnx_cross.predict(pairs)
+    score_diff = np.abs(torch_scores - onnx_scores)
+    same_order = np.array_equal(np.argsort(torch_scores), np.argsort(onnx_scores))
+
+    ok_cosine = cosine.min() >= PARITY_MIN_COSINE[variant]
+    ok_scores = score_diff.max() <= PARITY_MAX_SCORE_DIFF[variant] and same_order
+
+    print(f"🧪 Paridad ONNX ({variant}) vs PyTorch:")
+    print(f"   {'✅' if ok_cosine else '❌'} Coseno mínimo encoder: {cosine.min():.5f} (umbral {PARITY_MIN_COSINE[variant]})")
+    print(f"   {'✅' if ok_scores else '❌'} Diferencia máx. cross-encoder: {score_diff.max():.4f} "
+          f"(umbral {PARITY_MAX_SCORE_DIFF[variant]}), mismo orden: {same_order}")
+    return bool(ok_cosine and ok_scores)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export / parity check de modelos ONNX")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_parser = sub.add_parser("export", help="Exporta encoder y cross-encoder a ONNX")
+    export_parser.add_argument("--output-dir", default=None)
+    export_parser.add_argument("--no-quantize", action="store_true", help="No generar la variante int8")
+    parity_parser = sub.add_parser("parity", help="Compara ONNX contra PyTorch")
+    parity_parser.add_argument("--fp32", action="store_true", help="Verifica la variante sin cuantizar")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_models(args.output_dir, quantize=not args.no_quantize)
+    else:
+        quantize = False if args.fp32 else None
+        sys.exit(0 if check_parity(quantize) else 1)
+
+
+if __name__ == "__main__":
+    main()
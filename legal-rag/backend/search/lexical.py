@@ -0,0 +1,130 @@
+# backend/search/lexical.py
+"""
+Motores top-k para la pata léxica (BM25)
+
+- exhaustive: acumula todos los postings de los términos de la consulta
+- maxscore:   poda dinámica MaxScore con cotas superiores por término calculadas al indexar.
+              Una vez que el k-ésimo score parcial supera la suma de cotas de los términos
+              restantes, ningún documento nuevo puede entrar al top-k: los términos que faltan
+              solo se evalúan sobre los candidatos vivos (búsqueda binaria en sus postings).
+
+Ambos devuelven exactamente el mismo top-k (salvo empates).
+"""
+import logging
+from typing import List, Tuple
+
+import numpy as np
+
+from .bm25 import SparseBM25Index
+
+logger = logging.getLogger(__name__)
+
+
+def _kth_largest(scores: np.ndarray, k: int) -> float:
+    """k-ésimo score más alto (o -inf si hay menos de k candidatos)"""
+    if len(scores) < k:
+        return float("-inf")
+    return float(np.partition(scores, -k)[-k])
+
+
+def _select_top(docs: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    if len(docs) > k:
+        part = np.argpartition(scores, -k)[-k:]
+        docs, scores = docs[part], scores[part]
+    order = np.argsort(scores)[::-1]
+    return docs[order].astype(np.int64), scores[order]
+
+
+class ExhaustiveTopK:
+    """Scoring completo de los postings de la consulta"""
+
+    name = "exhaustive"
+
+    def __init__(self, index: SparseBM25Index):
+        self.index = index
+
+    def top_k(self, tokens: List[str], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self.index.top_k(tokens, k)
+
+    def get_stats(self) -> dict:
+        return {}
+
+
+class MaxScoreTopK:
+    """Top-k BM25 con poda dinámica MaxScore sobre cotas superiores por término"""
+
+    name = "maxscore"
+
+    def __init__(self, index: SparseBM25Index):
+        self.index = index
+        self.stats = {"queries": 0, "postings_scored": 0, "postings_skipped": 0}
+
+    def top_k(self, tokens: List[str], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        term_ids = self.index.term_ids(tokens)
+        if len(term_ids) == 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        # Términos repetidos en la consulta suman varias veces (igual que BM25Okapi). Un documento
+        # sin el término suma 0, así que la cota no baja de 0 aunque sus pesos sean negativos
+        # (idf negativo reemplazado por epsilon * idf promedio en vocabularios chicos)
+        terms, counts = np.unique(term_ids, return_counts=True)
+        upper = np.maximum(self.index.max_weights[terms], 0.0) * counts
+
+        # Términos de mayor cota primero: son los que más rápido suben el umbral
+        order = np.argsort(upper)[::-1]
+        terms, counts, upper = terms[order], counts[order], upper[order]
+        remaining = np.concatenate([np.cumsum(upper[::-1])[::-1][1:], [0.0]])
+
+        self.stats["queries"] += 1
+        cand_docs = np.empty(0, dtype=np.int32)
+        cand_scores = np.empty(0, dtype=np.float64)
+
+        # Fase esencial: listas completas mientras un documento nuevo todavía pueda entrar al top-k
+        i = 0
+        while i < len(terms):
+            docs, weights = self.index.postings_of(terms[i])
+            self.stats["postings_scored"] += len(docs)
+            cand_docs, cand_scores = self._merge(cand_docs, cand_scores, docs, weights * counts[i])
+            i += 1
+            if remaining[i - 1] < _kth_largest(cand_scores, k):
+                break
+
+        # Fase no esencial: solo completar los candidatos que aún pueden alcanzar el umbral
+        for j in range(i, len(terms)):
+            threshold = _kth_largest(cand_scores, k)
+            alive = cand_scores + remaining[j - 1] >= threshold
+            cand_docs, cand_scores = cand_docs[alive], cand_scores[alive]
+
+            docs, weights = self.index.postings_of(terms[j])
+            pos = np.searchsorted(docs, cand_docs)
+            pos = np.minimum(pos, max(len(docs) - 1, 0))
+            hit = docs[pos] == cand_docs
+            cand_scores[hit] += weights[pos[hit]] * counts[j]
+
+            self.stats["postings_scored"] += int(hit.sum())
+            self.stats["postings_skipped"] += len(docs) - int(hit.sum())
+
+        return _select_top(cand_docs, cand_scores, k)
+
+    @staticmethod
+    def _merge(cand_docs, cand_scores, docs, weights) -> Tuple[np.ndarray, np.ndarray]:
+        """Suma una lista de postings a los scores parciales (ambos ordenados por doc id)"""
+        all_docs = np.concatenate([cand_docs, docs])
+        all_scores = np.concatenate([cand_scores, weights.astype(np.float64)])
+        uniq, inverse = np.unique(all_docs, return_inverse=True)
+        return uniq, np.bincount(inverse, weights=all_scores)
+
+    def get_stats(self) -> dict:
+        return dict(self.stats)
+
+
+def get_lexical_engine(name: str, index: SparseBM25Index):
+    """Factory de motores top-k léxicos"""
+    engines = {
+        "exhaustive": ExhaustiveTopK,
+        "maxscore": MaxScoreTopK,
+    }
+    if name not in engines:
+        raise ValueError(f"Motor léxico '{name}' no disponible. Opciones: {list(engines.keys())}")
+    logger.info(f"📝 Lexical top-k engine: {name}")
+    return engines[name](index)
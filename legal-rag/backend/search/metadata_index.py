@@ -0,0 +1,279 @@
+# backend/search/metadata_index.py
+"""
+Índices de metadatos enriquecidos para los boosts de HybridRetrieverEnriched
+
+Se construyen al indexar, a partir del payload store (y la tabla de documentos), para no recorrer artículos citados,
+materia e idea central de cada candidato en cada query:
+
+    point_ids.npy          point ids ordenados (fila de cada párrafo)
+    articles_*.npy         CSR fila -> columnas (fuente, número de artículo), data = repeticiones
+    article_sources.npy    fuente (índice en meta["sources"]) de cada columna de artículos
+    article_numbers.npy    número normalizado de cada columna de artículos
+    materia.npy            id de materia de cada fila (-1 sin materia); nombres en meta["materias"]
+    idea_*.npy             CSR fila -> términos de idea_central (sin repetir)
+    idea_terms.npy         vocabulario de idea_central, ordenado (búsqueda con searchsorted)
+    meta.json              cantidades, fuentes y materias
+
+En la query, parse_question() extrae números y tokens de la pregunta, y los boosts de todos
+los candidatos salen de unas pocas operaciones sobre estos arrays (ver MetadataIndex.boosts).
+
+Los pesos son los de HybridRetrieverEnriched._boost_score (que siguen usando las generaciones
+sin estos índices), pero la comparación es por números y tokens normalizados, no por substrings
+de la pregunta, así que el ranking de las consultas enriquecidas cambia:
+
+- artículo citado: su número tiene que aparecer como número en la pregunta ("10" ya no
+  coincide con el art. 1078; "1.078" y "1078" sí coinciden), o el nombre de su fuente como
+  substring; una fuente vacía ya no coincide con cualquier pregunta.
+- idea central: algún token de la pregunta es un token de la idea central (antes bastaba que
+  una palabra de la pregunta, aunque fuera "a" o "de", apareciera dentro del texto).
+- materia: sin cambios (substring de la pregunta en minúsculas).
+"""
+import json
+import os
+import re
+from array import array
+from typing import Iterable, List, Optional, Set, Tuple
+
+import msgpack
+import numpy as np
+
+from .bm25 import tokenize
+from .citations import normalize_article
+from .documents import open_document_store
+from .payload_store import PayloadStore
+
+META_FILE = "meta.json"
+
+ARTICLE_BOOST = 0.3   # por artículo citado que menciona la pregunta (número o fuente)
+MATERIA_BOOST = 0.1   # la materia del fallo aparece en la pregunta
+IDEA_BOOST = 0.2      # algún término de la pregunta está en la idea central
+
+_NUMBER_RE = re.compile(r"\d[\d.]*")
+
+
+def parse_question(question: str) -> Tuple[str, Set[str], List[str]]:
+    """Pregunta en minúsculas, números de artículo mencionados y tokens"""
+    q_lower = question.lower()
+    numbers = {normalize_article(m) for m in _NUMBER_RE.findall(q_lower)}
+    return q_lower, numbers, tokenize(question)
+
+
+def _csr(rows: np.ndarray, cols: np.ndarray, n_rows: int, counts: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """indptr, indices y data (repeticiones de cada par fila-columna) ordenados por fila"""
+    if len(rows):
+        pairs = np.unique(np.stack([rows, cols], axis=1), axis=0, return_counts=counts)
+        pairs, data = pairs if counts else (pairs, np.ones(len(pairs), dtype=np.int64))
+        rows, cols = pairs[:, 0], pairs[:, 1]
+    else:
+        data = np.empty(0, dtype=np.int64)
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols.astype(np.int32), data.astype(np.float32)
+
+
+class MetadataIndexWriter:
+    """Acumula metadatos párrafo a párrafo y escribe los índices"""
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self.point_ids = array("q")
+        self.sources, self.pairs, self.materias, self.terms = {}, {}, {}, {}
+        self.art_rows, self.art_cols = array("q"), array("q")
+        self.materia = array("q")
+        self.idea_rows, self.idea_cols = array("q"), array("q")
+
+    def features(self, payload: dict) -> Tuple[List[int], int, List[int]]:
+        """Columnas de artículos (con repeticiones), materia y términos de idea central de un fallo"""
+        articles = []
+        for art in payload.get("articulos_citados") or []:
+            source = (art.get("main_source") or "").strip().lower()
+            source_id = self.sources.setdefault(source, len(self.sources))
+            for num in art.get("cited_articles") or []:
+                articles.append(self.pairs.setdefault((source_id, normalize_article(num)), len(self.pairs)))
+
+        materia = (payload.get("materia_preliminar") or "").strip().lower()
+        materia_id = self.materias.setdefault(materia, len(self.materias)) if materia else -1
+
+        terms = [self.terms.setdefault(term, len(self.terms)) for term in set(tokenize(payload.get("idea_central") or ""))]
+        return articles, materia_id, terms
+
+    def add(self, point_id: int, payload: dict):
+        self.add_row(point_id, self.features(payload))
+
+    def add_row(self, point_id: int, features: Tuple[List[int], int, List[int]]):
+        """Agrega un párrafo con las features de su fallo (compartidas por todos sus párrafos)"""
+        articles, materia_id, terms = features
+        row = len(self.point_ids)
+        self.point_ids.append(point_id)
+        self.art_rows.extend([row] * len(articles))
+        self.art_cols.extend(articles)
+        self.materia.append(materia_id)
+        self.idea_rows.extend([row] * len(terms))
+        self.idea_cols.extend(terms)
+
+    def close(self) -> dict:
+        os.makedirs(self.index_dir, exist_ok=True)
+        point_ids = np.frombuffer(self.point_ids, dtype=np.int64)
+        n_rows = len(point_ids)
+
+        # Filas ordenadas por point id (búsqueda con searchsorted)
+        order = np.argsort(point_ids, kind="stable")
+        rank = np.empty(n_rows, dtype=np.int64)
+        rank[order] = np.arange(n_rows)
+
+        def save(name, values):
+            np.save(os.path.join(self.index_dir, f"{name}.npy"), values)
+
+        save("point_ids", point_ids[order])
+        save("materia", np.frombuffer(self.materia, dtype=np.int64)[order].astype(np.int32))
+
+        art_rows = rank[np.frombuffer(self.art_rows, dtype=np.int64)]
+        for name, values in zip(("indptr", "indices", "data"),
+                                _csr(art_rows, np.frombuffer(self.art_cols, dtype=np.int64), n_rows, counts=True)):
+            save(f"articles_{name}", values)
+        save("article_sources", np.array([s for s, _ in self.pairs], dtype=np.int32))
+        save("article_numbers", np.array([n for _, n in self.pairs], dtype=str))
+
+        # Vocabulario de idea_central ordenado alfabéticamente
+        terms = np.array(list(self.terms), dtype=str)
+        term_order = np.argsort(terms, kind="stable")
+        term_rank = np.empty(len(terms), dtype=np.int64)
+        term_rank[term_order] = np.arange(len(terms))
+        idea_rows = rank[np.frombuffer(self.idea_rows, dtype=np.int64)]
+        idea_cols = term_rank[np.frombuffer(self.idea_cols, dtype=np.int64)]
+        indptr, indices, _ = _csr(idea_rows, idea_cols, n_rows, counts=False)
+        save("idea_indptr", indptr)
+        save("idea_indices", indices)
+        save("idea_terms", terms[term_order])
+
+        meta = {
+            "format": "metadata-v1",
+            "count": n_rows,
+            "n_articles": len(self.pairs),
+            "n_idea_terms": len(self.terms),
+            "sources": list(self.sources),
+            "materias": list(self.materias),
+        }
+        with open(os.path.join(self.index_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        return meta
+
+
+def build_metadata_index(payload_store_dir: str, index_dir: str, document_store_dir: Optional[str] = None) -> dict:
+    """
+    Construye los índices de metadatos a partir de un payload store ya escrito
+
+    Con tabla de documentos (ver documents.py) los payloads de párrafo no traen los campos del
+    fallo: se leen de la tabla y las features se calculan una vez por expediente.
+    """
+    writer = MetadataIndexWriter(index_dir)
+    documents = open_document_store(document_store_dir) if document_store_dir else None
+    if documents is None:
+        for point_id, data in PayloadStore(payload_store_dir).iter_raw():
+            writer.add(point_id, msgpack.unpackb(data, raw=False))
+        return writer.close()
+
+    by_expediente = {}
+    for _, data in documents.iter_raw():
+        record = msgpack.unpackb(data, raw=False)
+        by_expediente[record["expediente"]] = writer.features(record)
+    for point_id, data in PayloadStore(payload_store_dir).iter_raw():
+        payload = msgpack.unpackb(data, raw=False)
+        features = by_expediente.get(payload.get("expediente"))
+        if features is None:
+            writer.add(point_id, payload)  # párrafo de una generación anterior, con los campos incluidos
+        else:
+            writer.add_row(point_id, features)
+    return writer.close()
+
+
+def _row_sums(indptr: np.ndarray, indices: np.ndarray, rows: np.ndarray, col_weights: np.ndarray,
+              data: np.ndarray = None) -> np.ndarray:
+    """Suma de col_weights[columna] (* data) sobre las columnas de cada fila pedida"""
+    starts = indptr[rows]
+    lens = indptr[rows + 1] - starts
+    total = int(lens.sum())
+    if total == 0:
+        return np.zeros(len(rows), dtype=np.float64)
+    positions = np.repeat(starts - (np.cumsum(lens) - lens), lens) + np.arange(total)
+    weights = col_weights[indices[positions]]
+    if data is not None:
+        weights = weights * data[positions]
+    return np.bincount(np.repeat(np.arange(len(rows)), lens), weights=weights, minlength=len(rows))
+
+
+class MetadataIndex:
+    """Boosts de metadatos de varios candidatos con operaciones vectorizadas"""
+
+    def __init__(self, index_dir: str):
+        meta_path = os.path.join(index_dir, META_FILE)
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(2, "Metadata index not found", meta_path)
+
+        with open(meta_path, encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        def load(name):
+            return np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r")
+
+        self.index_dir = index_dir
+        self.point_ids = load("point_ids")
+        self.materia = load("materia")
+        self.articles = (load("articles_indptr"), load("articles_indices"), load("articles_data"))
+        self.article_sources = load("article_sources")
+        self.article_numbers = np.load(os.path.join(index_dir, "article_numbers.npy"))
+        self.idea = (load("idea_indptr"), load("idea_indices"))
+        self.idea_terms = np.load(os.path.join(index_dir, "idea_terms.npy"))
+        self.sources = self.meta["sources"]
+        self.materias = self.meta["materias"]
+
+    def _rows(self, point_ids: Iterable[int]) -> Tuple[np.ndarray, np.ndarray]:
+        wanted = np.asarray(list(point_ids), dtype=np.int64)
+        if len(self.point_ids) == 0:
+            return np.zeros(len(wanted), dtype=np.int64), np.zeros(len(wanted), dtype=bool)
+        pos = np.minimum(np.searchsorted(self.point_ids, wanted), len(self.point_ids) - 1)
+        return pos, self.point_ids[pos] == wanted
+
+    def _article_mask(self, q_lower: str, numbers: Set[str]) -> np.ndarray:
+        """Columnas (fuente, número) mencionadas: el número o el nombre de la fuente está en la pregunta"""
+        matched_sources = np.array([i for i, s in enumerate(self.sources) if s and s in q_lower], dtype=np.int32)
+        mask = np.isin(self.article_sources, matched_sources)
+        if numbers:
+            mask |= np.isin(self.article_numbers, list(numbers))
+        return mask.astype(np.float64)
+
+    def _idea_mask(self, tokens: List[str]) -> np.ndarray:
+        mask = np.zeros(len(self.idea_terms), dtype=np.float64)
+        if tokens and len(self.idea_terms):
+            tokens = np.array(tokens, dtype=str)
+            pos = np.minimum(np.searchsorted(self.idea_terms, tokens), len(self.idea_terms) - 1)
+            mask[pos[self.idea_terms[pos] == tokens]] = 1.0
+        return mask
+
+    def boosts(self, point_ids: Iterable[int], question: str) -> np.ndarray:
+        """Boost de cada point id para la pregunta (0 para ids fuera del índice)"""
+        rows, found = self._rows(point_ids)
+        boosts = np.zeros(len(rows), dtype=np.float64)
+        if not found.any():
+            return boosts
+        rows = rows[found]
+        q_lower, numbers, tokens = parse_question(question)
+
+        indptr, indices, data = self.articles
+        articles = _row_sums(indptr, indices, rows, self._article_mask(q_lower, numbers), data)
+
+        materia_hit = np.array([bool(m) and m in q_lower for m in self.materias] + [False])
+        materia = materia_hit[self.materia[rows]]  # -1 (sin materia) cae en el False final
+
+        idea = _row_sums(*self.idea, rows, self._idea_mask(tokens)) > 0
+
+        boosts[found] = ARTICLE_BOOST * articles + MATERIA_BOOST * materia + IDEA_BOOST * idea
+        return boosts
+
+    def get_stats(self) -> dict:
+        return {
+            "count": int(self.meta["count"]),
+            "articles": int(self.meta["n_articles"]),
+            "materias": len(self.materias),
+            "idea_terms": int(self.meta["n_idea_terms"]),
+        }
@@ -0,0 +1,120 @@
+# backend/search/payload_store.py
+"""
+Payload store local, memory-mapped y direccionado por point id
+
+Estructura del directorio:
+    payloads.bin  payloads serializados con msgpack, uno detrás de otro
+    ids.npy       point ids ordenados (búsqueda con searchsorted)
+    starts.npy    offset de cada payload en payloads.bin (alineado con ids.npy)
+    lengths.npy   largo en bytes de cada payload (alineado con ids.npy)
+    meta.json     cantidad de registros y formato
+
+Los retrievers leen los payloads desde acá y consultan Qdrant con with_payload=False,
+evitando un round-trip y la transferencia JSON de payloads en cada query.
+"""
+import json
+import os
+from array import array
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+import msgpack
+import numpy as np
+
+META_FILE = "meta.json"
+
+
+class PayloadStoreWriter:
+    """Escritura incremental (append) del payload store"""
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+        self._blob = open(os.path.join(store_dir, "payloads.bin"), "wb")
+        # Arrays tipados: ~24 bytes por registro en lugar de tres listas de ints de Python
+        self._ids, self._starts, self._lengths = array("Q"), array("q"), array("q")
+        self._offset = 0
+
+    def add(self, point_id: int, payload: Dict[str, Any]):
+        self.add_raw(point_id, msgpack.packb(payload, use_bin_type=True))
+
+    def add_raw(self, point_id: int, data: bytes):
+        """Agrega un payload ya serializado (copia desde otro store sin decodificar)"""
+        self._blob.write(data)
+        self._ids.append(point_id)
+        self._starts.append(self._offset)
+        self._lengths.append(len(data))
+        self._offset += len(data)
+
+    def add_many(self, point_ids: Iterable[int], payloads: Iterable[Dict[str, Any]]):
+        for point_id, payload in zip(point_ids, payloads):
+            self.add(point_id, payload)
+
+    def close(self) -> dict:
+        self._blob.close()
+
+        ids = np.frombuffer(self._ids, dtype=np.uint64)
+        order = np.argsort(ids, kind="stable")
+        np.save(os.path.join(self.store_dir, "ids.npy"), ids[order])
+        np.save(os.path.join(self.store_dir, "starts.npy"), np.frombuffer(self._starts, dtype=np.int64)[order])
+        np.save(os.path.join(self.store_dir, "lengths.npy"), np.frombuffer(self._lengths, dtype=np.int64)[order])
+
+        meta = {"format": "msgpack-v1", "count": len(ids), "bytes": self._offset}
+        with open(os.path.join(self.store_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        return meta
+
+
+class PayloadStore:
+    """Lectura de payloads por point id sobre archivos memory-mapped"""
+
+    def __init__(self, store_dir: str):
+        meta_path = os.path.join(store_dir, META_FILE)
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(2, "Payload store not found", meta_path)
+
+        with open(meta_path, encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        self.store_dir = store_dir
+        self.ids = np.load(os.path.join(store_dir, "ids.npy"), mmap_mode="r")
+        self.starts = np.load(os.path.join(store_dir, "starts.npy"), mmap_mode="r")
+        self.lengths = np.load(os.path.join(store_dir, "lengths.npy"), mmap_mode="r")
+
+        blob_path = os.path.join(store_dir, "payloads.bin")
+        if os.path.getsize(blob_path) > 0:
+            self.blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+        else:
+            self.blob = np.empty(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return int(self.meta["count"])
+
+    def get_many(self, point_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """Payloads de los ids pedidos (los ids inexistentes se omiten)"""
+        wanted = np.asarray(list(point_ids), dtype=np.uint64)
+        if len(wanted) == 0 or len(self.ids) == 0:
+            return {}
+
+        pos = np.searchsorted(self.ids, wanted)
+        pos = np.minimum(pos, len(self.ids) - 1)
+        found = self.ids[pos] == wanted
+
+        payloads = {}
+        for point_id, p in zip(wanted[found].tolist(), pos[found].tolist()):
+            start = int(self.starts[p])
+            payloads[point_id] = msgpack.unpackb(self.blob[start:start + int(self.lengths[p])].tobytes(), raw=False)
+        return payloads
+
+    def iter_raw(self) -> Iterator[Tuple[int, bytes]]:
+        """(point_id, payload serializado) de todos los registros, en orden de point id"""
+        for point_id, start, length in zip(self.ids.tolist(), self.starts.tolist(), self.lengths.tolist()):
+            yield point_id, self.blob[start:start + length].tobytes()
+
+    def get(self, point_id: int) -> Dict[str, Any]:
+        payload = self.get_many([point_id]).get(int(point_id))
+        if payload is None:
+            raise KeyError(point_id)
+        return payload
+
+    def get_stats(self) -> dict:
+        return {"count": len(self), "size_mb": round(self.meta["bytes"] / (1024**2), 2)}
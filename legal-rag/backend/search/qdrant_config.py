@@ -0,0 +1,150 @@
+# backend/search/qdrant_config.py
+"""
+Almacenamiento de vectores, HNSW y parámetros de búsqueda de la colección de fallos
+
+La colección se creaba con vectores float32 en RAM, HNSW por defecto y segmentos fijos
+(2 de 20 MB) sin importar el tamaño del corpus. Ahora todo sale de Settings:
+
+- QDRANT_QUANTIZATION=int8: cuantización escalar en RAM (~4x menos) con rescoring sobre los
+  originales, que con QDRANT_ON_DISK=true quedan en disco. Los vectores siguen en float32:
+  float16 requiere Qdrant y qdrant-client >= 1.10 (acá 1.9, ver requirements.txt).
+- QDRANT_HNSW_M / QDRANT_HNSW_EF_CONSTRUCT / QDRANT_HNSW_ON_DISK, y los segmentos del
+  optimizador (0 = los que elija Qdrant).
+- En la query, search_params(): QDRANT_SEARCH_EF, QDRANT_SEARCH_EXACT, rescoring y
+  oversampling de la cuantización.
+
+recall_report() mide al final del build el recall@k y la latencia de la búsqueda aproximada
+contra la exacta (sin índice ni cuantización) para varios ef, usando como consultas vectores
+de la propia colección; se guarda en recall_report.json de la generación.
+"""
+import json
+import time
+from typing import List, Optional
+
+import numpy as np
+from qdrant_client import models as qmodels
+
+from backend.config import get_settings
+
+settings = get_settings()
+
+EF_GRID = (32, 64, 128, 256, 512)
+INDEXING_TIMEOUT = 600  # segundos esperando que el optimizador termine el índice HNSW
+
+
+def _quantization():
+    if settings.qdrant_quantization == "none":
+        return None
+    return qmodels.ScalarQuantization(
+        scalar=qmodels.ScalarQuantizationConfig(type=qmodels.ScalarType.INT8, quantile=0.99, always_ram=True)
+    )
+
+
+def vectors_config(dim: int) -> qmodels.VectorParams:
+    return qmodels.VectorParams(
+        size=dim,
+        distance="Cosine",
+        on_disk=settings.qdrant_on_disk,
+        hnsw_config=qmodels.HnswConfigDiff(
+            m=settings.qdrant_hnsw_m,
+            ef_construct=settings.qdrant_hnsw_ef_construct,
+            on_disk=settings.qdrant_hnsw_on_disk,
+        ),
+        quantization_config=_quantization(),
+    )
+
+
+def optimizers_config() -> qmodels.OptimizersConfigDiff:
+    return qmodels.OptimizersConfigDiff(
+        deleted_threshold=0.2,
+        vacuum_min_vector_number=1000,
+        default_segment_number=settings.qdrant_segment_number or None,
+        max_segment_size=settings.qdrant_max_segment_size or None,  # en KB
+        flush_interval_sec=5
+    )
+
+
+def search_params(ef: int = None, exact: bool = None, rescore: bool = None) -> Optional[qmodels.SearchParams]:
+    """Parámetros de búsqueda densa (None si todo queda en los valores por defecto de Qdrant)"""
+    ef = settings.qdrant_search_ef if ef is None else ef
+    exact = settings.qdrant_search_exact if exact is None else exact
+    rescore = settings.qdrant_quantization_rescore if rescore is None else rescore
+    quantization = None
+    if settings.qdrant_quantization != "none":
+        quantization = qmodels.QuantizationSearchParams(
+            rescore=rescore, oversampling=settings.qdrant_quantization_oversampling if rescore else None
+        )
+    if not ef and not exact and quantization is None:
+        return None
+    return qmodels.SearchParams(hnsw_ef=ef or None, exact=exact, quantization=quantization)
+
+
+def describe() -> dict:
+    """Configuración vigente, para /stats y el reporte"""
+    return {
+        "quantization": settings.qdrant_quantization,
+        "on_disk": settings.qdrant_on_disk,
+        "hnsw_m": settings.qdrant_hnsw_m,
+        "hnsw_ef_construct": settings.qdrant_hnsw_ef_construct,
+        "search_ef": settings.qdrant_search_ef or None,
+        "search_exact": settings.qdrant_search_exact,
+    }
+
+
+def wait_indexed(client, collection: str, timeout: float = INDEXING_TIMEOUT) -> bool:
+    """Espera a que el optimizador termine (estado green); False si se agota el tiempo"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if client.get_collection(collection).status == qmodels.CollectionStatus.GREEN:
+            return True
+        time.sleep(2)
+    return False
+
+
+def _run(client, collection: str, queries: List[list], k: int, params) -> tuple:
+    """Ids de cada consulta y latencia de cada una (ms)"""
+    results, latencies = [], []
+    for vector in queries:
+        start = time.perf_counter()
+        hits = client.search(collection_name=collection, query_vector=vector, limit=k,
+                             search_params=params, with_payload=False, with_vectors=False)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append({h.id for h in hits})
+    return results, latencies
+
+
+def recall_report(client, collection: str, k: int = settings.dense_search_limit,
+                  n_queries: int = settings.qdrant_recall_report_queries, out_path: str = None) -> dict:
+    """Recall@k y latencia de la búsqueda aproximada (varios ef) frente a la exacta"""
+    indexed = wait_indexed(client, collection)
+    points, _ = client.scroll(collection_name=collection, limit=n_queries, with_payload=False, with_vectors=True)
+    queries = [p.vector for p in points]
+    if not queries:
+        return {}
+
+    exact = qmodels.SearchParams(exact=True, quantization=qmodels.QuantizationSearchParams(ignore=True))
+    truth, exact_ms = _run(client, collection, queries, k, exact)
+
+    runs = [("exact", truth, exact_ms)]
+    rescore_options = (True, False) if settings.qdrant_quantization != "none" else (None,)
+    for rescore in rescore_options:
+        for ef in EF_GRID:
+            name = f"ef={ef}" + ("" if rescore is None else f" rescore={'on' if rescore else 'off'}")
+            runs.append((name, *_run(client, collection, queries, k, search_params(ef=ef, exact=False, rescore=rescore))))
+
+    rows = []
+    for name, results, latencies in runs:
+        recall = np.mean([len(r & t) / max(1, len(t)) for r, t in zip(results, truth)])
+        rows.append({
+            "config": name,
+            f"recall@{k}": round(float(recall), 4),
+            "mean_ms": round(float(np.mean(latencies)), 2),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        })
+
+    report = {"collection": collection, "queries": len(queries), "k": k, "indexed": indexed,
+              "config": describe(), "results": rows}
+    if out_path:
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return report
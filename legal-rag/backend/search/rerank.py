@@ -0,0 +1,140 @@
+# backend/search/rerank.py
+"""
+Re-ranking con CrossEncoder (PyTorch u ONNX, ver inference.py)
+
+- Batches configurables con bucketing por longitud: los pares se ordenan por largo antes de
+  predecir, así cada batch se paddea al largo de textos similares y no al del más largo.
+- Scores en el cache compartido (backend/cache.py) por (pregunta, texto del párrafo):
+  preguntas repetidas no vuelven a pagar el cross-encoder, en ningún worker.
+- Modo cascada: solo se re-rankean los top-M candidatos según el score fusionado.
+"""
+import logging
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from backend.cache import CacheService, get_cache
+from backend.config import get_settings
+from .inference import RERANK_MODEL, get_cross_encoder, model_tag
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+class Reranker:
+    """CrossEncoder con batching por longitud, cache compartido y truncado de candidatos"""
+
+    def __init__(
+        self,
+        model_name: str = RERANK_MODEL,
+        batch_size: int = settings.rerank_batch_size,
+        cache: CacheService = None,
+        top_m: int = settings.rerank_top_m,
+        max_chars: int = 500,
+    ):
+        self.model = get_cross_encoder(model_name)
+        self.model_tag = model_tag(model_name, self.model)
+        self.batch_size = batch_size
+        self.cache = cache or get_cache()
+        self.top_m = top_m
+        self.max_chars = max_chars
+
+        self.stats = {"pairs_scored": 0}
+
+    def rerank(
+        self,
+        question: str,
+        candidates: Dict[int, Tuple[float, Dict[str, Any]]],
+        min_keep: int = 0,
+    ) -> List[Tuple[float, Dict[str, Any]]]:
+        """
+        Re-rankea candidatos {point_id: (score_fusionado, payload)}
+
+        Con top_m > 0 solo se conservan los max(top_m, min_keep) mejores por score fusionado.
+
+        Returns:
+            Lista de (score_cross_encoder, payload)
+        """
+        items = self._select(candidates, min_keep)
+        if not items:
+            return []
+
+        texts = [payload["text"][:self.max_chars] for _, (_, payload) in items]
+        scores = self.score(question, texts)
+        return [(float(s), payload) for s, (_, (_, payload)) in zip(scores, items)]
+
+    def rerank_batch(
+        self,
+        questions: List[str],
+        candidates_list: List[Dict[int, Tuple[float, Dict[str, Any]]]],
+        min_keep: int = 0,
+    ) -> List[List[Tuple[float, Dict[str, Any]]]]:
+        """rerank de varias consultas: todos los pares pendientes van en una sola pasada del cross-encoder"""
+        selected = [self._select(candidates, min_keep) for candidates in candidates_list]
+        texts_list = [[payload["text"][:self.max_chars] for _, (_, payload) in items] for items in selected]
+        scores_list = self.score_batch(questions, texts_list)
+        return [
+            [(float(s), payload) for s, (_, (_, payload)) in zip(scores, items)]
+            for scores, items in zip(scores_list, selected)
+        ]
+
+    def _select(self, candidates: Dict[int, Tuple[float, Dict[str, Any]]], min_keep: int) -> list:
+        """Candidatos ordenados por score fusionado, truncados a max(top_m, min_keep) si top_m > 0"""
+        items = sorted(candidates.items(), key=lambda kv: kv[1][0], reverse=True)
+        if self.top_m > 0:
+            items = items[:max(self.top_m, min_keep)]
+        return items
+
+    def score(self, question: str, texts: List[str]) -> np.ndarray:
+        """Scores del cross-encoder para (question, text), usando el cache compartido"""
+        return self.score_batch([question], [texts])[0]
+
+    def score_batch(self, questions: List[str], texts_list: List[List[str]]) -> List[np.ndarray]:
+        """score para varias consultas; los pares que no están en cache se predicen juntos"""
+        scores_list = []
+        pairs, slots = [], []
+        for qi, (question, texts) in enumerate(zip(questions, texts_list)):
+            scores = np.empty(len(texts), dtype=np.float32)
+            cached = self.cache.get_scores(self.model_tag, question, texts)
+            for i, s in cached.items():
+                scores[i] = s
+            for i, text in enumerate(texts):
+                if i not in cached:
+                    pairs.append((question, text))
+                    slots.append((qi, i))
+            scores_list.append(scores)
+
+        if pairs:
+            computed = self._predict(pairs)
+            new_scores: Dict[int, Tuple[List[str], List[float]]] = {}
+            for (qi, i), s in zip(slots, computed):
+                scores_list[qi][i] = s
+                texts, values = new_scores.setdefault(qi, ([], []))
+                texts.append(texts_list[qi][i])
+                values.append(s)
+            for qi, (texts, values) in new_scores.items():
+                self.cache.set_scores(self.model_tag, questions[qi], texts, values)
+
+        return scores_list
+
+    def _predict(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        """Predice en batches de pares de largo similar (menos padding desperdiciado)"""
+        order = np.argsort([len(q) + len(t) for q, t in pairs], kind="stable")
+        sorted_scores = self.model.predict(
+            [pairs[i] for i in order],
+            batch_size=self.batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+        )
+        scores = np.empty(len(pairs), dtype=np.float32)
+        scores[order] = sorted_scores
+        self.stats["pairs_scored"] += len(pairs)
+        return scores
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "batch_size": self.batch_size,
+            "top_m": self.top_m,
+            "model": self.model_tag,
+            **self.stats,
+        }
@@ -1,18 +1,18 @@
 import time
-from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
 import logging
 from typing import List, Dict, Any
 
 from ..base import BaseRetriever
+from ..inference import EMB_MODEL, get_encoder, model_tag
+from ..qdrant_config import describe, search_params
+from backend.cache import get_cache
 from backend.config import get_settings
 
 logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
-EMB_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
-
 class DenseOnlyRetriever(BaseRetriever):
     """Retriever que solo usa búsqueda vectorial (sin BM25)"""
     
@@ -20,21 +20,33 @@ class DenseOnlyRetriever(BaseRetriever):
         start_time = time.time()
         
         self.qdrant = QdrantClient(url=settings.qdrant_url, prefer_grpc=False, timeout=10.0)
-        self.encoder = SentenceTransformer(EMB_MODEL, device='cpu')
+        self.encoder = get_encoder(EMB_MODEL)
+        self.encoder_tag = model_tag(EMB_MODEL, self.encoder)
+        self.cache = get_cache()
         self.limit = limit
+        self.search_params = search_params()
         
         logger.info(f"✅ DenseOnlyRetriever initialized in {time.time() - start_time:.2f}s")
     
+    def encode_question(self, question: str):
+        """Embedding de la pregunta, desde el cache compartido entre workers si ya se calculó"""
+        vector = self.cache.get_embedding(self.encoder_tag, question)
+        if vector is None:
+            vector = self.encoder.encode(question)
+            self.cache.set_embedding(self.encoder_tag, question, vector)
+        return vector
+    
     def query(self, question: str, top_n: int = 10) -> List[Dict[str, Any]]:
         """Solo búsqueda vectorial"""
         start_time = time.time()
         
-        query_vector = self.encoder.encode(question)
+        query_vector = self.encode_question(question)
         
         hits = self.qdrant.search(
-            collection_name="fallos",
+            collection_name=settings.qdrant_collection,
             query_vector=query_vector,
             limit=max(top_n, self.limit),
+            search_params=self.search_params,
             with_payload=True,
             with_vectors=False
         )
@@ -59,6 +71,7 @@ class DenseOnlyRetriever(BaseRetriever):
         return {
             "retriever_type": "dense_only",
             "limit": self.limit,
+            "dense_search": describe(),
             "reranking_enabled": False
         }
     
@@ -1,173 +1,505 @@
-import heapq, pickle, numpy as np, time
-from sentence_transformers import SentenceTransformer, CrossEncoder
-from qdrant_client import QdrantClient
-from rank_bm25 import BM25Okapi
-from functools import lru_cache
+import asyncio, contextvars, heapq, numpy as np, time
+from concurrent.futures import ThreadPoolExecutor
+from qdrant_client import AsyncQdrantClient, QdrantClient, models as qmodels
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from backend.config import get_settings
+from backend.cache import get_cache
+from backend.concurrency import run_cpu
+from backend.tracing import span
 
 from ..base import BaseRetriever
+from ..inference import EMB_MODEL, get_encoder, model_tag
+from ..bm25 import SparseBM25Index, tokenize
+from ..lexical import get_lexical_engine
+from ..fusion import get_fusion_strategy
+from ..citations import citation_filter, extract_citations
+from ..rerank import Reranker
+from ..payload_store import PayloadStore
+from ..documents import open_document_store
+from ..qdrant_config import describe as qdrant_describe, search_params
+from ..corpus import CorpusReader, corpus_stats, read_corpus_meta
+from ..generations import IndexGeneration, current_generation, pin_generation, unpin_generation
 
 logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
-EMB_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
-
 class HybridRetriever(BaseRetriever):
     """Retriever híbrido optimizado - migrado de retrieve.py"""
 
-    def __init__(self, k_dense: int = settings.dense_search_limit, k_lex: int = settings.lexical_search_limit):
+    search_type = "hybrid"
+
+    def __init__(self, k_dense: int = settings.dense_search_limit, k_lex: int = settings.lexical_search_limit,
+                 lexical_engine: str = settings.lexical_engine, parallel_legs: bool = settings.parallel_search_legs,
+                 fusion: str = settings.fusion_strategy, generation: IndexGeneration = None):
         start_time = time.time()
-        
-        # Qdrant client optimizado
-        self.qdrant = QdrantClient(
-            url=settings.qdrant_url,
-            prefer_grpc=False,
-            timeout=10.0
-        )
-        
-        # Cargar BM25 con manejo de errores
-        try:
-            with open(settings.bm25_path, "rb") as f:
-                self.bm25 = pickle.load(f)
-            self.corpus = np.load(settings.bm25_corpus_path, allow_pickle=True)
-        except FileNotFoundError as e:
-            raise FileNotFoundError(
-                f"BM25 index files not found. Please build indexes first.\n"
-                f"Missing: {e.filename}"
-            ) from e
-        
-        # Modelos pre-cargados
-        self.encoder = SentenceTransformer(EMB_MODEL, device='cpu')
-        self.encoder.max_seq_length = 256
-        
-        # Re-ranking opcional
+
+        # Generación de índices fija durante toda la vida del retriever (ver hot_swap.py)
+        self.generation = generation or current_generation()
+        self.collection = self.generation.collection
+        self._pin = pin_generation(self.generation)  # prune_generations no la borra mientras esté abierta
+
+        # Modelos e índices se cargan en paralelo (torch/onnxruntime y la lectura de disco
+        # liberan el GIL); load_times guarda cuánto tardó cada componente
+        self.load_times: Dict[str, float] = {}
         self.use_reranking = settings.enable_reranking
-        if self.use_reranking:
-            self.rerank = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
-        
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="load") as pool:
+            encoder_future = pool.submit(self._timed, "encoder", get_encoder, EMB_MODEL)
+            reranker_future = pool.submit(self._timed, "reranker", Reranker) if self.use_reranking else None
+
+            # Qdrant client optimizado
+            self.qdrant = self._timed("qdrant", QdrantClient, url=settings.qdrant_url, prefer_grpc=False, timeout=10.0)
+
+            # Cargar BM25 con manejo de errores
+            try:
+                self.bm25 = self._timed("bm25", SparseBM25Index, self.generation.bm25_index_dir)
+                self.lexical = get_lexical_engine(lexical_engine, self.bm25)
+                self._corpus = None  # ninguna query lee textos del corpus: se abre recién si se pide
+                self.payloads = self._timed("payloads", PayloadStore, self.generation.payload_store_dir)
+                self.documents = self._timed("documents", open_document_store, self.generation.document_store_dir)
+            except FileNotFoundError as e:
+                raise FileNotFoundError(
+                    f"Index files not found. Please build indexes first.\n"
+                    f"Missing: {e.filename}"
+                ) from e
+
+            # Modelos pre-cargados
+            self.encoder = encoder_future.result()
+            # Re-ranking opcional
+            if self.use_reranking:
+                self.reranker = reranker_future.result()
+
+        self.encoder.max_seq_length = 256
+        self.encoder_tag = model_tag(EMB_MODEL, self.encoder)
+        self.cache = get_cache()
+
         self.k_dense = k_dense
         self.k_lex = k_lex
-        
-        logger.info(f"✅ HybridRetriever initialized in {time.time() - start_time:.2f}s")
-        logger.info(f"   Dense: {k_dense}, Lexical: {k_lex}, Reranking: {self.use_reranking}")
+        self.fusion = get_fusion_strategy(fusion)
+        # ef / búsqueda exacta / rescoring de la cuantización (QDRANT_SEARCH_*)
+        self.search_params = search_params()
+
+        # Búsqueda densa filtrada por las citas de la pregunta (payload indexes de Qdrant)
+        self.citation_filter = settings.citation_filter_enabled
+        self.citation_min_hits = settings.citation_filter_min_hits
+        self.filter_stats = {"filtered": 0, "fallbacks": 0}
+
+        # Cliente async para aquery (se crea en el primer uso, dentro del event loop)
+        self._aqdrant = None
+        self._aqdrant_loop = None
+
+        # Pool para solapar la pata densa (encode + Qdrant) con BM25
+        self.parallel_legs = parallel_legs
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hybrid") if parallel_legs else None
+
+        logger.info(f"✅ {type(self).__name__} initialized in {time.time() - start_time:.2f}s "
+                    f"(generation {self.generation.number}, collection {self.collection})")
+        logger.info(f"   Dense: {k_dense}, Lexical: {k_lex}, Reranking: {self.use_reranking}, Parallel: {parallel_legs}")
+        logger.info("   Load: " + ", ".join(f"{name} {t:.2f}s" for name, t in self.load_times.items()))
+
+    def _timed(self, name: str, func, *args, **kwargs):
+        """func(*args, **kwargs) registrando su tiempo en load_times"""
+        start = time.time()
+        result = func(*args, **kwargs)
+        self.load_times[name] = round(time.time() - start, 3)
+        return result
+
+    def warm_up(self):
+        """Una pasada de encoder, cross-encoder, BM25 y Qdrant para que la primera query no pague la inicialización"""
+        start = time.time()
+        self.encoder.encode(["precalentamiento"])
+        if self.use_reranking:
+            self.reranker.model.predict([("precalentamiento", "precalentamiento")], show_progress_bar=False)
+        self.lexical.top_k(tokenize("precalentamiento"), 1)
+        self.qdrant.get_collection(self.collection)
+        self.load_times["warm_up"] = round(time.time() - start, 3)
 
-    @lru_cache(maxsize=100 if settings.enable_query_caching else 0)
     def _encode_question(self, question: str):
-        """Cache de embeddings para consultas repetidas"""
-        return self.encoder.encode(question)
+        """Embedding de la pregunta, desde el cache compartido entre workers si ya se calculó"""
+        with span("encode"):
+            vector = self.cache.get_embedding(self.encoder_tag, question)
+            if vector is None:
+                vector = self.encoder.encode(question)
+                self.cache.set_embedding(self.encoder_tag, question, vector)
+        return vector
 
-    def query(self, question: str, top_n: int = 10) -> List[Dict[str, Any]]:
-        """Búsqueda híbrida optimizada"""
-        start_time = time.time()
-        
-        # 1) Búsqueda densa
+    def encode_question(self, question: str):
+        return self._encode_question(question)
+
+    def encode_questions(self, questions: List[str]) -> List[np.ndarray]:
+        """Embeddings de varias preguntas: las que no están en cache van en un solo encode"""
+        with span("encode"):
+            vectors = [self.cache.get_embedding(self.encoder_tag, q) for q in questions]
+            missing = [i for i, v in enumerate(vectors) if v is None]
+            if missing:
+                encoded = self.encoder.encode([questions[i] for i in missing], batch_size=settings.embedding_batch_size)
+                for i, vector in zip(missing, encoded):
+                    vectors[i] = vector
+                    self.cache.set_embedding(self.encoder_tag, questions[i], vector)
+        return vectors
+
+    def _query_filter(self, question: str):
+        """Filtro de Qdrant por los artículos/leyes que cita la pregunta (None si no cita o está deshabilitado)"""
+        return citation_filter(extract_citations(question)) if self.citation_filter else None
+
+    def _use_filtered(self, hits: list) -> bool:
+        """La búsqueda filtrada alcanza; si no, se repite sin filtro (p.ej. colecciones sin campos de citas)"""
+        self.filter_stats["filtered"] += 1
+        if len(hits) >= self.citation_min_hits:
+            return True
+        self.filter_stats["fallbacks"] += 1
+        return False
+
+    def _dense_search(self, question: str) -> Tuple[list, float]:
+        """Pata densa: encode + búsqueda en Qdrant (filtrada por citas si la pregunta las tiene)"""
         dense_start = time.time()
         query_vector = self._encode_question(question)
-        
-        dense_hits = self.qdrant.search(
-            collection_name="fallos",
+        search = dict(
+            collection_name=self.collection,
             query_vector=query_vector,
             limit=self.k_dense,
-            with_payload=True,
+            search_params=self.search_params,
+            with_payload=False,
             with_vectors=False
         )
-        dense_time = time.time() - dense_start
 
-        # 2) Búsqueda léxica BM25
+        with span("dense_search"):
+            query_filter = self._query_filter(question)
+            if query_filter is not None:
+                dense_hits = self.qdrant.search(**search, query_filter=query_filter)
+                if self._use_filtered(dense_hits):
+                    return dense_hits, time.time() - dense_start
+
+            dense_hits = self.qdrant.search(**search)
+        return dense_hits, time.time() - dense_start
+
+    def _lexical_search(self, question: str) -> Tuple[Dict[int, float], float]:
+        """Pata léxica: top-k BM25 local"""
+        lex_start = time.time()
+        with span("bm25"):
+            lex_ids, lex_top_scores = self.lexical.top_k(tokenize(question), self.k_lex)
+        lex_point_ids = self.bm25.point_ids[lex_ids]
+        return dict(zip(lex_point_ids.tolist(), lex_top_scores.tolist())), time.time() - lex_start
+
+    def _fetch_payloads(self, ids: List[int]) -> Tuple[Dict[int, dict], float]:
+        """Payloads de todos los candidatos desde el payload store local (sin round-trip a Qdrant), con los campos de su fallo"""
+        fetch_start = time.time()
+        with span("payload_fetch"):
+            payloads = self.payloads.get_many(ids)
+            if self.documents is not None:
+                payloads = self.documents.join(payloads)
+        return payloads, time.time() - fetch_start
+
+    async def _adense_search(self, question: str) -> Tuple[list, float]:
+        """Pata densa async: encode en el pool CPU + búsqueda en Qdrant sin bloquear el loop"""
+        dense_start = time.time()
+        query_vector = await run_cpu(self._encode_question, question)
+        search = dict(
+            collection_name=self.collection,
+            query_vector=query_vector,
+            limit=self.k_dense,
+            search_params=self.search_params,
+            with_payload=False,
+            with_vectors=False
+        )
+
+        with span("dense_search"):
+            query_filter = self._query_filter(question)
+            if query_filter is not None:
+                dense_hits = await self._get_async_qdrant().search(**search, query_filter=query_filter)
+                if self._use_filtered(dense_hits):
+                    return dense_hits, time.time() - dense_start
+
+            dense_hits = await self._get_async_qdrant().search(**search)
+        return dense_hits, time.time() - dense_start
+
+    def _get_async_qdrant(self) -> AsyncQdrantClient:
+        """Cliente Qdrant async, creado en el event loop que lo usa"""
+        if self._aqdrant is None:
+            self._aqdrant = AsyncQdrantClient(url=settings.qdrant_url, prefer_grpc=False, timeout=10.0)
+            self._aqdrant_loop = asyncio.get_running_loop()
+        return self._aqdrant
+
+    def _search_requests(self, vectors: List[np.ndarray], filters: list = None) -> List[qmodels.SearchRequest]:
+        filters = filters or [None] * len(vectors)
+        return [
+            qmodels.SearchRequest(vector=np.asarray(v, dtype=np.float32).tolist(), limit=self.k_dense,
+                                  filter=f, params=self.search_params, with_payload=False, with_vector=False)
+            for v, f in zip(vectors, filters)
+        ]
+
+    def _batch_plan(self, questions: List[str], vectors: List[np.ndarray]):
+        """Requests del search_batch (filtradas si la pregunta cita artículos/leyes) y el filtro de cada una"""
+        filters = [self._query_filter(q) for q in questions]
+        return self._search_requests(vectors, filters), filters
+
+    def _batch_fallbacks(self, dense_hits: List[list], filters: list) -> List[int]:
+        """Índices de las búsquedas filtradas que hay que repetir sin filtro"""
+        return [i for i, (hits, f) in enumerate(zip(dense_hits, filters)) if f is not None and not self._use_filtered(hits)]
+
+    def _dense_search_batch(self, questions: List[str]) -> Tuple[List[list], float]:
+        """Pata densa de varias preguntas: un encode y un search_batch en Qdrant (más uno sin filtro si hace falta)"""
+        dense_start = time.time()
+        vectors = self.encode_questions(questions)
+        with span("dense_search"):
+            requests, filters = self._batch_plan(questions, vectors)
+            dense_hits = self.qdrant.search_batch(collection_name=self.collection, requests=requests)
+
+            retry = self._batch_fallbacks(dense_hits, filters)
+            if retry:
+                retried = self.qdrant.search_batch(
+                    collection_name=self.collection, requests=self._search_requests([vectors[i] for i in retry])
+                )
+                for i, hits in zip(retry, retried):
+                    dense_hits[i] = hits
+        return dense_hits, time.time() - dense_start
+
+    async def _adense_search_batch(self, questions: List[str]) -> Tuple[List[list], float]:
+        dense_start = time.time()
+        vectors = await run_cpu(self.encode_questions, questions)
+        with span("dense_search"):
+            requests, filters = self._batch_plan(questions, vectors)
+            dense_hits = await self._get_async_qdrant().search_batch(collection_name=self.collection, requests=requests)
+
+            retry = self._batch_fallbacks(dense_hits, filters)
+            if retry:
+                retried = await self._get_async_qdrant().search_batch(
+                    collection_name=self.collection, requests=self._search_requests([vectors[i] for i in retry])
+                )
+                for i, hits in zip(retry, retried):
+                    dense_hits[i] = hits
+        return dense_hits, time.time() - dense_start
+
+    def _lexical_search_batch(self, questions: List[str]) -> Tuple[List[Dict[int, float]], float]:
+        """Pata léxica de varias preguntas en una sola acumulación (SparseBM25Index.top_k_batch)"""
         lex_start = time.time()
-        question_tokens = question.lower().split()
-        lex_scores = self.bm25.get_scores(question_tokens)
-        lex_ids = np.argpartition(lex_scores, -self.k_lex)[-self.k_lex:]
-        lex_ids = lex_ids[np.argsort(lex_scores[lex_ids])[::-1]]
-        lex_time = time.time() - lex_start
+        with span("bm25"):
+            results = self.bm25.top_k_batch([tokenize(q) for q in questions], self.k_lex)
+        lex_scores = [
+            dict(zip(self.bm25.point_ids[ids].tolist(), scores.tolist()))
+            for ids, scores in results
+        ]
+        return lex_scores, time.time() - lex_start
+
+    def _run_legs(self, question: str) -> Tuple[list, Dict[int, float], Dict[str, float]]:
+        """Ejecuta ambas patas. En modo paralelo la pata densa corre en el pool mientras se calcula BM25 localmente."""
+        if not self.parallel_legs:
+            dense_hits, dense_time = self._dense_search(question)
+            lex_scores, lex_time = self._lexical_search(question)
+        else:
+            dense_future = self._executor.submit(contextvars.copy_context().run, self._dense_search, question)
+            lex_scores, lex_time = self._lexical_search(question)
+            dense_hits, dense_time = dense_future.result()
+        return dense_hits, lex_scores, {"dense": dense_time, "lexical": lex_time}
+
+    def _merge_candidates(self, dense_hits, lex_scores: Dict[int, float], payloads: Dict[int, dict]) -> Dict[int, Tuple[float, dict]]:
+        """Fusión de scores densos y léxicos (FUSION_STRATEGY), en orden de score fusionado"""
+        with span("fusion"):
+            ids, scores = self.fusion.fuse(
+                np.fromiter((int(h.id) for h in dense_hits), dtype=np.int64, count=len(dense_hits)),
+                np.fromiter((h.score for h in dense_hits), dtype=np.float64, count=len(dense_hits)),
+                np.fromiter(lex_scores.keys(), dtype=np.int64, count=len(lex_scores)),
+                np.fromiter(lex_scores.values(), dtype=np.float64, count=len(lex_scores)),
+            )
+        return {
+            idx: (score, payloads[idx])
+            for idx, score in zip(ids.tolist(), scores.tolist())
+            if idx in payloads
+        }
+
+    def _adjust_candidates(self, candidates: Dict[int, Tuple[float, dict]], question: str) -> Dict[int, Tuple[float, dict]]:
+        """Hook para ajustar scores antes del re-ranking (ver HybridRetrieverEnriched)"""
+        return candidates
+
+    def _format_hit(self, score: float, payload: dict) -> Dict[str, Any]:
+        return {
+            "score": score,
+            "expte": payload["expediente"],
+            "section": payload["section"],
+            "paragraph": payload["text"],
+            "path": payload["path"],
+            "search_type": self.search_type
+        }
+
+    def query(self, question: str, top_n: int = 10) -> List[Dict[str, Any]]:
+        """Búsqueda híbrida optimizada"""
+        start_time = time.time()
+
+        # 1-2) Búsqueda densa y léxica (solapadas si parallel_legs)
+        dense_hits, lex_scores, timings = self._run_legs(question)
+        return self._rank(question, top_n, dense_hits, lex_scores, timings, start_time)
+
+    async def aquery(self, question: str, top_n: int = 10) -> List[Dict[str, Any]]:
+        """Búsqueda híbrida async: Qdrant async y trabajo CPU en el pool acotado"""
+        start_time = time.time()
+
+        (dense_hits, dense_time), (lex_scores, lex_time) = await asyncio.gather(
+            self._adense_search(question),
+            run_cpu(self._lexical_search, question),
+        )
+        timings = {"dense": dense_time, "lexical": lex_time}
+        return await run_cpu(self._rank, question, top_n, dense_hits, lex_scores, timings, start_time)
+
+    def query_batch(self, questions: List[str], top_n: int = 10) -> List[List[Dict[str, Any]]]:
+        """Búsqueda híbrida de varias preguntas compartiendo encode, Qdrant, BM25, payloads y re-ranking"""
+        start_time = time.time()
+
+        if self.parallel_legs:
+            dense_future = self._executor.submit(contextvars.copy_context().run, self._dense_search_batch, questions)
+            lex_batch, lex_time = self._lexical_search_batch(questions)
+            dense_batch, dense_time = dense_future.result()
+        else:
+            dense_batch, dense_time = self._dense_search_batch(questions)
+            lex_batch, lex_time = self._lexical_search_batch(questions)
+        timings = {"dense": dense_time, "lexical": lex_time}
+        return self._rank_batch(questions, top_n, dense_batch, lex_batch, timings, start_time)
+
+    async def aquery_batch(self, questions: List[str], top_n: int = 10) -> List[List[Dict[str, Any]]]:
+        """query_batch async: Qdrant async y trabajo CPU en el pool acotado"""
+        start_time = time.time()
+
+        (dense_batch, dense_time), (lex_batch, lex_time) = await asyncio.gather(
+            self._adense_search_batch(questions),
+            run_cpu(self._lexical_search_batch, questions),
+        )
+        timings = {"dense": dense_time, "lexical": lex_time}
+        return await run_cpu(self._rank_batch, questions, top_n, dense_batch, lex_batch, timings, start_time)
+
+    def _rank_batch(self, questions: List[str], top_n: int, dense_batch: List[list], lex_batch: List[Dict[int, float]],
+                    timings: Dict[str, float], start_time: float) -> List[List[Dict[str, Any]]]:
+        """_rank para varias preguntas: una lectura de payloads y un solo batch del cross-encoder"""
+        search_time = time.time() - start_time
+
+        candidate_ids = set()
+        for dense_hits, lex_scores in zip(dense_batch, lex_batch):
+            candidate_ids.update(int(h.id) for h in dense_hits)
+            candidate_ids.update(lex_scores)
+        payloads, fetch_time = self._fetch_payloads(list(candidate_ids))
+
+        merge_start = time.time()
+        candidates_list = [
+            self._adjust_candidates(self._merge_candidates(dense_hits, lex_scores, payloads), question)
+            for question, dense_hits, lex_scores in zip(questions, dense_batch, lex_batch)
+        ]
+        merge_time = time.time() - merge_start
+
+        rerank_start = time.time()
+        if self.use_reranking:
+            with span("rerank"):
+                scored_list = self.reranker.rerank_batch(questions, candidates_list, min_keep=top_n)
+        else:
+            scored_list = [[(score, payload) for score, payload in c.values()] for c in candidates_list]
+        rerank_time = time.time() - rerank_start
+
+        tops = [heapq.nlargest(top_n, scored, key=lambda x: x[0]) for scored in scored_list]
+
+        logger.info(f"🔍 {type(self).__name__} batch of {len(questions)} in {time.time() - start_time:.3f}s:")
+        logger.info(f"   Dense: {timings['dense']:.3f}s, Lexical: {timings['lexical']:.3f}s "
+                    f"(wall: {search_time:.3f}s), Fetch: {fetch_time:.3f}s")
+        logger.info(f"   Merge: {merge_time:.3f}s, Rerank: {rerank_time:.3f}s, Candidates: {len(candidate_ids)}")
+
+        return [[self._format_hit(s, p) for s, p in top] for top in tops]
+
+    def _rank(self, question: str, top_n: int, dense_hits, lex_scores: Dict[int, float],
+              timings: Dict[str, float], start_time: float) -> List[Dict[str, Any]]:
+        """Payloads, fusión, re-ranking y selección final (común a query y aquery)"""
+        search_time = time.time() - start_time
+
+        # Qdrant solo devuelve ids y scores: los payloads de todos los candidatos salen del payload store
+        candidate_ids = {int(h.id) for h in dense_hits} | set(lex_scores)
+        payloads, fetch_time = self._fetch_payloads(list(candidate_ids))
 
         # 3) Merge de candidatos
         merge_start = time.time()
-        candidates = {}
-        
-        # Agregar hits densos
-        for h in dense_hits:
-            candidates[int(h.id)] = (float(h.score), h.payload)
-        
-        # Agregar hits léxicos
-        missing_ids = [int(idx) for idx in lex_ids if int(idx) not in candidates]
-        if missing_ids:
-            missing_points = self.qdrant.retrieve(
-                collection_name="fallos",
-                ids=missing_ids,
-                with_payload=True,
-                with_vectors=False
-            )
-            for point, idx in zip(missing_points, missing_ids):
-                candidates[idx] = (float(lex_scores[idx]), point.payload)
-        
-        # Combinar scores
-        for idx in lex_ids:
-            py_idx = int(idx)
-            if py_idx in candidates:
-                old_score, payload = candidates[py_idx]
-                combined_score = old_score + (float(lex_scores[idx]) * 0.5)
-                candidates[py_idx] = (combined_score, payload)
-        
+        candidates = self._merge_candidates(dense_hits, lex_scores, payloads)
+        candidates = self._adjust_candidates(candidates, question)
         merge_time = time.time() - merge_start
 
         # 4) Re-ranking opcional
         if self.use_reranking and len(candidates) > 0:
-            rerank_start = time.time()
-            texts = [c[1]["text"][:500] for c in candidates.values()]
-            pairs = [(question, t) for t in texts]
-            scores = self.rerank.predict(pairs)
-            scored = [(float(s), p) for s, (_, p) in zip(scores, candidates.values())]
-            rerank_time = time.time() - rerank_start
+            with span("rerank") as rerank:
+                scored = self.reranker.rerank(question, candidates, min_keep=top_n)
+            rerank_time = rerank.elapsed
         else:
             scored = [(score, payload) for score, payload in candidates.values()]
             rerank_time = 0
-        
+
         # 5) Selección final
         top = heapq.nlargest(top_n, scored, key=lambda x: x[0])
-        
+
         total_time = time.time() - start_time
-        
+
         # Logging optimizado
-        logger.info(f"🔍 HybridRetriever query in {total_time:.3f}s:")
-        logger.info(f"   Dense: {dense_time:.3f}s, Lexical: {lex_time:.3f}s")
+        logger.info(f"🔍 {type(self).__name__} query in {total_time:.3f}s:")
+        logger.info(f"   Dense: {timings['dense']:.3f}s, Lexical: {timings['lexical']:.3f}s "
+                    f"(wall: {search_time:.3f}s), Fetch: {fetch_time:.3f}s")
         logger.info(f"   Merge: {merge_time:.3f}s, Rerank: {rerank_time:.3f}s")
         logger.info(f"   Candidates: {len(candidates)}, Final: {len(top)}")
 
-        return [
-            {
-                "score": s,
-                "expte": p["expediente"],
-                "section": p["section"],
-                "paragraph": p["text"],
-                "path": p["path"],
-                "search_type": "hybrid"
-            }
-            for s, p in top
-        ]
+        return [self._format_hit(s, p) for s, p in top]
+
+    @property
+    def corpus(self) -> CorpusReader:
+        """Textos del corpus por doc id (se abren en el primer uso)"""
+        if self._corpus is None:
+            self._corpus = CorpusReader(self.generation.corpus_dir)
+        return self._corpus
+
+    def _corpus_stats(self) -> Dict[str, Any]:
+        """Tamaño del corpus leído de meta.json, sin mapear los textos"""
+        try:
+            return corpus_stats(read_corpus_meta(self.generation.corpus_dir))
+        except (OSError, ValueError):
+            return None
 
     def get_stats(self) -> Dict[str, Any]:
         """Estadísticas del retriever híbrido"""
         return {
-            "retriever_type": "hybrid",
+            "retriever_type": self.search_type,
+            "index_generation": self.generation.number,
+            "collection": self.collection,
             "dense_limit": self.k_dense,
             "lexical_limit": self.k_lex,
+            "lexical_engine": self.lexical.name,
+            "lexical_stats": self.lexical.get_stats(),
+            "fusion": self.fusion.get_stats(),
+            "dense_search": qdrant_describe(),
+            "citation_filter": {"enabled": self.citation_filter, "min_hits": self.citation_min_hits, **self.filter_stats},
+            "parallel_legs": self.parallel_legs,
             "reranking_enabled": self.use_reranking,
-            "caching_enabled": settings.enable_query_caching,
-            "corpus_size": len(self.corpus) if hasattr(self, 'corpus') else 0
+            "reranker_stats": self.reranker.get_stats() if self.use_reranking else None,
+            "caching_enabled": self.cache.enabled,
+            "corpus": self._corpus_stats(),
+            "payload_store": self.payloads.get_stats(),
+            "document_store": self.documents.get_stats() if self.documents is not None else None,
+            "load_times": self.load_times
         }
-    
+
     def supports_reranking(self) -> bool:
         """HybridRetriever soporta re-ranking"""
         return True
-    
-    def __del__(self):
-        """Cleanup de recursos"""
+
+    def close(self):
+        """Libera pool y clientes Qdrant (lo llama hot_swap al reemplazar el retriever)"""
+        if getattr(self, '_executor', None) is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
         if hasattr(self, 'qdrant'):
             try:
                 self.qdrant.close()
             except:
-                pass
\ No newline at end of file
+                pass
+        if getattr(self, '_aqdrant', None) is not None:
+            # El cliente async pertenece a su event loop; se cierra ahí
+            try:
+                asyncio.run_coroutine_threadsafe(self._aqdrant.close(), self._aqdrant_loop)
+            except:
+                pass
+            self._aqdrant = None
+        unpin_generation(getattr(self, '_pin', None))
+        self._pin = None
+
+    def __del__(self):
+        """Cleanup de recursos"""
+        self.close()
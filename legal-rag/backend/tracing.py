@@ -0,0 +1,219 @@
+# backend/tracing.py
+"""
+Trazas por consulta y métricas de latencia en proceso
+
+- span(name): mide una etapa del pipeline (encode, dense_search, bm25, payload_fetch, fusion,
+  boosts, rerank, retrieval, context, llm). Suma el tiempo a la traza de la consulta en curso
+  y lo registra en el histograma de la etapa.
+- trace(): abre la traza de una consulta (contextvar). run_cpu y el pool de patas del
+  retriever copian el contexto, así que las etapas que corren en otros threads también
+  quedan en la traza; la API arma search_time / llm_time con estos tiempos reales.
+- MetricsRegistry: latencias con p50/p95/p99 sobre las últimas METRICS_WINDOW muestras,
+  más contadores (tokens del LLM, consultas por endpoint). GET /metrics los exporta en el
+  formato de texto de Prometheus. Son por proceso: con varios workers de uvicorn cada uno
+  reporta los suyos.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Tuple
+
+from .config import get_settings
+
+settings = get_settings()
+
+QUANTILES = (0.5, 0.95, 0.99)
+PREFIX = "legal_rag_"
+
+# Familias exportadas: nombre -> (tipo, ayuda)
+METRICS = {
+    "stage_seconds": ("summary", "Latencia de cada etapa del pipeline"),
+    "request_seconds": ("summary", "Latencia total de cada endpoint de consulta"),
+    "requests_total": ("counter", "Consultas atendidas por endpoint y estado"),
+    "llm_calls_total": ("counter", "Llamadas al LLM"),
+    "llm_tokens_total": ("counter", "Tokens del LLM (prompt | completion)"),
+    "llm_stream_chunks_total": ("counter", "Fragmentos recibidos en generaciones en streaming (sin usage)"),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Trace:
+    """Tiempo acumulado por etapa de una consulta (las etapas pueden correr en varios threads)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def get(self, name: str) -> float:
+        with self._lock:
+            return self.stages.get(name, 0.0)
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return {name: round(seconds, 4) for name, seconds in self.stages.items()}
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("legal_rag_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def trace() -> Iterator[Trace]:
+    """Traza de una consulta; las tareas y threads que hereden el contexto suman a la misma"""
+    t = Trace()
+    token = _current.set(t)
+    try:
+        yield t
+    finally:
+        _current.reset(token)
+
+
+class LatencyWindow:
+    """Cantidad, suma y ventana de las últimas muestras para los cuantiles"""
+
+    def __init__(self, window: int):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+        self.sum += seconds
+
+    def quantiles(self) -> Dict[float, float]:
+        """Cuantiles por rango más cercano sobre la ventana"""
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(labels: Labels, **extra) -> str:
+    pairs = list(labels) + [(k, str(v)) for k, v in extra.items()]
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class MetricsRegistry:
+    """Latencias y contadores en memoria, exportables en formato Prometheus"""
+
+    def __init__(self, window: int = settings.metrics_window):
+        self.window = window
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, Dict[Labels, LatencyWindow]] = {}
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            family = self.latencies.setdefault(name, {})
+            if key not in family:
+                family[key] = LatencyWindow(self.window)
+            family[key].observe(seconds)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            family = self.counters.setdefault(name, {})
+            family[key] = family.get(key, 0) + value
+
+    def render(self) -> str:
+        """Texto para GET /metrics (formato de exposición de Prometheus 0.0.4)"""
+        lines = []
+        with self._lock:
+            for name, family in sorted(self.latencies.items()):
+                self._header(lines, name, "summary")
+                for labels, window in sorted(family.items()):
+                    for q, value in window.quantiles().items():
+                        lines.append(f"{PREFIX}{name}{_fmt_labels(labels, quantile=q)} {value:.6f}")
+                    lines.append(f"{PREFIX}{name}_sum{_fmt_labels(labels)} {window.sum:.6f}")
+                    lines.append(f"{PREFIX}{name}_count{_fmt_labels(labels)} {window.count}")
+            for name, family in sorted(self.counters.items()):
+                self._header(lines, name, "counter")
+                for labels, value in sorted(family.items()):
+                    lines.append(f"{PREFIX}{name}{_fmt_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _header(lines: list, name: str, kind: str):
+        kind, help_text = METRICS.get(name, (kind, name))
+        lines.append(f"# HELP {PREFIX}{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """p50/p95/p99 por etapa, para /stats"""
+        with self._lock:
+            family = dict(self.latencies.get("stage_seconds", {}))
+            return {
+                dict(labels).get("stage", "-"): {
+                    "count": window.count,
+                    **{f"p{int(q * 100)}": round(v, 4) for q, v in window.quantiles().items()},
+                }
+                for labels, window in family.items()
+            }
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    return _registry
+
+
+def record(name: str, seconds: float):
+    """Registra la duración de una etapa en la traza en curso y en su histograma"""
+    t = _current.get()
+    if t is not None:
+        t.add(name, seconds)
+    if settings.metrics_enabled:
+        _registry.observe("stage_seconds", seconds, stage=name)
+
+
+class span:
+    """Context manager que mide una etapa; elapsed queda disponible al salir"""
+
+    __slots__ = ("name", "start", "elapsed")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = 0.0
+        self.elapsed = 0.0
+
+    def __enter__(self) -> "span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        record(self.name, self.elapsed)
+        return False
+
+
+def count(name: str, value: float = 1, **labels):
+    """Incrementa un contador (no hace nada con METRICS_ENABLED=false)"""
+    if settings.metrics_enabled and value:
+        _registry.inc(name, value, **labels)
+
+
+def observe_request(endpoint: str, seconds: float, status: str = "ok"):
+    """Latencia total y cantidad de consultas de un endpoint"""
+    if settings.metrics_enabled:
+        _registry.observe("request_seconds", seconds, endpoint=endpoint)
+        _registry.inc("requests_total", endpoint=endpoint, status=status)
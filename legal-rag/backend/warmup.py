@@ -0,0 +1,116 @@
+# backend/warmup.py
+"""
+Precalentamiento de la API al arrancar
+
+Sin esto el retriever (BM25, payload store, MiniLM, cross-encoder, cliente Qdrant) se
+construía en la primera consulta, que pagaba toda la carga y solía pasarse de
+QUERY_TIMEOUT. Al arrancar, el lifespan de FastAPI corre warm_up() en background:
+
+1. Carga en paralelo (un thread por componente) el cache compartido, el pool CPU y los
+   componentes del pipeline (retriever y proveedor LLM, ver warmup_components()).
+2. Hace una inferencia de prueba en encoder y cross-encoder (retriever.warm_up()) para
+   inicializar kernels y buffers antes de la primera consulta real.
+
+El estado de cada componente (pending | loading | ready | failed, con su tiempo de carga)
+queda en get_readiness() y lo expone GET /ready.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from .cache import get_cache
+from .concurrency import get_cpu_executor
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """Estado de carga de cada componente"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.components: Dict[str, Dict[str, Any]] = {}
+        self.started_at = None
+        self.finished_at = None
+
+    def set(self, name: str, status: str, **info):
+        with self._lock:
+            self.components.setdefault(name, {}).update(status=status, **info)
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return (
+                self.finished_at is not None
+                and all(c["status"] == "ready" for c in self.components.values())
+            )
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            components = {name: dict(info) for name, info in self.components.items()}
+        end = self.finished_at or time.time()
+        return {
+            "ready": self.ready,
+            "started": self.started_at is not None,
+            "total_time": round(end - self.started_at, 3) if self.started_at else None,
+            "components": components,
+        }
+
+
+_readiness = Readiness()
+
+
+def get_readiness() -> Readiness:
+    return _readiness
+
+
+def _load(readiness: Readiness, name: str, func: Callable[[], Any]) -> Any:
+    """Ejecuta func registrando estado y tiempo del componente (los errores quedan en el estado)"""
+    readiness.set(name, "loading")
+    start = time.time()
+    try:
+        result = func()
+    except Exception as e:
+        readiness.set(name, "failed", load_time=round(time.time() - start, 3), error=str(e))
+        logger.error(f"❌ Warm-up de {name} falló: {e}")
+        return None
+    readiness.set(name, "ready", load_time=round(time.time() - start, 3))
+    return result
+
+
+def warm_up(pipeline, readiness: Readiness = None) -> Readiness:
+    """Carga en paralelo los componentes del pipeline y precalienta los modelos del retriever"""
+    readiness = readiness or _readiness
+    readiness.started_at = time.time()
+    logger.info("🔥 Precalentando componentes...")
+
+    components = {
+        "shared_cache": get_cache,
+        "cpu_pool": get_cpu_executor,
+        **pipeline.warmup_components(),
+    }
+    for name in components:
+        readiness.set(name, "pending")
+
+    with ThreadPoolExecutor(max_workers=len(components), thread_name_prefix="warmup") as pool:
+        futures = {name: pool.submit(_load, readiness, name, func) for name, func in components.items()}
+        loaded = {name: future.result() for name, future in futures.items()}
+
+    retriever = loaded.get("retriever")
+    if retriever is not None:
+        # Tiempos de carga internos del retriever (encoder, reranker, bm25, ...)
+        load_times = getattr(retriever, "load_times", None)
+        if load_times:
+            readiness.set("retriever", "ready", details=dict(load_times))
+        _load(readiness, "kernels", retriever.warm_up)
+
+    readiness.finished_at = time.time()
+    snapshot = readiness.snapshot()
+    if snapshot["ready"]:
+        logger.info(f"✅ Warm-up completo en {snapshot['total_time']:.2f}s")
+    else:
+        failed = [n for n, c in snapshot["components"].items() if c["status"] != "ready"]
+        logger.warning(f"⚠️ Warm-up terminado con componentes sin cargar: {failed}")
+    return readiness
@@ -36,54 +36,25 @@ fi
 
 # Verificar/construir índices usando la nueva estructura
 echo "🔍 Verificando índices..."
-if [ -f "/indexes/bm25.pkl" ] && [ -f "/indexes/bm25_corpus.npy" ]; then
+if python -c "
+import sys
+from backend.search.generations import current_generation
+sys.exit(0 if current_generation().is_complete() else 1)
+"; then
     echo "✅ Índices existentes encontrados"
     
-    # Verificar si necesita actualización (opcional)
+    # Aplicar solo los cambios del dataset (nueva generación si hubo cambios)
     echo "🔄 Verificando si necesita actualización..."
     python -c "
-from pathlib import Path
-import os
-
-dataset_path = Path('/datasets/fallos_json')
-index_path = Path('/indexes/bm25.pkl')
-
-if not index_path.exists():
-    exit(1)
-
-# Verificar si hay archivos más nuevos que el índice
-dataset_files = list(dataset_path.rglob('*.json'))
-if not dataset_files:
-    print('⚠️  No se encontraron archivos JSON')
-    exit(1)
-
-newest_dataset = max(f.stat().st_mtime for f in dataset_files)
-index_time = index_path.stat().st_mtime
-
-if newest_dataset > index_time:
-    print('🔄 Dataset actualizado, reconstruyendo índices...')
-    exit(1)
-else:
-    print('✅ Índices actualizados')
-    exit(0)
-"
-    
-    update_needed=$?
-    if [ $update_needed -eq 1 ]; then
-        echo "🔧 Reconstruyendo índices..."
-        python -c "
-from backend.search.indexing import build_indexes
+from backend.search.incremental import update_indexes
 from pathlib import Path
 import os
 
 dataset_path = Path('/datasets/fallos_json')
 qdrant_url = os.getenv('QDRANT_URL', 'http://qdrant:6333')
 
-print(f'📊 Construyendo índices desde: {dataset_path}')
-build_indexes(dataset_path, qdrant_url)
-print('✅ Índices construidos exitosamente')
+update_indexes(dataset_path, qdrant_url)
 "
-    fi
 else
     echo "🔧 Construyendo índices por primera vez..."
     python -c "
@@ -0,0 +1,18 @@
+#!/usr/bin/env bash
+set -e
+
+echo "📦 EXPORTACIÓN ONNX - Encoder + Cross-encoder"
+echo "============================================"
+
+export PYTHONPATH="${PYTHONPATH:-/app}"
+
+echo "1. Exportando modelos (fp32 + int8)..."
+python -m backend.search.inference export
+
+echo "2. Verificando paridad contra PyTorch..."
+python -m backend.search.inference parity --fp32
+python -m backend.search.inference parity
+
+echo "✅ Modelos ONNX listos en ${ONNX_MODEL_DIR:-/indexes/onnx}"
+echo "   Active INFERENCE_BACKEND=onnx y reinicie el backend:"
+echo "   docker-compose restart backend"
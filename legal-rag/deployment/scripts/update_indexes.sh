@@ -28,8 +28,10 @@ logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
 
 try:
+    from backend.search.generations import current_generation
+
     dataset_path = Path('/datasets/fallos_json')
-    index_path = Path('/indexes/bm25.pkl')
+    index_path = Path(current_generation().bm25_index_dir) / 'meta.json'
 
     logger.info(f'Dataset: {dataset_path}')
     json_files = list(dataset_path.rglob('*.json'))
@@ -76,8 +78,7 @@ echo -e "\n2. ¿Continuar con la actualización? (y/N)"
 read -r response
 
 if [[ "$response" =~ ^[Yy]$ ]]; then
-    echo "3. Eliminando índices existentes..."
-    rm -f /indexes/bm25.pkl /indexes/bm25_corpus.npy 2>/dev/null || true
+    echo "3. Los índices en uso no se eliminan: se escribe una generación nueva y se activa al final"
     
     echo "4. Reconstruyendo índices con backend modular..."
     python -c "
@@ -102,8 +103,9 @@ if [[ "$response" =~ ^[Yy]$ ]]; then
     }
     
     echo "✅ Actualización completada!"
-    echo "   Reinicie el servicio para aplicar cambios:"
+    echo "   La API sigue sirviendo la generación anterior hasta reiniciarse:"
     echo "   docker-compose restart backend"
+    echo "   (POST /rebuild-indexes reconstruye y reemplaza los retrievers sin reiniciar)"
 else
     echo "❌ Actualización cancelada"
 fi
\ No newline at end of file
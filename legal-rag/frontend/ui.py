@@ -1,7 +1,47 @@
 import os, requests, pandas as pd, streamlit as st
-import re
+import re, json
 
 API_URL = os.getenv("API_URL", "http://backend:8000/query")
+STREAM_URL = os.getenv("STREAM_URL", f"{API_URL.rstrip('/')}/stream")
+
+
+def iter_sse(response):
+    """Eventos (tipo, dato) de una respuesta Server-Sent Events"""
+    event, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+
+
+def render_stream(response, question):
+    """Muestra los hits y la respuesta del LLM a medida que llegan; devuelve el mismo dict que /query"""
+    data = {"question": question, "markdown": "", "results": []}
+    hits_box = st.empty()
+    st.markdown("### 🤖 Respuesta del Asistente")
+    answer_box = st.empty()
+
+    for event, payload in iter_sse(response):
+        if event == "hits":
+            data["results"] = payload["results"]
+            n_fallos = len({r.get("expte") for r in data["results"]})
+            hits_box.info(f"📄 {len(data['results'])} párrafos de {n_fallos} fallos encontrados. Generando respuesta...")
+        elif event == "token":
+            data["markdown"] += payload["text"]
+            answer_box.markdown(data["markdown"] + "▌")
+        elif event == "done":
+            data.update(payload)
+        elif event == "error":
+            raise RuntimeError(payload["detail"])
+
+    hits_box.empty()
+    answer_box.markdown(data["markdown"])
+    return data
 
 st.set_page_config(
     page_title="Legal RAG - Buscador de Fallos",
@@ -23,7 +63,10 @@ with st.sidebar:
         if health_response.status_code == 200:
             health_data = health_response.json()
             status = health_data.get("status", "unknown")
-            if status == "healthy":
+            ready_response = requests.get(f"{API_URL.replace('/query', '/ready')}", timeout=5)
+            if status == "healthy" and ready_response.status_code == 503:
+                st.info("⏳ Cargando modelos e índices...")
+            elif status == "healthy":
                 st.success("✅ Sistema operativo")
             else:
                 st.warning("⚠️ Sistema con problemas")
@@ -42,16 +85,35 @@ query = st.text_input(
 if st.button("🔍 Buscar", type="primary") and query:
     with st.spinner("🔎 Consultando base de datos jurisprudencial..."):
         try:
-            response = requests.post(
-                API_URL, 
+            data, error = None, None
+            
+            # Streaming: hits apenas termina la búsqueda y después la respuesta token a token
+            with requests.post(
+                STREAM_URL,
                 json={"question": query, "top_n": top_n},
+                stream=True,
                 timeout=60
-            )
+            ) as response:
+                if response.status_code == 200:
+                    data = render_stream(response, query)
+                elif response.status_code != 404:
+                    error = f"❌ Error de API {response.status_code}: {response.text}"
+            
+            # Backend sin streaming (RAG_ENABLE_STREAMING=false): respuesta completa de /query
+            if data is None and error is None:
+                response = requests.post(
+                    API_URL, 
+                    json={"question": query, "top_n": top_n},
+                    timeout=60
+                )
+                if response.status_code == 200:
+                    data = response.json()
+                else:
+                    error = f"❌ Error de API {response.status_code}: {response.text}"
             
-            if response.status_code != 200:
-                st.error(f"❌ Error de API {response.status_code}: {response.text}")
+            if error:
+                st.error(error)
             else:
-                data = response.json()
                 
                 # --------------------------------------------
                 # Extraer resúmenes LLM por expediente del markdown
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# `backend` importable desde la raíz del proyecto (legal-rag/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings exige las credenciales de Azure; los tests no llaman al LLM
+os.environ.setdefault("AZURE_API_KEY", "test")
+os.environ.setdefault("AZURE_ENDPOINT", "https://example.invalid/")
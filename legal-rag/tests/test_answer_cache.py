@@ -0,0 +1,48 @@
+"""Cache semántico de respuestas: similitud de embeddings + misma firma de la pregunta"""
+import numpy as np
+import pytest
+
+pytest.importorskip("qdrant_client")
+
+from backend.rag.cache import SemanticAnswerCache, question_signature
+
+
+@pytest.fixture
+def cache():
+    return SemanticAnswerCache(capacity=8, threshold=0.95, ttl=3600)
+
+
+@pytest.fixture
+def vector():
+    return np.random.default_rng(0).normal(size=384).astype(np.float32)
+
+
+def test_same_question_hits(cache, vector):
+    cache.store(vector, "¿Qué establece el art. 67 de la ley 7046?", 1, 8, "respuesta 67", [])
+    cached = cache.lookup(vector, "¿Qué establece el art. 67 de la ley 7046?", 1, 8)
+    assert cached is not None and cached[0] == "respuesta 67"
+
+
+def test_paraphrase_without_numbers_hits(cache, vector):
+    cache.store(vector, "honorarios del perito", 1, 8, "respuesta", [])
+    assert cache.lookup(vector * 1.01, "¿cómo se regulan los honorarios de peritos?", 1, 8) is not None
+
+
+@pytest.mark.parametrize("question", [
+    "¿Qué establece el art. 68 de la ley 7046?",        # otro artículo
+    "¿Qué establece el art. 67 de la ley 7047?",        # otra ley
+    "¿Qué establece el art. 67?",                       # sin la ley
+])
+def test_different_numbers_miss_even_with_identical_embedding(cache, vector, question):
+    cache.store(vector, "¿Qué establece el art. 67 de la ley 7046?", 1, 8, "respuesta 67", [])
+    assert cache.lookup(vector, question, 1, 8) is None
+
+
+def test_case_number_is_part_of_the_signature(cache, vector):
+    cache.store(vector, "¿Qué se resolvió en el expediente 12345/22?", 1, 8, "respuesta", [])
+    assert cache.lookup(vector, "¿Qué se resolvió en el expediente 12346/22?", 1, 8) is None
+
+
+def test_signature_pairs_articles_with_laws():
+    assert question_signature("art. 5 ley 24.240") != question_signature("art. 24.240 ley 5")
+    assert question_signature("art. 1.078") == question_signature("art. 1078")
@@ -0,0 +1,86 @@
+"""ParagraphBatch: mismos párrafos y payloads que los modelos pydantic de cada procesador"""
+import json
+
+import pytest
+
+pytest.importorskip("pydantic")
+
+from backend.data.processing.enriched import EnrichedProcessor
+from backend.data.processing.standard import StandardProcessor
+
+FALLOS = {
+    "2024/a.json": [
+        {
+            "METADATOS": {"ID_FALLO": "  A-1 ", "ARTICULOS_CITADOS": {"citations": [{"main_source": "Ley 7046", "cited_articles": ["67"]}]}},
+            "IDEA_CENTRAL": "Regulación de honorarios",
+            "MATERIA_PRELIMINAR": "Honorarios",
+            "CONTENIDO": {
+                "considerandos": ["  Los honorarios se regulan según la ley 7046.  ", "corto", None, "Se imponen las costas."],
+                "resumen": "no es una lista",
+            },
+        },
+        {
+            "METADATOS": {"ID_FALLO": "B-2"},
+            "CONTENIDO": {"resuelve": ["Se rechaza el recurso de apelación interpuesto."]},
+        },
+    ],
+    "2024/b.json": {
+        "METADATOS": {"ID_FALLO": "A-1"},  # mismo expediente que en a.json
+        "IDEA_CENTRAL": "Otra idea",
+        "CONTENIDO": {"considerandos": ["Párrafo del mismo expediente en otro archivo."]},
+    },
+    "2024/sin_id.json": {"METADATOS": {}, "CONTENIDO": {"x": ["Fallo sin ID_FALLO: error del archivo."]}},
+    "2025/c.json": {"METADATOS": {"ID_FALLO": "C-3"}, "CONTENIDO": {"considerandos": ["La cosa juzgada impide volver a discutir."]}},
+}
+
+
+@pytest.fixture
+def json_files(tmp_path):
+    files = []
+    for name, content in FALLOS.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(content, ensure_ascii=False), encoding="utf-8")
+        files.append(path)
+    return tmp_path, files
+
+
+@pytest.mark.parametrize("processor_class", [StandardProcessor, EnrichedProcessor])
+@pytest.mark.parametrize("batch_size", [1, 2, 100])
+def test_full_payload_matches_model_dump(json_files, processor_class, batch_size):
+    base_dir, files = json_files
+    expected = [p.model_dump() for p in processor_class().process_files(files, base_dir)]
+
+    processor = processor_class()
+    batches = list(processor.process_batches(files, base_dir, batch_size))
+    full = [b.full_payload(i) for b in batches for i in range(len(b))]
+    assert full == expected
+    assert processor.get_stats()["errors"] == 1  # sin_id.json
+
+    for batch in batches:
+        assert batch.payloads() == [batch.payload(i) for i in range(len(batch))]
+        assert len(batch.documents) == len(set(batch.expediente))
+
+
+def test_take_and_extend_keep_document_rows(json_files):
+    base_dir, files = json_files
+    first, second = list(EnrichedProcessor().process_batches(files, base_dir, 2))[:2]
+    merged = first.take(range(len(first)))
+    merged.extend(second)
+    assert [merged.full_payload(i) for i in range(len(merged))] == (
+        [first.full_payload(i) for i in range(len(first))] + [second.full_payload(i) for i in range(len(second))]
+    )
+    subset = merged.take([len(merged) - 1, 0])
+    assert subset.full_payload(0) == merged.full_payload(len(merged) - 1)
+    assert subset.full_payload(1) == merged.full_payload(0)
+
+
+def test_repeated_expediente_keeps_the_fields_of_its_first_file(tmp_path):
+    for name, idea in (("a.json", "primera"), ("b.json", "segunda")):
+        fallo = {"METADATOS": {"ID_FALLO": "A-1"}, "IDEA_CENTRAL": idea, "CONTENIDO": {"c": [f"Párrafo del archivo {name}."]}}
+        (tmp_path / name).write_text(json.dumps(fallo), encoding="utf-8")
+    files = sorted(tmp_path.glob("*.json"))
+    batch, = EnrichedProcessor().process_batches(files, tmp_path, 100)
+    assert len(batch.documents) == 1
+    assert [batch.full_payload(i)["idea_central"] for i in range(len(batch))] == ["primera", "primera"]
+    assert [batch.full_payload(i)["path"] for i in range(len(batch))] == ["a.json", "b.json"]
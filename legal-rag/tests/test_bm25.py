@@ -0,0 +1,77 @@
+"""Índice BM25 CSR: mismos scores que rank_bm25.BM25Okapi y actualización incremental"""
+import numpy as np
+import pytest
+
+from backend.search.bm25 import BM25Accumulator, SparseBM25Index, tokenize, update_bm25_index, write_bm25_index
+
+VOCAB = ["contrato", "daños", "perito", "honorarios", "recurso", "apelación", "ley", "art.", "cosa", "juzgada"]
+
+
+def _corpus(n_docs: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    # Pesos desparejos: "contrato" aparece en casi todos los documentos (idf negativo -> epsilon)
+    p = np.array([8, 3, 2, 2, 1, 1, 1, 1, 0.5, 0.5])
+    docs = [" ".join(rng.choice(VOCAB, size=rng.integers(1, 25), p=p / p.sum())) for _ in range(n_docs)]
+    return [tokenize(d) for d in docs]
+
+
+QUERIES = [["perito", "honorarios"], ["contrato"], ["cosa", "juzgada", "juzgada"], ["inexistente"], ["ley", "art.", "daños"]]
+
+
+@pytest.fixture
+def corpus():
+    return _corpus(200)
+
+
+@pytest.fixture
+def index(tmp_path, corpus):
+    write_bm25_index(str(tmp_path / "bm25"), corpus)
+    return SparseBM25Index(str(tmp_path / "bm25"))
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_scores_match_rank_bm25(corpus, index, query):
+    rank_bm25 = pytest.importorskip("rank_bm25")
+    expected = rank_bm25.BM25Okapi(corpus).get_scores(query)
+    np.testing.assert_allclose(index.get_scores(query), expected, rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_top_k_is_the_head_of_the_dense_ranking(corpus, index, query):
+    # Candidatos: documentos con algún término de la consulta (los scores pueden ser negativos)
+    scores = index.get_scores(query)
+    matched = np.array([bool(set(query) & set(doc)) for doc in corpus])
+    docs, top = index.top_k(query, 10)
+    np.testing.assert_allclose(top, np.sort(scores[matched])[::-1][:10], rtol=1e-5)
+    np.testing.assert_allclose(scores[docs], top, rtol=1e-5)
+
+
+def test_top_k_batch_matches_top_k(index):
+    for query, (docs, scores) in zip(QUERIES, index.top_k_batch(QUERIES, 10)):
+        _, expected = index.top_k(query, 10)
+        np.testing.assert_allclose(scores, expected, rtol=1e-5)
+        np.testing.assert_allclose(index.get_scores(query)[docs], scores, rtol=1e-5)
+
+
+def test_update_matches_a_fresh_build(tmp_path, corpus):
+    # Índice con point ids 1000.., se eliminan 20 documentos y se agregan 15 nuevos
+    point_ids = np.arange(1000, 1000 + len(corpus))
+    acc = BM25Accumulator()
+    for tokens, pid in zip(corpus, point_ids):
+        acc.add(tokens, int(pid))
+    acc.write(str(tmp_path / "base"))
+
+    removed = set(point_ids[::10].tolist())
+    new_docs = _corpus(15, seed=1)
+    new_ids = list(range(5000, 5015))
+    _, kept = update_bm25_index(str(tmp_path / "base"), str(tmp_path / "updated"), removed, new_docs, new_ids)
+    updated = SparseBM25Index(str(tmp_path / "updated"))
+
+    kept_docs = [corpus[i] for i in kept.tolist()]
+    assert not removed & set(point_ids[kept].tolist())
+    assert updated.point_ids.tolist() == point_ids[kept].tolist() + new_ids
+
+    write_bm25_index(str(tmp_path / "fresh"), kept_docs + new_docs)
+    fresh = SparseBM25Index(str(tmp_path / "fresh"))
+    for query in QUERIES:
+        np.testing.assert_allclose(updated.get_scores(query), fresh.get_scores(query), rtol=1e-5, atol=1e-6)
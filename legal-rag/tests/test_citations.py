@@ -0,0 +1,59 @@
+"""Extracción de citas de la pregunta y filtro de Qdrant de la búsqueda densa"""
+import pytest
+
+pytest.importorskip("qdrant_client")
+
+from backend.search.citations import (
+    ARTICLES_FIELD, LAWS_FIELD, PAIRS_FIELD, citation_fields, citation_filter, extract_citations,
+)
+
+
+def _conditions(question):
+    """(campo, valor) de cada condición `should` del filtro"""
+    query_filter = citation_filter(extract_citations(question))
+    return {(c.key, getattr(c.match, "value", None) or tuple(c.match.any)) for c in query_filter.should}
+
+
+def test_article_paired_with_following_law():
+    citations = extract_citations("¿Qué dice el art. 5 ley 24.240 y el art. 1078 CC?")
+    assert citations.articles == {"5", "1078"}
+    assert citations.laws == {"24240"}
+    assert citations.pairs == {("24240", "5")}
+
+
+def test_article_sequence_with_law():
+    citations = extract_citations("arts. 3, 14 y 94 de la ley 7046")
+    assert citations.articles == {"3", "14", "94"}
+    assert citations.pairs == {("7046", "3"), ("7046", "14"), ("7046", "94")}
+
+
+def test_law_number_is_not_taken_as_article():
+    assert extract_citations("el artículo de la ley 24.240").articles == set()
+    assert extract_citations("arts. 1° y 4° de la ley 10.855").articles == {"1", "4"}
+
+
+def test_filter_has_one_clause_per_pair_and_unpaired_citations():
+    assert _conditions("art. 5 ley 24.240 y art. 1078 CC") == {
+        (PAIRS_FIELD, "24240:5"),
+        (ARTICLES_FIELD, ("1078",)),
+    }
+
+
+def test_filter_with_several_laws():
+    assert _conditions("art. 33 de la ley 10.704, art. 2 ley 10.855 y ley 7046") == {
+        (PAIRS_FIELD, "10704:33"),
+        (PAIRS_FIELD, "10855:2"),
+        (LAWS_FIELD, ("7046",)),
+    }
+
+
+def test_no_citations_no_filter():
+    assert citation_filter(extract_citations("¿Cómo se regulan los honorarios del abogado?")) is None
+
+
+def test_payload_pairs():
+    fields = citation_fields({"articulos_citados": [
+        {"main_source": "Ley 10.704", "cited_articles": [33]},
+        {"main_source": "Código Civil y Comercial (CCC)", "cited_articles": [709]},
+    ]})
+    assert fields == {ARTICLES_FIELD: ["33", "709"], LAWS_FIELD: ["10704"], PAIRS_FIELD: ["10704:33"]}
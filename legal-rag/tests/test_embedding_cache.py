@@ -0,0 +1,120 @@
+"""EmbeddingBuilder con cache: armado de aciertos y faltantes, y persistencia de EmbeddingCache"""
+import hashlib
+
+import numpy as np
+import pytest
+
+pytest.importorskip("qdrant_client")
+
+from backend.search import builders, embedding_cache
+from backend.search.embedding_cache import EmbeddingCache
+
+DIM = 8
+
+
+class FakeEncoder:
+    """Vectores deterministas por texto normalizado; registra qué textos se codificaron"""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, convert_to_numpy=True):
+        self.calls.append(list(texts))
+        return np.stack([_vector(t) for t in texts])
+
+
+def _vector(text):
+    digest = hashlib.blake2b(embedding_cache.normalize_text(text).encode("utf-8"), digest_size=DIM * 4).digest()
+    return np.frombuffer(digest, dtype=np.uint32).astype(np.float32) / 2**32 - 0.5
+
+
+@pytest.fixture
+def make_builder(tmp_path, monkeypatch):
+    encoder = FakeEncoder()
+    monkeypatch.setattr(builders, "get_encoder", lambda model_name, device=None: encoder)
+    monkeypatch.setattr(builders, "model_tag", lambda model_name, model: "fake-model")
+
+    def make(use_cache=True):
+        return builders.EmbeddingBuilder("fake-model", str(tmp_path / "cache"), use_cache=use_cache)
+
+    return make
+
+
+def _expected(texts):
+    # Con cache todos los vectores pasan por float16, haya o no acierto
+    return np.stack([_vector(t) for t in texts]).astype(np.float16).astype(np.float32)
+
+
+def test_full_miss_encodes_each_distinct_text_once(make_builder):
+    builder = make_builder()
+    texts = ["uno", "dos", "uno", "tres", "dos"]
+    vectors = builder.build(texts, show_progress=False)
+
+    assert vectors.dtype == np.float32
+    np.testing.assert_array_equal(vectors, _expected(texts))
+    # Se codifican en el orden de las claves, no en el de los textos
+    assert len(builder.encoder.calls) == 1
+    assert sorted(builder.encoder.calls[0]) == ["dos", "tres", "uno"]
+    assert builder.get_stats()["misses"] == 5
+
+
+def test_partial_hit_only_encodes_new_texts(make_builder):
+    builder = make_builder()
+    builder.build(["uno", "dos"], show_progress=False)
+
+    texts = ["tres", "dos", "cuatro", "uno", "tres"]
+    vectors = builder.build(texts, show_progress=False)
+
+    np.testing.assert_array_equal(vectors, _expected(texts))
+    assert sorted(builder.encoder.calls[-1]) == ["cuatro", "tres"]
+
+
+def test_all_hits_skip_the_encoder(make_builder):
+    builder = make_builder()
+    builder.build(["uno", "dos"], show_progress=False)
+    builder.encoder.calls.clear()
+
+    # Variaciones de espacios caen en la misma clave
+    texts = ["dos", "  uno ", "uno"]
+    vectors = builder.build(texts, show_progress=False)
+
+    assert builder.encoder.calls == []
+    assert vectors.dtype == np.float32
+    np.testing.assert_array_equal(vectors, _expected(texts))
+
+
+def test_cached_vectors_match_uncached_after_float16(make_builder):
+    texts = ["uno", "dos", "tres"]
+    uncached = make_builder(use_cache=False).build(texts, show_progress=False)
+    cached = make_builder().build(texts, show_progress=False)
+
+    np.testing.assert_array_equal(cached, uncached.astype(np.float16).astype(np.float32))
+
+
+def test_flush_persists_segments_across_builders(make_builder):
+    texts = ["uno", "dos", "tres"]
+    first = make_builder()
+    expected = first.build(texts, show_progress=False)
+    first.close()
+
+    second = make_builder()
+    second.encoder.calls.clear()
+    assert len(second.cache) == 3
+    np.testing.assert_array_equal(second.build(texts[::-1], show_progress=False), expected[::-1])
+    assert second.encoder.calls == []
+
+
+def test_compact_keeps_every_vector(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "MAX_SEGMENTS", 2)
+    cache = EmbeddingCache(str(tmp_path), "fake-model")
+    texts = [f"párrafo {i}" for i in range(12)]
+    for start in range(0, len(texts), 3):
+        chunk = texts[start:start + 3]
+        cache.add(cache.keys(chunk), np.stack([_vector(t) for t in chunk]))
+        cache.flush()
+
+    assert cache.get_stats()["segments"] <= 2
+    reloaded = EmbeddingCache(str(tmp_path), "fake-model")
+    found, vectors = reloaded.lookup(reloaded.keys(texts))
+    assert found.all()
+    np.testing.assert_array_equal(vectors.astype(np.float32), _expected(texts))
@@ -0,0 +1,77 @@
+"""Estrategias de fusión densa + léxica: orden y escala"""
+import numpy as np
+import pytest
+
+from backend.search.fusion import (
+    CombSumFusion, MinMaxFusion, ReciprocalRankFusion, ZScoreFusion, get_fusion_strategy,
+)
+
+# Densa: coseno; léxica: BM25 crudo (otra escala). 2 y 3 aparecen en ambas patas
+DENSE_IDS, DENSE_SCORES = np.array([1, 2, 3]), np.array([0.90, 0.80, 0.70])
+LEX_IDS, LEX_SCORES = np.array([3, 4, 2]), np.array([12.0, 9.0, 3.0])
+
+
+def _ranking(strategy):
+    ids, scores = strategy.fuse(DENSE_IDS, DENSE_SCORES, LEX_IDS, LEX_SCORES)
+    assert np.all(np.diff(scores) <= 0)  # orden descendente
+    return ids.tolist(), scores
+
+
+def test_rrf_uses_ranks_only():
+    ids, scores = _ranking(ReciprocalRankFusion(k=60))
+    # 3: rangos 3 y 1; 2: rangos 2 y 3; 1: solo rango 1 denso; 4: solo rango 2 léxico
+    assert ids == [3, 2, 1, 4]
+    expected = 61 / 2 * np.array([1 / 63 + 1 / 61, 1 / 62 + 1 / 63, 1 / 61, 1 / 62])
+    np.testing.assert_allclose(scores, expected)
+    assert scores[0] <= 1.0
+
+
+def test_rrf_is_invariant_to_score_scale():
+    rrf = ReciprocalRankFusion()
+    base = rrf.fuse(DENSE_IDS, DENSE_SCORES, LEX_IDS, LEX_SCORES)
+    scaled = rrf.fuse(DENSE_IDS, DENSE_SCORES * 0.1, LEX_IDS, LEX_SCORES * 100)
+    assert base[0].tolist() == scaled[0].tolist()
+    np.testing.assert_allclose(base[1], scaled[1])
+
+
+def test_minmax_in_unit_interval():
+    ids, scores = _ranking(MinMaxFusion())
+    # 3: 0 + 1, 2: 0.5 + 0, 1: 1 + (falta), 4: (falta) + 6/9
+    assert ids == [1, 3, 4, 2]
+    np.testing.assert_allclose(scores, np.array([1.0, 1.0, 2 / 3, 0.5]) / 2)
+
+
+def test_weights_shift_the_ranking():
+    dense_first = MinMaxFusion(dense_weight=1.0, lexical_weight=0.1)
+    lexical_first = MinMaxFusion(dense_weight=0.1, lexical_weight=1.0)
+    assert _ranking(dense_first)[0][0] == 1
+    assert _ranking(lexical_first)[0][0] == 3
+
+
+def test_zscore_missing_leg_gets_its_minimum():
+    ids, scores = _ranking(ZScoreFusion())
+    dense_z = (DENSE_SCORES - DENSE_SCORES.mean()) / DENSE_SCORES.std()
+    lex_z = (LEX_SCORES - LEX_SCORES.mean()) / LEX_SCORES.std()
+    expected = {1: dense_z[0] + lex_z.min(), 2: dense_z[1] + lex_z[2], 3: dense_z[2] + lex_z[0], 4: dense_z.min() + lex_z[1]}
+    assert ids == sorted(expected, key=expected.get, reverse=True)
+    np.testing.assert_allclose(scores, [expected[i] for i in ids])
+
+
+def test_combsum_is_dominated_by_the_raw_bm25_scale():
+    ids, scores = _ranking(CombSumFusion())
+    assert ids == [3, 4, 2, 1]
+    np.testing.assert_allclose(scores, [12.7, 9.0, 3.8, 0.9])
+
+
+def test_single_leg_and_empty_inputs():
+    for strategy in (ReciprocalRankFusion(), MinMaxFusion(), ZScoreFusion(), CombSumFusion()):
+        ids, _ = strategy.fuse(DENSE_IDS, DENSE_SCORES, np.array([], dtype=np.int64), np.array([]))
+        assert ids.tolist() == [1, 2, 3]
+        ids, scores = strategy.fuse(np.array([], dtype=np.int64), np.array([]), np.array([], dtype=np.int64), np.array([]))
+        assert len(ids) == len(scores) == 0
+
+
+def test_factory():
+    assert get_fusion_strategy("minmax").name == "minmax"
+    with pytest.raises(ValueError):
+        get_fusion_strategy("borda")
@@ -0,0 +1,121 @@
+"""update_indexes: altas, modificaciones y bajas contra un build completo del mismo dataset"""
+import hashlib
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("qdrant_client")
+
+from qdrant_client import QdrantClient
+
+from backend.config import get_settings
+from backend.search import builders, indexing
+from backend.search.bm25 import SparseBM25Index
+from backend.search.generations import current_generation, load_generation
+from backend.search.incremental import load_manifest, paragraph_point_id, update_indexes
+from backend.search.indexing import build_indexes
+from backend.search.payload_store import PayloadStore
+
+settings = get_settings()
+
+DIM = 8
+
+
+class FakeEmbeddingBuilder:
+    """Vectores deterministas por texto, sin modelo"""
+
+    def build(self, texts, batch_size=32, show_progress=True):
+        return np.stack([
+            np.frombuffer(hashlib.blake2b(t.encode("utf-8"), digest_size=DIM * 4).digest(), dtype=np.uint32)
+            .astype(np.float32) / 2**32 - 0.5
+            for t in texts
+        ])
+
+    def close(self):
+        pass
+
+    def get_stats(self):
+        return {"enabled": False}
+
+
+def _fallo(expediente: str, *paragraphs: str) -> dict:
+    return {"METADATOS": {"ID_FALLO": expediente}, "CONTENIDO": {"considerandos": list(paragraphs)}}
+
+
+def _write(json_dir, name: str, fallo: dict):
+    (json_dir / name).write_text(json.dumps(fallo, ensure_ascii=False), encoding="utf-8")
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    """INDEX_ROOT temporal, Qdrant en memoria y embeddings falsos"""
+    monkeypatch.setattr(settings, "index_root", str(tmp_path / "indexes"))
+    monkeypatch.setattr(settings, "processing_mode", "standard")
+    monkeypatch.setattr(settings, "qdrant_recall_report_queries", 0)
+    client = QdrantClient(":memory:")
+    monkeypatch.setattr(builders, "QdrantClient", lambda url, **kwargs: client)
+    monkeypatch.setattr(builders, "EmbeddingBuilder", FakeEmbeddingBuilder)
+    monkeypatch.setattr(indexing, "EmbeddingBuilder", FakeEmbeddingBuilder)
+
+    json_dir = tmp_path / "fallos"
+    json_dir.mkdir()
+    _write(json_dir, "a.json", _fallo("A-1", "El contrato de locación se rescinde por falta de pago.", "Se imponen las costas a la demandada."))
+    _write(json_dir, "b.json", _fallo("B-2", "Los honorarios del perito se regulan conforme la ley arancelaria."))
+    _write(json_dir, "c.json", _fallo("C-3", "La cosa juzgada impide volver a discutir la cuestión.", "Se rechaza el recurso de apelación."))
+    return json_dir, client
+
+
+def _point_ids(client, collection: str) -> set:
+    points, _ = client.scroll(collection, limit=1000, with_payload=False)
+    return {p.id for p in points}
+
+
+def _expected_ids(*paragraphs) -> set:
+    return {paragraph_point_id(e, "considerandos", i) for e, i in paragraphs}
+
+
+def test_added_changed_and_removed_files(env):
+    json_dir, client = env
+    build_indexes(json_dir, "memory")
+    base = current_generation()
+    assert _point_ids(client, base.collection) == _expected_ids(("A-1", 0), ("A-1", 1), ("B-2", 0), ("C-3", 0), ("C-3", 1))
+
+    # b cambia de texto (mismo párrafo: mismo point id), c se elimina, d es nuevo
+    _write(json_dir, "b.json", _fallo("B-2", "Los honorarios del perito contador se fijan en el mínimo legal."))
+    (json_dir / "c.json").unlink()
+    _write(json_dir, "d.json", _fallo("D-4", "El daño moral debe ser acreditado por quien lo reclama."))
+
+    report = update_indexes(json_dir, "memory")
+    assert (report["added"], report["changed"], report["removed"]) == (1, 1, 1)
+
+    updated = current_generation()
+    assert updated.number == base.number + 1 and updated.collection != base.collection
+    expected = _expected_ids(("A-1", 0), ("A-1", 1), ("B-2", 0), ("D-4", 0))
+    assert _point_ids(client, updated.collection) == expected
+    # La colección de la generación anterior no se tocó
+    assert len(_point_ids(client, base.collection)) == 5
+
+    payloads = PayloadStore(updated.payload_store_dir)
+    assert "contador" in payloads.get(paragraph_point_id("B-2", "considerandos", 0))["text"]
+    assert set(SparseBM25Index(updated.bm25_index_dir).point_ids.tolist()) == expected
+    assert set(load_manifest(updated.manifest_path)["files"]) == {"a.json", "b.json", "d.json"}
+
+    # Un build completo del dataset final da los mismos scores BM25
+    build_indexes(json_dir, "memory")
+    fresh = SparseBM25Index(current_generation().bm25_index_dir)
+    incremental = SparseBM25Index(load_generation(updated.number).bm25_index_dir)
+    for query in (["perito", "contador"], ["contrato"], ["daño", "moral"], ["cosa", "juzgada"]):
+        def by_point(index):
+            scores = index.get_scores(query)
+            return {int(p): round(float(s), 5) for p, s in zip(index.point_ids, scores)}
+        assert by_point(incremental) == by_point(fresh)
+
+
+def test_no_changes_keeps_the_active_generation(env):
+    json_dir, _ = env
+    build_indexes(json_dir, "memory")
+    number = current_generation().number
+    report = update_indexes(json_dir, "memory")
+    assert report["generation"] == number and report["paragraphs_added"] == 0
+    assert current_generation().number == number
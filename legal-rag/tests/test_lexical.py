@@ -0,0 +1,66 @@
+"""MaxScore devuelve el mismo top-k que el scoring exhaustivo"""
+import numpy as np
+import pytest
+
+from backend.search.bm25 import SparseBM25Index, write_bm25_index
+from backend.search.lexical import ExhaustiveTopK, MaxScoreTopK, get_lexical_engine
+
+
+def _index(path, vocab_size: int, n_docs: int, seed: int = 0) -> SparseBM25Index:
+    # Frecuencias tipo Zipf: pocos términos muy comunes y una cola larga de términos raros
+    rng = np.random.default_rng(seed)
+    vocab = [f"t{i}" for i in range(vocab_size)]
+    p = 1.0 / np.arange(1, vocab_size + 1)
+    docs = [list(rng.choice(vocab, size=rng.integers(3, 60), p=p / p.sum())) for _ in range(n_docs)]
+    write_bm25_index(str(path), docs)
+    return SparseBM25Index(str(path))
+
+
+def _queries(vocab_size: int, n: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    return [[f"t{i}" for i in rng.integers(0, vocab_size, size=rng.integers(1, 8))] for _ in range(n)]
+
+
+def _assert_same_top_k(index, queries, k):
+    exhaustive, maxscore = ExhaustiveTopK(index), MaxScoreTopK(index)
+    for query in queries:
+        _, expected = exhaustive.top_k(query, k)
+        docs, scores = maxscore.top_k(query, k)
+        np.testing.assert_allclose(scores, expected, rtol=1e-6, atol=1e-9)
+        # Con empates los documentos pueden cambiar, pero son distintos y cada score es el suyo
+        assert len(set(docs.tolist())) == len(docs)
+        np.testing.assert_allclose(index.get_scores(query)[docs], scores, rtol=1e-5, atol=1e-9)
+    return maxscore
+
+
+@pytest.mark.parametrize("k", [1, 5, 20])
+def test_maxscore_matches_exhaustive(tmp_path, k):
+    index = _index(tmp_path / "bm25", vocab_size=300, n_docs=500)
+    maxscore = _assert_same_top_k(index, _queries(300, 50), k)
+    assert maxscore.get_stats()["postings_skipped"] > 0  # la poda efectivamente se activa
+
+
+def test_repeated_query_terms(tmp_path):
+    index = _index(tmp_path / "bm25", vocab_size=300, n_docs=500)
+    _assert_same_top_k(index, [["t0", "t0", "t5"], ["t7", "t7", "t7", "t150"]], 10)
+
+
+def test_small_vocabulary_with_negative_weights(tmp_path):
+    # Casi todos los términos en más de la mitad de los documentos: idf (y pesos) negativos
+    index = _index(tmp_path / "bm25", vocab_size=6, n_docs=200)
+    assert (np.asarray(index.weights) < 0).any()
+    _assert_same_top_k(index, _queries(6, 30), 5)
+
+
+def test_unknown_terms_and_empty_query(tmp_path):
+    index = _index(tmp_path / "bm25", vocab_size=50, n_docs=50)
+    for query in ([], ["inexistente"]):
+        docs, scores = MaxScoreTopK(index).top_k(query, 5)
+        assert len(docs) == len(scores) == 0
+
+
+def test_engine_factory(tmp_path):
+    index = _index(tmp_path / "bm25", vocab_size=50, n_docs=50)
+    assert get_lexical_engine("maxscore", index).name == "maxscore"
+    with pytest.raises(ValueError):
+        get_lexical_engine("wand", index)
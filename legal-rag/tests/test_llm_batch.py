@@ -0,0 +1,51 @@
+"""agenerate_batch: cada prompt con su timeout y sus errores"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("openai")
+
+from backend.llm.base import BaseLLMProvider
+
+
+class FakeProvider(BaseLLMProvider):
+    """Responde el contenido del prompt; "lento" tarda y "falla" levanta"""
+
+    def __init__(self):
+        self.in_flight = self.max_in_flight = 0
+
+    def generate(self, messages, max_tokens=None, temperature=None, **kwargs):
+        raise NotImplementedError
+
+    async def agenerate(self, messages, max_tokens=None, temperature=None, **kwargs):
+        content = messages[0]["content"]
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if content == "lento":
+                await asyncio.sleep(5)
+            await asyncio.sleep(0.01)
+            if content == "falla":
+                raise RuntimeError("boom")
+            return f"ok {content}"
+        finally:
+            self.in_flight -= 1
+
+
+def _batch(provider, prompts, **kwargs):
+    messages = [[{"role": "user", "content": p}] for p in prompts]
+    return asyncio.run(provider.agenerate_batch(messages, **kwargs))
+
+
+def test_failures_and_timeouts_do_not_discard_the_rest():
+    responses = _batch(FakeProvider(), ["a", "lento", "falla", "b"], max_concurrency=2, timeout=0.2)
+    assert responses[0] == "ok a" and responses[3] == "ok b"
+    assert responses[1].startswith("Error:") and responses[2].startswith("Error:")
+
+
+def test_timeout_does_not_count_time_waiting_for_a_slot():
+    # 6 llamadas de ~10 ms de a una: el total supera el timeout pero ninguna llamada lo hace
+    provider = FakeProvider()
+    responses = _batch(provider, [str(i) for i in range(6)], max_concurrency=1, timeout=0.05)
+    assert responses == [f"ok {i}" for i in range(6)]
+    assert provider.max_in_flight == 1
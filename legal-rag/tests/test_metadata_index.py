@@ -0,0 +1,70 @@
+"""MetadataIndex.boosts frente al boost por payload (_boost_score) de HybridRetrieverEnriched"""
+import pytest
+
+pytest.importorskip("msgpack")
+
+from backend.search.metadata_index import MetadataIndex, MetadataIndexWriter
+from backend.search.strategies.hybrid_enriched import HybridRetrieverEnriched
+
+PAYLOADS = {
+    10: {"articulos_citados": [{"main_source": "Ley 7046", "cited_articles": ["67", "68"]}],
+         "materia_preliminar": "Honorarios", "idea_central": "regulación de honorarios del perito"},
+    20: {"articulos_citados": [{"main_source": "Código Civil", "cited_articles": ["1.078"]},
+                               {"main_source": "Código Civil", "cited_articles": ["1078"]}],
+         "materia_preliminar": "Daños", "idea_central": "daño moral contractual"},
+    30: {"articulos_citados": [], "materia_preliminar": "", "idea_central": ""},
+    40: {"articulos_citados": [{"main_source": "", "cited_articles": ["10"]}],
+         "materia_preliminar": "Sucesiones", "idea_central": "declaratoria de herederos"},
+    50: {"articulos_citados": [{"main_source": "Ley 24.240", "cited_articles": ["10"]}],
+         "materia_preliminar": "Consumo", "idea_central": "deber de información"},
+}
+
+
+def _legacy(payload: dict, question: str) -> float:
+    return HybridRetrieverEnriched._boost_score(None, payload, question)
+
+
+@pytest.fixture
+def index(tmp_path):
+    writer = MetadataIndexWriter(str(tmp_path / "metadata"))
+    for point_id, payload in PAYLOADS.items():
+        writer.add(point_id, payload)
+    writer.close()
+    return MetadataIndex(str(tmp_path / "metadata"))
+
+
+@pytest.mark.parametrize("question", [
+    "¿Qué dice el artículo 67 de la ley 7046 sobre honorarios?",
+    "aplicación del código civil al daño moral",
+    "sucesiones declaratoria herederos",
+    "honorarios perito",
+])
+def test_same_boosts_as_the_payload_loop_without_substring_matches(index, question):
+    ids = [10, 20, 30]
+    expected = [_legacy(PAYLOADS[i], question) for i in ids]
+    assert index.boosts(ids, question).tolist() == pytest.approx(expected)
+
+
+def test_unknown_point_ids_get_no_boost(index):
+    assert index.boosts([10, 99], "art. 67 ley 7046").tolist() == pytest.approx([0.3 * 2 + 0.0, 0.0])
+
+
+# Cambios de comportamiento documentados en metadata_index.py (antes: substrings de la pregunta)
+
+def test_number_must_match_as_a_number(index):
+    question = "responsabilidad del art. 1078"
+    assert _legacy(PAYLOADS[50], question) == pytest.approx(0.3)  # "10" estaba dentro de "1078"
+    assert index.boosts([50], question)[0] == pytest.approx(0.0)
+
+
+def test_dotted_article_numbers_match_their_plain_form(index):
+    question = "responsabilidad del art. 1078"
+    assert _legacy(PAYLOADS[20], question) == pytest.approx(0.3)  # "1.078" no era substring
+    assert index.boosts([20], question)[0] == pytest.approx(0.6)
+
+
+def test_empty_source_and_short_words_do_not_match_every_question(index):
+    question = "plazo a apelar"
+    # Antes: la fuente "" está en cualquier pregunta y "a" está dentro de "declaratoria"
+    assert _legacy(PAYLOADS[40], question) == pytest.approx(0.5)
+    assert index.boosts([40], question)[0] == pytest.approx(0.0)
@@ -0,0 +1,21 @@
+"""Paridad ONNX vs PyTorch de los modelos exportados (requiere onnxruntime y los modelos de Hugging Face)"""
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("sentence_transformers")
+
+from backend.search import inference
+
+
+@pytest.fixture(scope="module")
+def onnx_model_dir(tmp_path_factory):
+    out = tmp_path_factory.mktemp("onnx")
+    inference.export_models(str(out), quantize=True)
+    return str(out)
+
+
+@pytest.mark.parametrize("quantize", [False, True], ids=["fp32", "int8"])
+def test_onnx_matches_torch(onnx_model_dir, monkeypatch, quantize):
+    monkeypatch.setattr(inference.settings, "onnx_model_dir", onnx_model_dir)
+    assert inference.check_parity(quantize)
+
@@ -0,0 +1,46 @@
+"""Modo streaming: los archivos pedidos se leen del corpus indicado"""
+import pytest
+
+pytest.importorskip("pydantic")
+
+from backend.data.ndjson import FORMAT, corpus_hashes, dumps
+from backend.data.processing.streaming import StreamingProcessor
+
+
+def _write_corpus(path, paths):
+    records = [{"type": "header", "format": FORMAT, "base_mode": "standard"}]
+    records += [{"type": "file", "path": p, "hash": f"h-{p}"} for p in paths]
+    for n, p in enumerate(paths):
+        records.append({"type": "document", "expediente": f"E{n}", "fields": {}})
+        records += [
+            {"expediente": f"E{n}", "section": "considerandos", "paragraph_id": i, "text": f"{p} #{i}", "path": p}
+            for i in range(2)
+        ]
+    path.write_bytes(b"".join(dumps(r) + b"\n" for r in records))
+    return path
+
+
+@pytest.fixture
+def corpora(tmp_path):
+    passed = _write_corpus(tmp_path / "pasado.ndjson", ["a.json", "b.json"])
+    configured = _write_corpus(tmp_path / "configurado.ndjson", ["a.json", "c.json"])
+    return passed, configured
+
+
+def test_process_batches_reads_the_corpus_passed_as_base_dir(corpora):
+    passed, configured = corpora
+    processor = StreamingProcessor(str(configured))
+    batches = list(processor.process_batches([passed / "b.json"], passed, batch_size=10))
+    assert [t for b in batches for t in b.text] == ["b.json #0", "b.json #1"]
+
+
+def test_process_files_reads_the_corpus_passed_as_base_dir(corpora):
+    passed, configured = corpora
+    processor = StreamingProcessor(str(configured))
+    assert [p.text for p in processor.process_files([passed / "b.json"], passed)] == ["b.json #0", "b.json #1"]
+
+
+def test_source_hashes_come_from_the_same_corpus(corpora):
+    passed, configured = corpora
+    assert StreamingProcessor(str(configured)).source_hashes(passed) == corpus_hashes(passed)
+    assert set(corpus_hashes(passed)) == {"a.json", "b.json"}